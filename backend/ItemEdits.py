@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+# item fields an edit may touch; title/type/layout are text, the rest lists of text
+EditField = Literal["title", "type", "layout", "bullets", "notes", "images"]
+
+class EditOp(BaseModel):
+    op: Literal["replace", "insert", "delete"]
+    field: EditField
+    # position in the ORIGINAL list (list fields only); insert at len() appends
+    index: Optional[int] = None
+    value: Optional[str] = None
+
+class ItemEdits(BaseModel):
+    edits: List[EditOp]
@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import List
+from SlideItem import SlideItem
+
+class OutlineItem(SlideItem):
+    # position of the outline item in the prompt's list
+    index: int
+
+class OutlineItems(BaseModel):
+    items: List[OutlineItem]
@@ -1,8 +1,14 @@
 from pydantic import BaseModel
 from ProjectMeta import ProjectMeta
+from typing import Optional
 
 class RegenerateRequest(BaseModel):
     item_id: str
-    project: ProjectMeta
+    # either the full project, or the id of one uploaded via PUT /projects/{id}
+    project: Optional[ProjectMeta] = None
+    projectId: Optional[str] = None
+    userId: Optional[str] = None
     feedback_text: str
-    
\ No newline at end of file
+    no_cache: Optional[bool] = False
+    # "full" (default) or "patch": edit set + JSON Patch instead of the whole item
+    mode: Optional[str] = None
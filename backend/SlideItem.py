@@ -0,0 +1,15 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class SlideMeta(BaseModel):
+    generator: Optional[str] = None
+
+class SlideItem(BaseModel):
+    id: Optional[int] = None
+    type: str = "slide"
+    layout: str = "title+bullets"
+    title: str = ""
+    bullets: List[str] = []
+    notes: List[str] = []
+    images: List[str] = []
+    meta: Optional[SlideMeta] = None
@@ -0,0 +1,102 @@
+# backend/bench/export_bench.py
+"""
+Export throughput and memory for /export renderers.
+
+    python bench/export_bench.py [--sizes 10,100,1000] [--http]
+
+For each size a synthetic outline (title, 5 bullets, 2 notes, 1 image URL
+per item) is rendered to .docx and .pptx. Reported per run: total time,
+time to first chunk, output size and peak Python heap (tracemalloc) while
+streaming. Items are pulled lazily from a generator and parts are
+compressed as they are written, so peak memory grows only with the zip
+directory (a few hundred bytes per part), not with the document content.
+--http additionally times the full /export round trip through the FastAPI
+app (TestClient, in-process).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from office_export import RENDERERS, get_template  # noqa: E402
+
+
+def _item(i: int) -> dict:
+    return {
+        "id": i,
+        "type": "slide",
+        "layout": "title+bullets",
+        "title": f"Section {i}: scaling the export pipeline",
+        "bullets": [f"Point {j} of item {i}, long enough to look like real generated content." for j in range(5)],
+        "notes": [f"Speaker note {j} for item {i}." for j in range(2)],
+        "images": [f"https://example.com/img/{i}.png"],
+        "meta": {},
+    }
+
+
+def _items(n: int):
+    return (_item(i) for i in range(n))
+
+
+def _run(kind: str, n: int) -> dict:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    first_chunk = None
+    size = 0
+    for chunk in RENDERERS[kind](_items(n), title="Export benchmark"):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - t0
+        size += len(chunk)
+    total = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "kind": kind,
+        "items": n,
+        "total_s": round(total, 4),
+        "first_chunk_s": round(first_chunk or 0.0, 4),
+        "bytes": size,
+        "peak_heap_kb": round(peak / 1024, 1),
+        "items_per_s": round(n / total, 1) if total else None,
+    }
+
+
+def _run_http(client, kind: str, n: int) -> dict:
+    body = {"projects": {"docType": kind, "mainTopic": "Export benchmark", "outline": [_item(i) for i in range(n)]}}
+    t0 = time.perf_counter()
+    resp = client.post("/export", json=body)
+    total = time.perf_counter() - t0
+    resp.raise_for_status()
+    return {"kind": kind, "items": n, "http_total_s": round(total, 4), "bytes": len(resp.content)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--http", action="store_true", help="also time the /export endpoint in-process")
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    # templates are parsed once per process; warm them so the first row is comparable
+    for kind in RENDERERS:
+        get_template(kind, None)
+
+    results = [_run(kind, n) for kind in RENDERERS for n in sizes]
+
+    if args.http:
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        from fastapi.testclient import TestClient
+        from main import app
+
+        with TestClient(app) as client:
+            results += [_run_http(client, kind, n) for kind in RENDERERS for n in sizes]
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,230 @@
+# backend/bench/fake_gemini.py
+"""
+Minimal offline stand-in for the Gemini REST API.
+
+Serves ``POST /{version}/models/{model}:generateContent`` with a fixed
+latency and a canned slide object, which is enough for google-genai's
+``Client`` (pointed here via ``GENAI_BASE_URL``) to complete a call.
+``:streamGenerateContent`` returns the same object split over several
+SSE chunks, spreading the latency across them.
+
+Faults can be injected: a fraction ``error_rate`` of calls fail with
+``error_status`` (503 by default), optionally with a Retry-After header.
+They live in ``server.faults`` and can be changed while the server runs.
+
+The response shape lives in ``server.profile``: ``latency_s`` plus up to
+``jitter_s`` of uniform random extra latency, ``token_latency_s`` per
+output token (about 4 bytes; models decode token by token, so longer
+answers take longer), and ``output_bytes``, a target size for the slide
+JSON (bullets are added until it is reached). A request whose response
+schema asks for ``edits`` (patch-mode /regenerate) gets a one-edit set
+instead of a slide; one asking for ``items`` (outline mode) gets one slide
+per item listed in the prompt, of which a fraction ``bad_item_rate`` come
+back empty. ``server.calls`` counts the model calls answered so far, and
+the reported prompt tokens are ~4 characters of prompt and system
+instruction each.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+
+
+def fake_slide(output_bytes: int = 0, model: str = "fake-gemini") -> Dict[str, Any]:
+    slide = {
+        "id": 1,
+        "type": "slide",
+        "layout": "title+bullets",
+        "title": "Fake slide",
+        "bullets": ["First point", "Second point", "Third point"],
+        "notes": ["Speaker note"],
+        "images": [],
+        "meta": {"generator": model},
+    }
+    size = len(json.dumps(slide))
+    while size < output_bytes:
+        bullet = f"Padding point {len(slide['bullets'])}: adoption grows as tooling costs fall across teams"
+        slide["bullets"].append(bullet)
+        size += len(bullet) + 4
+    return slide
+
+
+def fake_edits() -> Dict[str, Any]:
+    return {"edits": [{"op": "replace", "field": "bullets", "index": 1, "value": "Shorter second point"}]}
+
+
+def fake_items(n: int, output_bytes: int = 0, model: str = "fake-gemini", bad_item_rate: float = 0.0) -> Dict[str, Any]:
+    items = []
+    for i in range(n):
+        item = {"index": i, **fake_slide(output_bytes, model), "title": f"Fake slide {i}"}
+        if bad_item_rate and random.random() < bad_item_rate:
+            item.update(title="", bullets=[])
+        items.append(item)
+    return {"items": items}
+
+
+# build_outline_prompt states the item count as "Outline items (N)"
+_OUTLINE_COUNT_RE = re.compile(r"Outline items \((\d+)\)")
+
+
+def _request(body: bytes) -> Tuple[Dict[str, Any], str]:
+    """(generationConfig, prompt text incl. system instruction) of a generateContent body."""
+    try:
+        req = json.loads(body or b"{}")
+    except ValueError:
+        return {}, ""
+    parts = [p for c in req.get("contents") or [] for p in c.get("parts") or []]
+    parts += (req.get("systemInstruction") or {}).get("parts") or []
+    return req.get("generationConfig") or {}, "".join(p.get("text") or "" for p in parts)
+
+
+def _schema_properties(config: Dict[str, Any]) -> Dict[str, Any]:
+    schema = config.get("responseSchema") or config.get("responseJsonSchema") or {}
+    return schema.get("properties") or {}
+
+
+def _candidate(text: str, prompt_tokens: int = 200) -> Dict[str, Any]:
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        # rough counts so /metrics token counters have something to show
+        "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": max(1, len(text) // 4)},
+    }
+
+
+def make_handler(stream_chunks: int = 8):
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):  # keep benchmark output clean
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+
+            faults = self.server.faults
+            if faults["error_rate"] and random.random() < faults["error_rate"]:
+                self._fail(faults)
+                return
+            if ":streamGenerateContent" in self.path:
+                self._stream()
+                return
+            if ":generateContent" not in self.path:
+                self.send_error(404)
+                return
+            with self.server.calls_lock:
+                self.server.calls += 1
+
+            profile = self.server.profile
+            config, prompt = _request(body)
+            wanted = _schema_properties(config)
+            if "edits" in wanted:
+                answer = fake_edits()
+            elif "items" in wanted:
+                count = _OUTLINE_COUNT_RE.search(prompt)
+                answer = fake_items(int(count.group(1)) if count else 1, profile["output_bytes"], self._model(),
+                                    profile["bad_item_rate"])
+            else:
+                answer = fake_slide(profile["output_bytes"], self._model())
+            text = json.dumps(answer)
+            time.sleep(self._latency(profile) + profile["token_latency_s"] * len(text) / 4)
+            data = json.dumps(_candidate(text, max(1, len(prompt) // 4))).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _model(self) -> str:
+            # /v1beta/models/<model>:generateContent, echoed as meta.generator
+            return self.path.split("/models/")[-1].split(":")[0] or "fake-gemini"
+
+        @staticmethod
+        def _latency(profile) -> float:
+            return profile["latency_s"] + (random.random() * profile["jitter_s"] if profile["jitter_s"] else 0.0)
+
+        def _fail(self, faults):
+            status = faults["error_status"]
+            body = json.dumps({"error": {"code": status, "message": "injected fault", "status": "UNAVAILABLE"}}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if faults["retry_after"] is not None:
+                self.send_header("Retry-After", faults["retry_after"])
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self):
+            profile = self.server.profile
+            latency = self._latency(profile)
+            text = json.dumps(fake_slide(profile["output_bytes"], self._model()))
+            size = max(1, -(-len(text) // stream_chunks))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for start in range(0, len(text), size):
+                time.sleep(latency / stream_chunks)
+                frame = f"data: {json.dumps(_candidate(text[start:start + size]))}\r\n\r\n"
+                self.wfile.write(frame.encode("utf-8"))
+                self.wfile.flush()
+
+    return FakeGeminiHandler
+
+
+class _Server(ThreadingHTTPServer):
+    # the default listen backlog (5) drops connections under benchmark load
+    request_queue_size = 256
+
+
+def start_fake_gemini(latency_s: float = 0.5,
+                      host: str = "127.0.0.1",
+                      port: int = 0,
+                      stream_chunks: int = 8,
+                      error_rate: float = 0.0,
+                      error_status: int = 503,
+                      retry_after: str = None,
+                      jitter_s: float = 0.0,
+                      output_bytes: int = 0,
+                      token_latency_s: float = 0.0,
+                      bad_item_rate: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the fake server on a daemon thread; returns (server, base_url)."""
+    server = _Server((host, port), make_handler(stream_chunks))
+    server.faults = {"error_rate": error_rate, "error_status": error_status, "retry_after": retry_after}
+    server.profile = {"latency_s": latency_s, "jitter_s": jitter_s, "output_bytes": output_bytes,
+                      "token_latency_s": token_latency_s, "bad_item_rate": bad_item_rate}
+    server.calls = 0
+    server.calls_lock = threading.Lock()
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a fake Gemini API server.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per call")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls that fail")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--retry-after", default=None, help="Retry-After header value on failures")
+    parser.add_argument("--jitter", type=float, default=0.0, help="max extra random latency per call (s)")
+    parser.add_argument("--output-bytes", type=int, default=0, help="target size of the returned slide JSON")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="extra seconds per output token")
+    parser.add_argument("--bad-item-rate", type=float, default=0.0, help="fraction of outline-mode items returned empty")
+    args = parser.parse_args()
+
+    srv, url = start_fake_gemini(args.latency, port=args.port, error_rate=args.error_rate,
+                                 error_status=args.error_status, retry_after=args.retry_after,
+                                 jitter_s=args.jitter, output_bytes=args.output_bytes,
+                                 token_latency_s=args.token_latency, bad_item_rate=args.bad_item_rate)
+    print(f"fake gemini listening on {url} (latency={args.latency}s)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        srv.shutdown()
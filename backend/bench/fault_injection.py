@@ -0,0 +1,83 @@
+# backend/bench/fault_injection.py
+"""
+Exercise the resilience layer against the fake Gemini server.
+
+    python bench/fault_injection.py
+
+Phase 1 injects transient 503s into a fraction of calls: requests should
+still succeed, with the retry counter absorbing the faults.
+Phase 2 fails every call: the circuit should open and later requests
+should fail fast with 503 + Retry-After instead of waiting on the model.
+Phase 3 heals the server and waits out the reset timeout: the half-open
+probe should close the circuit again.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server, fake_url = start_fake_gemini(0.05, error_rate=args.error_rate, retry_after="0")
+    os.environ.update({
+        "GENAI_API_KEY": "fake-key",
+        "GENAI_BASE_URL": fake_url,
+        "GENAI_CACHE_ENABLED": "0",
+        "USER_RATE_PER_MIN": "0",
+        "GENAI_CB_RESET_S": "1",
+        "GENAI_RETRY_BASE_DELAY_S": "0.05",
+    })
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from fastapi.testclient import TestClient
+    import main
+
+    def post(i):
+        r = client.post("/generate", json={
+            "userId": "bench", "docType": "pptx", "mainTopic": "Faults",
+            "outlineItem": {"id": i, "title": f"Slide {i}"},
+        })
+        return r.status_code, r.headers.get("retry-after")
+
+    report = {}
+    with TestClient(main.app) as client:
+        with ThreadPoolExecutor(8) as pool:
+            codes = [c for c, _ in pool.map(post, range(args.requests))]
+        report["transient_faults"] = {
+            "error_rate": args.error_rate,
+            "status_codes": {str(c): codes.count(c) for c in set(codes)},
+            "resilience": client.get("/llm/health").json(),
+        }
+
+        server.faults["error_rate"] = 1.0
+        results = [post(i) for i in range(args.requests)]
+        t0 = time.perf_counter()
+        fast = post(-1)
+        report["hard_outage"] = {
+            "status_codes": {str(c): [r[0] for r in results].count(c) for c in set(r[0] for r in results)},
+            "fast_fail_status": fast[0],
+            "fast_fail_retry_after": fast[1],
+            "fast_fail_ms": round((time.perf_counter() - t0) * 1000, 2),
+            "resilience": client.get("/llm/health").json(),
+        }
+
+        server.faults["error_rate"] = 0.0
+        time.sleep(1.1)
+        report["recovered"] = {"status": post(-2)[0], "resilience": client.get("/llm/health").json()["breakers"]}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
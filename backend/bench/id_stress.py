@@ -0,0 +1,113 @@
+# backend/bench/id_stress.py
+"""
+Uniqueness and throughput of id_generator across threads and processes.
+
+    python bench/id_stress.py [--processes 4] [--threads 8] [--per-thread 62500]
+
+Every process (forked, like gunicorn workers) runs `threads` threads that
+each draw `per-thread` ids from the shared generator. The parent checks:
+no duplicates across all ids, strictly increasing ids within each thread,
+every id <= 2**53 - 1, and one distinct node per process. Exits 1 on any
+failure.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from id_generator import MAX_ID, id_generator, parse_id  # noqa: E402
+
+
+def _worker(threads: int, per_thread: int, out_dir: str) -> None:
+    results = [None] * threads
+    barrier = threading.Barrier(threads)
+
+    def run(t):
+        barrier.wait()
+        results[t] = array("q", (id_generator.next_id() for _ in range(per_thread)))
+
+    workers = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - t0
+
+    with open(os.path.join(out_dir, f"{os.getpid()}.ids"), "wb") as f:
+        array("q", [threads, per_thread, id_generator.node, id_generator.borrowed_ms, int(elapsed * 1e6)]).tofile(f)
+        for ids in results:
+            ids.tofile(f)
+
+
+def _read(path: str):
+    with open(path, "rb") as f:
+        header = array("q")
+        header.fromfile(f, 5)
+        threads, per_thread, node, borrowed, elapsed_us = header
+        per_thread_ids = []
+        for _ in range(threads):
+            ids = array("q")
+            ids.fromfile(f, per_thread)
+            per_thread_ids.append(ids)
+    return node, borrowed, elapsed_us / 1e6, per_thread_ids
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--per-thread", type=int, default=62500, help="ids drawn by each thread")
+    args = parser.parse_args()
+
+    total = args.processes * args.threads * args.per_thread
+    ctx = mp.get_context("fork")
+    with tempfile.TemporaryDirectory() as out_dir:
+        t0 = time.perf_counter()
+        procs = [ctx.Process(target=_worker, args=(args.threads, args.per_thread, out_dir))
+                 for _ in range(args.processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        wall = time.perf_counter() - t0
+        if any(p.exitcode for p in procs):
+            print("a worker process failed")
+            sys.exit(1)
+        runs = [_read(os.path.join(out_dir, name)) for name in sorted(os.listdir(out_dir))]
+
+    failures = []
+    seen = set()
+    for node, borrowed, elapsed, per_thread_ids in runs:
+        print(f"process node={node:2d}: {args.threads * args.per_thread / elapsed:12,.0f} ids/s, borrowed {borrowed} ms")
+        for ids in per_thread_ids:
+            if any(b <= a for a, b in zip(ids, ids[1:])):
+                failures.append(f"node {node}: ids not strictly increasing within a thread")
+            if max(ids) > MAX_ID or min(ids) < 0:
+                failures.append(f"node {node}: id outside 0..2**53-1")
+            seen.update(ids)
+
+    nodes = [run[0] for run in runs]
+    if len(set(nodes)) != len(nodes):
+        failures.append(f"processes share a node: {nodes}")
+    duplicates = total - len(seen)
+    if duplicates:
+        failures.append(f"{duplicates} duplicate id(s)")
+
+    newest = max(seen)
+    print(f"\n{total:,} ids from {args.processes} process(es) x {args.threads} thread(s) in {wall:.2f}s wall")
+    print(f"distinct: {len(seen):,}  duplicates: {duplicates}  max id: {newest} ({parse_id(newest)})")
+    if failures:
+        print("FAIL:\n  " + "\n  ".join(dict.fromkeys(failures)))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main_cli()
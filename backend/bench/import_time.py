@@ -0,0 +1,89 @@
+# backend/bench/import_time.py
+"""
+Cold-start guard: how long `import main` takes, from `python -X importtime`.
+
+    python bench/import_time.py [--runs 5] [--budget-ms 900] [--top 15]
+
+Each run is a fresh interpreter (bytecode caches warm, as on a deployed
+instance). Reports the median cumulative import time of main and the
+slowest modules, and exits 1 when the median is over budget or when a
+module that must stay lazy (google.genai, strictjson) was imported.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# loaded on first use by genai_clients / generation_pipeline
+LAZY_MODULES = ("google.genai", "strictjson")
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile() -> List[Tuple[str, int, int, int]]:
+    """(module, self us, cumulative us, depth) for one `import main`."""
+    env = dict(os.environ, GENAI_API_KEY=os.environ.get("GENAI_API_KEY", "bench-key"), LOG_LEVEL="ERROR")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode:
+        sys.exit(f"import main failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=900.0, help="max median import time of main")
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    args = parser.parse_args()
+
+    totals: List[float] = []
+    cumulative: Dict[str, List[int]] = {}
+    imported = set()
+    for _ in range(args.runs):
+        children: List[Tuple[str, int]] = []
+        for name, _self_us, cum_us, depth in import_profile():
+            imported.add(name)
+            if depth == 1:
+                children.append((name, cum_us))
+            elif depth == 0:
+                # children are listed before their parent
+                if name == "main":
+                    totals.append(cum_us / 1000)
+                    for child, child_us in children:
+                        cumulative.setdefault(child, []).append(child_us)
+                children = []
+
+    median_ms = statistics.median(totals)
+    print(f"import main: median {median_ms:.0f} ms over {args.runs} run(s) (min {min(totals):.0f}, max {max(totals):.0f})\n")
+    print("slowest imports made by main (median cumulative):")
+    ranked = sorted(((statistics.median(v) / 1000, k) for k, v in cumulative.items()), reverse=True)
+    for ms, name in ranked[:args.top]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    if median_ms > args.budget_ms:
+        failures.append(f"median {median_ms:.0f} ms is over the {args.budget_ms:.0f} ms budget")
+    eager = sorted(m for m in imported if m.startswith(LAZY_MODULES))
+    if eager:
+        failures.append(f"imported eagerly: {', '.join(eager[:5])}{' ...' if len(eager) > 5 else ''}")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print(f"\nOK: under {args.budget_ms:.0f} ms, none of {', '.join(LAZY_MODULES)} imported")
+
+
+if __name__ == "__main__":
+    main_cli()
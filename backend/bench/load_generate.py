@@ -0,0 +1,119 @@
+# backend/bench/load_generate.py
+"""
+Load test: fire N concurrent /generate requests at the app backed by the
+fake Gemini server and check that the LLM calls overlap instead of queueing.
+
+    python bench/load_generate.py --requests 16 --latency 0.5
+
+With a blocking event loop the wall time is ~N * latency; with the async
+LLM layer it is ~ceil(N / GENAI_MAX_CONCURRENCY) * latency.
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_app(port: int):
+    import uvicorn
+    import main
+
+    config = uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def _post_generate(base: str, i: int) -> float:
+    payload = {
+        "userId": "bench-user",
+        "projectId": "bench-project",
+        "docType": "pptx",
+        "mainTopic": "Load testing",
+        "outlineItem": {"id": i, "title": f"Slide {i}"},
+    }
+    req = urllib.request.Request(
+        f"{base}/generate",
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+    return time.perf_counter() - t0
+
+
+def _preflight(base: str) -> float:
+    req = urllib.request.Request(
+        f"{base}/generate",
+        headers={"Origin": "http://localhost:5173", "Access-Control-Request-Method": "POST"},
+        method="OPTIONS",
+    )
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        resp.read()
+    return time.perf_counter() - t0
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    _, fake_url = start_fake_gemini(args.latency)
+    os.environ["GENAI_API_KEY"] = "fake-key"
+    os.environ["GENAI_BASE_URL"] = fake_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    port = _free_port()
+    _start_app(port)
+    base = f"http://127.0.0.1:{port}"
+
+    import scheduler
+    limit = scheduler.GENAI_MAX_CONCURRENCY
+
+    with ThreadPoolExecutor(max_workers=args.requests + 1) as pool:
+        t0 = time.perf_counter()
+        futures = [pool.submit(_post_generate, base, i) for i in range(args.requests)]
+        time.sleep(args.latency / 2)
+        preflight_s = _preflight(base)
+        latencies = [f.result() for f in futures]
+        wall = time.perf_counter() - t0
+
+    serial = args.requests * args.latency
+    ideal = math.ceil(args.requests / limit) * args.latency
+    print(json.dumps({
+        "requests": args.requests,
+        "fake_latency_s": args.latency,
+        "max_concurrency": limit,
+        "wall_s": round(wall, 3),
+        "serial_estimate_s": round(serial, 3),
+        "ideal_s": round(ideal, 3),
+        "overlap_factor": round(serial / wall, 2),
+        "max_request_s": round(max(latencies), 3),
+        "preflight_during_load_s": round(preflight_s, 4),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
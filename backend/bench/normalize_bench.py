@@ -0,0 +1,104 @@
+# backend/bench/normalize_bench.py
+"""
+Throughput of item normalization: the old per-field loop vs item_normalizer.
+
+    python bench/normalize_bench.py [--items 10000] [--repeat 5]
+
+Inputs are --items generated items in two shapes: "clean" (what native
+response_schema output looks like) and "messy" (padded strings, numeric
+ids as strings, a bare string for notes, duplicate bullets, template
+instead of layout). Rows:
+
+* before                the old main.normalize_slide_object, one item at a time
+* normalize_item        the new normalizer called one item at a time
+* normalize_items       one column pass for the whole list
+* normalize_items/256   the export path: batches of 256 (normalize_stream)
+* normalize_items+lim   the model-output path: dedupe and content limits on top
+
+The first four rows do the same work as the old loop (enforce_limits=False,
+as /regenerate and export call it); the +lim row shows what dedupe and
+limits add on model output. Rounds are interleaved (each round times every
+row once) so machine noise hits all rows alike; the best round counts.
+"""
+import argparse
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from item_normalizer import normalize_item, normalize_items, normalize_stream  # noqa: E402
+from utils import make_id  # noqa: E402
+
+
+def before(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """main.normalize_slide_object as it was before item_normalizer."""
+    out: Dict[str, Any] = {}
+    out["id"] = int(obj.get("id") or make_id())
+    out["type"] = str(obj.get("type") or "slide")
+    out["layout"] = str(obj.get("layout") or obj.get("template") or "title+bullets")
+    out["title"] = str(obj.get("title") or "").strip()
+    bullets = obj.get("bullets") or []
+    if isinstance(bullets, str):
+        bullets = [bullets]
+    out["bullets"] = [str(b).strip() for b in bullets] if bullets else []
+    notes = obj.get("notes") or obj.get("speaker_notes") or []
+    if isinstance(notes, str):
+        notes = [notes]
+    out["notes"] = [str(n).strip() for n in notes] if notes else []
+    images = obj.get("images") or []
+    if isinstance(images, str):
+        images = [images]
+    out["images"] = [str(i).strip() for i in images] if images else []
+    meta = obj.get("meta") or {}
+    out["meta"] = meta if isinstance(meta, dict) else {}
+    return out
+
+
+def _items(n: int, messy: bool) -> List[Dict[str, Any]]:
+    out = []
+    for i in range(n):
+        bullets = [f"Point {j}: adoption grows as tooling costs fall" for j in range(5)]
+        if not messy:
+            out.append({"id": i + 1, "type": "slide", "layout": "title+bullets", "title": f"Slide {i}",
+                        "bullets": bullets, "notes": ["Speaker note"], "images": [], "meta": {"generator": "m"}})
+        else:
+            out.append({"id": str(i + 1), "template": "title+bullets", "title": f"  Slide {i}  ",
+                        "bullets": [f"  {b} " for b in bullets] + [bullets[0]], "notes": "  Speaker note ",
+                        "images": None, "meta": None})
+    return out
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{args.items} items, best of {args.repeat} interleaved rounds\n")
+    print(f"{'input':>6} {'path':>20} {'items/s':>11} {'us/item':>8} {'vs before':>9}")
+    for shape in ("clean", "messy"):
+        items = _items(args.items, shape == "messy")
+        rows: Dict[str, Callable[[], Any]] = {
+            "before": lambda: [before(x) for x in items],
+            "normalize_item": lambda: [normalize_item(x, enforce_limits=False) for x in items],
+            "normalize_items": lambda: normalize_items(items, enforce_limits=False),
+            "normalize_items/256": lambda: list(normalize_stream(items, enforce_limits=False, batch_size=256)),
+            "normalize_items+lim": lambda: normalize_items(items),
+        }
+        best = {name: float("inf") for name in rows}
+        for fn in rows.values():
+            fn()  # warm up
+        for _ in range(args.repeat):
+            for name, fn in rows.items():
+                t0 = time.perf_counter()
+                fn()
+                best[name] = min(best[name], time.perf_counter() - t0)
+        for name, seconds in best.items():
+            print(f"{shape:>6} {name:>20} {args.items / seconds:>11,.0f} {seconds / args.items * 1e6:>8.2f} "
+                  f"{best['before'] / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
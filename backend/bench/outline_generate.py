@@ -0,0 +1,100 @@
+# backend/bench/outline_generate.py
+"""
+/generate/batch in per-item mode vs outline mode, against the fake Gemini
+server.
+
+    python bench/outline_generate.py [--items 12] [--runs 3] [--bad-item-rate 0.1]
+
+The same --items outline is generated --runs times in each mode, with the
+response cache bypassed. The fake model charges --latency per call plus
+--token-latency per output token, reports ~4 characters of prompt and
+system instruction per input token, and in outline mode returns a
+fraction --bad-item-rate of the items empty (those are retried one by
+one). Reported per mode: p50 wall time of the whole batch, model calls,
+input and output tokens per batch (from /metrics), and items retried.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port, _start_app  # noqa: E402
+from suite import _summary  # noqa: E402
+
+_TOKENS_RE = re.compile(r'^paradocs_llm_tokens_total\{direction="(in|out)"[^}]*\} (\S+)$', re.M)
+
+
+def _tokens(base: str):
+    with urllib.request.urlopen(f"{base}/metrics", timeout=30) as resp:
+        text = resp.read().decode("utf-8")
+    totals = {"in": 0.0, "out": 0.0}
+    for direction, value in _TOKENS_RE.findall(text):
+        totals[direction] += float(value)
+    return totals
+
+
+def _batch(base: str, payload: dict) -> dict:
+    req = urllib.request.Request(f"{base}/generate/batch", data=json.dumps(payload).encode("utf-8"),
+                                 headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(req, timeout=300) as resp:
+        return json.loads(resp.read())
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="fixed fake model latency per call (s)")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="fake decode time per output token (s)")
+    parser.add_argument("--bad-item-rate", type=float, default=0.1, help="outline-mode items returned empty")
+    parser.add_argument("--parallelism", type=int, default=4)
+    args = parser.parse_args()
+
+    server, fake_url = start_fake_gemini(args.latency, token_latency_s=args.token_latency,
+                                         bad_item_rate=args.bad_item_rate)
+    os.environ.update({
+        "GENAI_API_KEY": "fake-key",
+        "GENAI_BASE_URL": fake_url,
+        "GENAI_QPS": "0",
+        "GENAI_TPM": "0",
+        "USER_RATE_PER_MIN": "0",
+        "USER_BULK_ITEMS_PER_MIN": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    port = _free_port()
+    _start_app(port)
+    base = f"http://127.0.0.1:{port}"
+    outline = [{"id": f"s{i}", "title": f"Section {i}: how tooling costs shape adoption", "type": "slide",
+                "bullets": ["Context", "Evidence", "Takeaway"]} for i in range(args.items)]
+
+    print(f"{args.items} items, {args.runs} runs, parallelism {args.parallelism}, fake latency "
+          f"{args.latency * 1000:.0f}ms + {args.token_latency * 1000:.1f}ms/token, bad items {args.bad_item_rate:.0%}\n")
+    print(f"{'mode':>8} {'p50 ms':>8} {'calls':>6} {'in tokens':>10} {'out tokens':>11} {'retried':>8} {'failed':>7}")
+    for mode in ("items", "outline"):
+        latencies = []
+        calls0, tokens0 = server.calls, _tokens(base)
+        retried = failed = 0
+        for _ in range(args.runs):
+            payload = {"userId": "bench", "projectId": "bench", "docType": "pptx", "mainTopic": "Tooling adoption",
+                       "outlineItems": outline, "parallelism": args.parallelism, "mode": mode, "no_cache": True}
+            t0 = time.perf_counter()
+            result = _batch(base, payload)
+            latencies.append(time.perf_counter() - t0)
+            retried += result.get("retried", 0)
+            failed += result["failed"]
+        tokens = _tokens(base)
+        row = _summary(latencies)
+        print(f"{mode:>8} {row['p50_ms']:>8.0f} {(server.calls - calls0) / args.runs:>6.1f} "
+              f"{(tokens['in'] - tokens0['in']) / args.runs:>10.0f} {(tokens['out'] - tokens0['out']) / args.runs:>11.0f} "
+              f"{retried / args.runs:>8.1f} {failed:>7}")
+
+
+if __name__ == "__main__":
+    main_cli()
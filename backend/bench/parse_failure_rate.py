@@ -0,0 +1,86 @@
+# backend/bench/parse_failure_rate.py
+"""
+Parse-failure rate of recorded model responses, old path vs new path.
+
+    python bench/parse_failure_rate.py [--file bench/recorded_responses.jsonl]
+
+Each line of the recordings file is {"path": "raw_json" | "native_schema",
+"text": <response text>, "finish_reason": <optional>}. raw_json entries
+are free-text responses (the old fallback: json.loads on resp.text);
+native_schema entries are response_schema responses validated straight
+into SlideItem. The bundled file is a small sample of typical outputs
+(code fences, prose preambles, trailing commas, truncation at
+max_output_tokens); append real captures to it to track the rate over
+time.
+
+For each path the report shows how often the first parse fails, and how
+often the response is still unusable after local json_repair. Responses
+the model stopped at max_output_tokens (finish_reason MAX_TOKENS) are
+counted and listed on stderr: those are budget problems, not parse
+problems, and mean OUTPUT_TOKEN_BUDGETS or the thinking budget
+(GENAI_THINKING_BUDGET, thinking_budget in the model config) is too
+tight for that kind of item.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from generation_pipeline import repair_json_text  # noqa: E402
+from SlideItem import SlideItem  # noqa: E402
+
+
+def _parse(path: str, text: str):
+    if path == "native_schema":
+        return SlideItem.model_validate_json(text).model_dump()
+    parsed = json.loads(text)
+    if not isinstance(parsed, dict):
+        raise ValueError("not an object")
+    return parsed
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default=os.path.join(os.path.dirname(__file__), "recorded_responses.jsonl"))
+    args = parser.parse_args()
+
+    counts = defaultdict(lambda: {"total": 0, "max_tokens": 0, "parse_failures": 0, "after_repair_failures": 0})
+    with open(args.file, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            c = counts[rec["path"]]
+            c["total"] += 1
+            if rec.get("finish_reason") == "MAX_TOKENS":
+                c["max_tokens"] += 1
+                print(f"{args.file}:{lineno}: {rec['path']} response cut off at MAX_TOKENS "
+                      f"({len(rec['text'])} chars)", file=sys.stderr)
+            try:
+                _parse(rec["path"], rec["text"])
+                continue
+            except ValueError:
+                c["parse_failures"] += 1
+            try:
+                repaired = repair_json_text(rec["text"])
+                if not isinstance(repaired, dict):
+                    raise ValueError("not an object")
+            except ValueError:
+                c["after_repair_failures"] += 1
+
+    report = {}
+    for path, c in counts.items():
+        report[path] = {
+            **c,
+            "max_tokens_rate": round(c["max_tokens"] / c["total"], 3),
+            "parse_failure_rate": round(c["parse_failures"] / c["total"], 3),
+            "after_repair_failure_rate": round(c["after_repair_failures"] / c["total"], 3),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
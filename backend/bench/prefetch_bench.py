@@ -0,0 +1,111 @@
+# backend/bench/prefetch_bench.py
+"""
+/generate click latency with and without outline prefetch, against the
+fake Gemini server.
+
+    python bench/prefetch_bench.py [--items 12] [--latency 0.5]
+
+Two projects with the same --items outline entries (different topics, so
+neither warms the other's cache) are saved via PUT /projects, one with
+"prefetch": true. Once the prefetch queue is drained, every entry is
+"clicked" (POST /generate, as OutlineView sends it) in both projects.
+Reported per project: p50 / p95 click latency and model calls made.
+
+Then cancel-on-edit: a third project is saved with prefetch and saved
+again right away with half its entries edited; the re-save's answer and
+prefetch's /cache/stats counters are printed.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port, _start_app  # noqa: E402
+from suite import _summary  # noqa: E402
+
+
+def _call(url: str, payload=None, method: str = "GET"):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"}, method=method)
+    with urllib.request.urlopen(req, timeout=120) as resp:
+        return json.loads(resp.read())
+
+
+def _outline(n: int):
+    return [{"id": f"s{i}", "title": f"Section {i}", "type": "slide"} for i in range(n)]
+
+
+def _model_calls(base: str) -> int:
+    stats = _call(f"{base}/pipeline/stats")
+    # per-strategy entries are the ones with a call count
+    return sum(s["calls"] for s in stats.values() if isinstance(s, dict) and "calls" in s)
+
+
+def _drain(base: str, project_id: str, timeout_s: float = 300) -> None:
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        status = _call(f"{base}/projects/{project_id}/prefetch?userId=bench")
+        if not status["queued"] and not status["running"]:
+            return
+        time.sleep(0.05)
+    sys.exit("prefetch did not drain")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency (s)")
+    args = parser.parse_args()
+
+    _, fake_url = start_fake_gemini(args.latency)
+    os.environ.update({
+        "GENAI_API_KEY": "fake-key",
+        "GENAI_BASE_URL": fake_url,
+        "GENAI_QPS": "0",
+        "GENAI_TPM": "0",
+        "USER_RATE_PER_MIN": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    port = _free_port()
+    _start_app(port)
+    base = f"http://127.0.0.1:{port}"
+
+    print(f"{args.items} outline entries, fake latency {args.latency * 1000:.0f}ms\n")
+    print(f"{'project':>10} {'p50 ms':>8} {'p95 ms':>8} {'model calls':>12}")
+    for project_id, prefetch in (("cold", False), ("prefetched", True)):
+        project = {"docType": "pptx", "mainTopic": f"Bench topic {project_id}", "outline": _outline(args.items)}
+        calls0 = _model_calls(base)
+        _call(f"{base}/projects/{project_id}", {"userId": "bench", "projects": project, "prefetch": prefetch}, "PUT")
+        if prefetch:
+            _drain(base, project_id)
+        latencies = []
+        for entry in project["outline"]:
+            payload = {"userId": "bench", "projectId": project_id, "docType": project["docType"],
+                       "mainTopic": project["mainTopic"], "outlineItem": entry, "projects": project, "temperature": 0.2}
+            t0 = time.perf_counter()
+            _call(f"{base}/generate", payload, "POST")
+            latencies.append(time.perf_counter() - t0)
+        row = _summary(latencies)
+        print(f"{project_id:>10} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {_model_calls(base) - calls0:>12}")
+
+    # cancel-on-edit: save, then edit half the entries before prefetch gets to them
+    project = {"docType": "pptx", "mainTopic": "Bench topic edits", "outline": _outline(args.items)}
+    _call(f"{base}/projects/edits", {"userId": "bench", "projects": project, "prefetch": True}, "PUT")
+    edited = _outline(args.items)
+    for entry in edited[::2]:
+        entry["title"] += " (edited)"
+    result = _call(f"{base}/projects/edits", {"userId": "bench", "projects": {**project, "outline": edited},
+                                              "prefetch": True}, "PUT")
+    _drain(base, "edits")
+    print(f"\nre-save with {len(edited[::2])} entries edited: {result['prefetch']}")
+    print("prefetch:", json.dumps({k: v for k, v in _call(f"{base}/cache/stats")["prefetch"].items() if k != "budget"}))
+
+
+if __name__ == "__main__":
+    main_cli()
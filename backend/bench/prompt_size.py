@@ -0,0 +1,142 @@
+# backend/bench/prompt_size.py
+"""
+Prompt-size regression check for prompt_builder.
+
+    python bench/prompt_size.py            # compare against the baseline, exit 1 on regression
+    python bench/prompt_size.py --update   # rewrite bench/prompt_size_baseline.json
+
+Builds the /generate and /regenerate prompts for a fixed set of cases and
+reports estimated tokens for the previous inline prompts (Python repr,
+full meta) next to the current builder. A case fails when its current
+size grows more than --tolerance over the recorded baseline or exceeds
+the input budget. Run it after touching prompt wording or serialization.
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from prompt_builder import (  # noqa: E402
+    PROMPT_INPUT_TOKEN_BUDGET,
+    build_generate_prompt,
+    build_regenerate_prompt,
+    count_tokens,
+)
+
+BASELINE = os.path.join(os.path.dirname(__file__), "prompt_size_baseline.json")
+
+
+# the prompts as they were built inline in main.py before prompt_builder
+def legacy_generate_prompt(doc_type, main_topic, scaffold, hints):
+    return (
+        f"Project docType: {doc_type}\n"
+        f"Main topic: {main_topic}\n"
+        f"Scaffold (outline item): {scaffold}\n"
+        f"Hints: {hints}\n\n"
+        "Return a single strictly JSON object only with the following keys: id, type, layout, title, bullets, notes, images, meta. "
+        "Keep bullets concise unless hints request otherwise. Make sure to include all necessary delimeters for proper JSON. DO NOT MISS ANY DELIMETERS. For `meta`, include generator metadata keys only. "
+        "If you cannot supply images, set images to an empty array. No commentary — JSON only."
+    )
+
+
+def legacy_regenerate_prompt(original_item, feedback):
+    return (
+        "You are given a JSON object representing a slide/section. Return a single JSON object ONLY that preserves the same top-level keys "
+        "and the same `id`, but updates the values according to the user's feedback. Do not wrap the JSON in text.\n\n"
+        "Make sure you do exactly as the user says and keep in mind the original content. Always create new content in context to the original content unless otherwise stated by the user"
+        f"Original: {original_item}\n\n"
+        f"User feedback: {feedback}\n\n"
+        "Apply changes necessary to satisfy the feedback. Keep bullets concise."
+    )
+
+
+def _item(n_bullets: int, cycles: int) -> dict:
+    """A generated item after `cycles` regenerations, with the meta the server stamps on it."""
+    item = {
+        "id": 1732200000000,
+        "type": "slide",
+        "layout": "title+bullets",
+        "title": "Market sizing and growth drivers",
+        "bullets": [f"Driver {i}: adoption in mid-market teams grows as tooling costs fall" for i in range(n_bullets)],
+        "notes": ["Mention the 2024 survey numbers."],
+        "images": [],
+        "meta": {"generated_at": 1732200000000, "generator": "gemini-2.5-flash", "cache_hit": False, "strategy": "native_schema"},
+    }
+    for c in range(cycles):
+        item["meta"].update({
+            "regenerated_at": 1732200000000 + c,
+            "regeneration_feedback": f"make it punchier, round {c}",
+            "raw_response_preview": str(item)[:200],
+        })
+    return item
+
+
+def cases():
+    scaffold = {"id": 17, "title": "Market sizing and growth drivers", "layout": "title+bullets", "bullets": [], "notes": [], "images": []}
+    hints = {"tone": "executive", "audience": "board", "bulletCount": 5}
+    big = {**scaffold, "notes": ["x" * 4000], "bullets": ["y" * 500] * 40}
+    return {
+        "generate_scaffold": (
+            lambda: legacy_generate_prompt("pptx", "Acme go-to-market", scaffold, hints),
+            lambda: build_generate_prompt("pptx", "Acme go-to-market", scaffold, hints),
+        ),
+        "generate_outline_entry_with_content": (
+            lambda: legacy_generate_prompt("docx", "Acme go-to-market", {**scaffold, "content": {"generated": _item(5, 1)}}, hints),
+            lambda: build_generate_prompt("docx", "Acme go-to-market", {**scaffold, "content": {"generated": _item(5, 1)}}, hints),
+        ),
+        "regenerate_first": (
+            lambda: legacy_regenerate_prompt(_item(5, 0), "shorter bullets"),
+            lambda: build_regenerate_prompt(_item(5, 0), "shorter bullets"),
+        ),
+        "regenerate_after_5_cycles": (
+            lambda: legacy_regenerate_prompt(_item(5, 5), "shorter bullets"),
+            lambda: build_regenerate_prompt(_item(5, 5), "shorter bullets"),
+        ),
+        "generate_oversized_context": (
+            lambda: legacy_generate_prompt("pptx", "Acme go-to-market", big, hints),
+            lambda: build_generate_prompt("pptx", "Acme go-to-market", big, hints),
+        ),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="record current sizes as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="allowed growth over baseline (fraction)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE) and not args.update:
+        with open(BASELINE, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    current, failures = {}, []
+    print(f"{'case':40} {'legacy':>8} {'now':>8} {'saved':>7} {'baseline':>9}")
+    for name, (legacy, new) in cases().items():
+        old_tokens, new_tokens = count_tokens(legacy()), count_tokens(new())
+        current[name] = new_tokens
+        recorded = baseline.get(name)
+        saved = 1 - new_tokens / old_tokens if old_tokens else 0.0
+        print(f"{name:40} {old_tokens:8d} {new_tokens:8d} {saved:7.0%} {recorded if recorded is not None else '-':>9}")
+        if new_tokens > PROMPT_INPUT_TOKEN_BUDGET:
+            failures.append(f"{name}: {new_tokens} tokens exceeds budget {PROMPT_INPUT_TOKEN_BUDGET}")
+        if recorded is not None and new_tokens > recorded * (1 + args.tolerance):
+            failures.append(f"{name}: {new_tokens} tokens vs baseline {recorded}")
+
+    if args.update:
+        with open(BASELINE, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {BASELINE}")
+        return
+
+    if failures:
+        print("\nprompt size regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("\nok")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,101 @@
+# backend/bench/regenerate_patch.py
+"""
+Full vs patch-mode /regenerate against the fake Gemini server.
+
+    python bench/regenerate_patch.py [--runs 20] [--bullets 12] [--token-latency 0.005]
+
+A project with one dense slide (--bullets bullets) is uploaded once, then
+the same small edit ("shorten bullet 2") is requested --runs times in each
+mode. The fake model charges --token-latency seconds per output token on
+top of --latency, like a real model decoding, and answers patch-mode
+requests with a one-edit set. Reported per mode: p50 / p95 latency, model
+output tokens per call (from /metrics) and response size.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port, _start_app  # noqa: E402
+from suite import _summary  # noqa: E402
+
+_OUT_TOKENS_RE = re.compile(r'^paradocs_llm_tokens_total\{direction="out"[^}]*\} (\S+)$', re.M)
+
+
+def _request(url: str, payload: dict, method: str = "POST"):
+    return urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method=method,
+    )
+
+
+def _out_tokens(base: str) -> float:
+    with urllib.request.urlopen(f"{base}/metrics", timeout=30) as resp:
+        return sum(float(v) for v in _OUT_TOKENS_RE.findall(resp.read().decode("utf-8")))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--bullets", type=int, default=12, help="bullets on the slide being edited")
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed fake model latency (s)")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="fake decode time per output token (s)")
+    args = parser.parse_args()
+
+    slide = {
+        "id": 1, "type": "slide", "layout": "title+bullets", "title": "Adoption drivers",
+        "bullets": [f"Point {i}: adoption grows as tooling costs fall across teams" for i in range(args.bullets)],
+        "notes": ["Walk through the drivers in order"], "images": [],
+    }
+    # the full-mode answer is a slide of the same size as the one being edited
+    _, fake_url = start_fake_gemini(args.latency, output_bytes=len(json.dumps(slide)),
+                                    token_latency_s=args.token_latency)
+    os.environ.update({
+        "GENAI_API_KEY": "fake-key",
+        "GENAI_BASE_URL": fake_url,
+        "GENAI_QPS": "0",
+        "GENAI_TPM": "0",
+        "USER_RATE_PER_MIN": "0",
+    })
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    port = _free_port()
+    _start_app(port)
+    base = f"http://127.0.0.1:{port}"
+    project = {"docType": "pptx", "mainTopic": "Tooling", "outline": [slide]}
+    with urllib.request.urlopen(_request(f"{base}/projects/bench", {"userId": "bench", "projects": project}, "PUT")):
+        pass
+
+    print(f"slide: {args.bullets} bullets, {len(json.dumps(slide))} bytes  runs: {args.runs}  "
+          f"fake latency: {args.latency * 1000:.0f}ms + {args.token_latency * 1000:.1f}ms/token\n")
+    print(f"{'mode':>6} {'p50 ms':>8} {'p95 ms':>8} {'out tokens/call':>16} {'response bytes':>15}")
+    for mode in ("full", "patch"):
+        latencies = []
+        size = 0
+        tokens0 = _out_tokens(base)
+        for _ in range(args.runs):
+            payload = {"userId": "bench", "projectId": "bench", "item_id": "1", "feedback_text": "shorten bullet 2",
+                       "mode": mode, "no_cache": True}
+            t0 = time.perf_counter()
+            with urllib.request.urlopen(_request(f"{base}/regenerate", payload), timeout=120) as resp:
+                body = resp.read()
+            latencies.append(time.perf_counter() - t0)
+            size = len(body)
+            if mode == "patch" and json.loads(body)["mode"] != "patch":
+                sys.exit("patch mode fell back to a full regeneration")
+            # start every run from the same slide
+            with urllib.request.urlopen(_request(f"{base}/projects/bench", {"userId": "bench", "projects": project}, "PUT")):
+                pass
+        tokens = (_out_tokens(base) - tokens0) / args.runs
+        row = _summary(latencies)
+        print(f"{mode:>6} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {tokens:>16.0f} {size:>15}")
+
+
+if __name__ == "__main__":
+    main_cli()
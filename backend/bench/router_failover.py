@@ -0,0 +1,102 @@
+# backend/bench/router_failover.py
+"""
+Model routing and failover against two fake Gemini endpoints.
+
+    python bench/router_failover.py
+
+A temporary router config points "primary-model" (2 slots) at one fake
+server and "backup-model" at another, with a "lite" tier for title slides.
+
+Phase 1 checks routing: a title slide goes to the lite tier, a bullets
+slide to the default tier's primary.
+Phase 2 saturates the primary (slow responses, 2 slots): requests that
+can't get a slot within queue_wait_s fail over to the backup.
+Phase 3 makes the primary answer 503: after retries its circuit opens and
+everything is served by the backup without waiting on the primary.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port, _start_app  # noqa: E402
+
+
+async def _fire(base: str, n: int, layout: str = "title+bullets") -> Counter:
+    async with httpx.AsyncClient(base_url=base, timeout=120) as client:
+        async def one(i):
+            r = await client.post("/generate", json={
+                "userId": "bench", "docType": "pptx", "mainTopic": "Routing", "noCache": True,
+                "outlineItem": {"id": i, "title": f"Slide {i} " + "x" * 400, "layout": layout},
+            })
+            return r.json().get("meta", {}).get("generator") if r.status_code == 200 else f"HTTP {r.status_code}"
+        return Counter(await asyncio.gather(*(one(i) for i in range(n))))
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    primary, primary_url = start_fake_gemini(0.05)
+    _, backup_url = start_fake_gemini(0.05)
+    config = {
+        "models": {
+            "primary-model": {"max_concurrency": 2, "base_url": primary_url},
+            "backup-model": {"max_concurrency": 16, "base_url": backup_url},
+        },
+        "tiers": {"main": ["primary-model", "backup-model"], "lite": ["backup-model"]},
+        "default_tier": "main",
+        "rules": [{"tier": "lite", "doc_type": "pptx", "layouts": ["title"]}],
+        "failover": {"queue_wait_s": 0.2},
+    }
+    config_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+    json.dump(config, config_file)
+    config_file.close()
+    os.environ.update({
+        "GENAI_API_KEY": "fake-key",
+        "GENAI_BASE_URL": backup_url,
+        "MODEL_ROUTER_CONFIG": config_file.name,
+        "GENAI_QPS": "0",
+        "GENAI_TPM": "0",
+        "GENAI_CACHE_ENABLED": "0",
+        "USER_RATE_PER_MIN": "0",
+        "GENAI_RETRY_BASE_DELAY_S": "0.02",
+        "GENAI_CB_FAILURE_THRESHOLD": "3",
+        "GENAI_CB_RESET_S": "30",
+    })
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    port = _free_port()
+    _start_app(port)
+    base = f"http://127.0.0.1:{port}"
+
+    print("phase 1, routing:")
+    print("  title slide   ->", dict(asyncio.run(_fire(base, 1, layout="title"))))
+    print("  bullets slide ->", dict(asyncio.run(_fire(base, 1))))
+
+    primary.profile["latency_s"] = 1.0
+    print(f"phase 2, primary slow (1s, 2 slots), {args.requests} concurrent:")
+    print("  served by", dict(asyncio.run(_fire(base, args.requests))))
+
+    primary.profile["latency_s"] = 0.05
+    primary.faults.update({"error_rate": 1.0, "error_status": 503, "retry_after": "0"})
+    print(f"phase 3, primary returns 503, {args.requests} concurrent:")
+    print("  served by", dict(asyncio.run(_fire(base, args.requests))))
+
+    stats = httpx.get(f"{base}/llm/health").json()
+    print("\nrouter:", json.dumps(stats["router"], indent=2))
+    print("breakers:", json.dumps(stats["breakers"], indent=2))
+    os.unlink(config_file.name)
+
+
+if __name__ == "__main__":
+    main_cli()
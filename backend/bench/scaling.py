@@ -0,0 +1,160 @@
+# backend/bench/scaling.py
+"""
+Throughput vs worker count for the multi-process runner (serve.py).
+
+    python bench/scaling.py [--workers 1,2,4] [--requests 2000] [--concurrency 64]
+
+For each worker count: serve.py starts that many workers sharing one
+SHARED_STATE_DB file, backed by the fake Gemini server. Load comes from
+--clients separate processes (so the load generator isn't the bottleneck).
+Every request is an uncached /generate, so each one makes exactly one
+model call. Reported per worker count: requests/s, speedup over the first
+row, p50/p95 latency, and model calls/s as seen by the fake server.
+
+--qps sets GENAI_QPS. With shared state the limit holds for all workers
+together, so model calls/s stays near --qps however many workers run.
+Without it each worker would get the full quota.
+
+Scaling is bounded by the CPU count printed first. On a single core the
+extra workers mostly add contention.
+"""
+import argparse
+import asyncio
+import multiprocessing as mp
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.abspath(os.path.join(BENCH_DIR, ".."))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port  # noqa: E402
+from suite import _summary  # noqa: E402
+
+
+def _start_serve(workers: int, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "serve.py", "--server", "uvicorn", "--workers", str(workers),
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 60
+    ready = 0
+    while time.time() < deadline and ready < workers * 4:
+        if proc.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {proc.returncode}")
+        try:
+            # a few answers in a row, so late workers have had time to come up
+            ready += httpx.get(f"http://127.0.0.1:{port}/cache/stats", timeout=1).status_code == 200
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    time.sleep(0.5)
+    return proc
+
+
+def _stop(proc: subprocess.Popen) -> float:
+    t0 = time.perf_counter()
+    proc.send_signal(signal.SIGTERM)
+    try:
+        proc.wait(timeout=60)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    return time.perf_counter() - t0
+
+
+def _client(base: str, first_id: int, n: int, concurrency: int, out: "mp.Queue") -> None:
+    async def run():
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        latencies: List[float] = []
+        errors = 0
+        # distinct ids across clients, or single-flight would merge identical prompts
+        todo = iter(range(first_id, first_id + n))
+        async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+            async def worker():
+                nonlocal errors
+                for i in todo:
+                    t0 = time.perf_counter()
+                    r = await client.post("/generate", json={
+                        "userId": "bench", "docType": "pptx", "mainTopic": "Scaling", "noCache": True,
+                        "outlineItem": {"id": i, "title": f"Slide {i}", "layout": "title+bullets"},
+                    })
+                    if r.status_code == 200:
+                        latencies.append(time.perf_counter() - t0)
+                    else:
+                        errors += 1
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors
+
+    out.put(asyncio.run(run()))
+
+
+def _drive(base: str, requests: int, concurrency: int, clients: int) -> Dict[str, Any]:
+    out: "mp.Queue" = mp.Queue()
+    per_client = [requests // clients + (1 if i < requests % clients else 0) for i in range(clients)]
+    procs = [mp.Process(target=_client, args=(base, sum(per_client[:i]), n, max(1, concurrency // clients), out))
+             for i, n in enumerate(per_client)]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    wall = time.perf_counter() - t0
+    for p in procs:
+        p.join()
+    latencies = [x for lat, _ in results for x in lat]
+    return {"ok": len(latencies), "errors": sum(e for _, e in results), "wall_s": wall,
+            "rps": len(latencies) / wall if wall else 0.0, **_summary(latencies)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=2, help="load generator processes")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake model latency (s)")
+    parser.add_argument("--output-bytes", type=int, default=2000, help="fake slide JSON size")
+    parser.add_argument("--qps", type=float, default=0.0, help="GENAI_QPS for every worker together (0 = off)")
+    args = parser.parse_args()
+
+    fake, fake_url = start_fake_gemini(args.latency, output_bytes=args.output_bytes)
+    print(f"CPUs: {os.cpu_count()}  requests: {args.requests}  concurrency: {args.concurrency}  "
+          f"fake latency: {args.latency * 1000:.0f}ms  GENAI_QPS: {args.qps or 'off'}\n")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7} {'model calls/s':>14} {'stop s':>7}")
+
+    first_rps = None
+    for workers in [int(w) for w in args.workers.split(",") if w.strip()]:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {
+                **os.environ,
+                "GENAI_API_KEY": "fake-key",
+                "GENAI_BASE_URL": fake_url,
+                "GENAI_QPS": str(args.qps),
+                "GENAI_TPM": "0",
+                "SHARED_STATE_DB": os.path.join(tmp, "shared.db"),
+                "LOG_LEVEL": "WARNING",
+                "GENAI_MAX_CONCURRENCY": "256",
+            }
+            port = _free_port()
+            proc = _start_serve(workers, port, env)
+            try:
+                calls0 = fake.calls
+                row = _drive(f"http://127.0.0.1:{port}", args.requests, args.concurrency, args.clients)
+                model_rate = (fake.calls - calls0) / row["wall_s"]
+            finally:
+                stop_s = _stop(proc)
+        first_rps = first_rps or row["rps"]
+        print(f"{workers:>7} {row['rps']:>9.1f} {row['rps'] / first_rps:>7.2f}x {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['errors']:>7} {model_rate:>14.1f} {stop_s:>7.2f}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,78 @@
+# backend/bench/stream_ttfb.py
+"""
+Time-to-first-content for the streaming endpoints against the fake Gemini
+server: compares /generate/batch (everything at once) with
+/generate/batch/stream (first item as soon as it is ready).
+
+    python bench/stream_ttfb.py --items 12 --parallelism 4 --latency 0.5
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port, _start_app  # noqa: E402
+
+
+def _post(url: str, payload: dict):
+    return urllib.request.Request(
+        url, data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"}, method="POST",
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=12)
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    _, fake_url = start_fake_gemini(args.latency)
+    os.environ["GENAI_API_KEY"] = "fake-key"
+    os.environ["GENAI_BASE_URL"] = fake_url
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    port = _free_port()
+    _start_app(port)
+    base = f"http://127.0.0.1:{port}"
+    payload = {
+        "userId": "bench-user",
+        "docType": "pptx",
+        "mainTopic": "Streaming",
+        "outlineItems": [{"id": i, "title": f"Slide {i}"} for i in range(args.items)],
+        "parallelism": args.parallelism,
+        # both runs must reach the model; the second would otherwise be all cache hits
+        "noCache": True,
+    }
+
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(_post(f"{base}/generate/batch", payload), timeout=300) as resp:
+        resp.read()
+    batch_total = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    first_item = None
+    with urllib.request.urlopen(_post(f"{base}/generate/batch/stream", payload), timeout=300) as resp:
+        for line in resp:
+            if first_item is None and json.loads(line).get("event") == "item":
+                first_item = time.perf_counter() - t0
+    stream_total = time.perf_counter() - t0
+
+    print(json.dumps({
+        "items": args.items,
+        "parallelism": args.parallelism,
+        "fake_latency_s": args.latency,
+        "batch_time_to_content_s": round(batch_total, 3),
+        "stream_time_to_first_item_s": round(first_item or 0.0, 3),
+        "stream_total_s": round(stream_total, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main_cli()
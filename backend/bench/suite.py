@@ -0,0 +1,307 @@
+# backend/bench/suite.py
+"""
+Offline load-test suite: the API as a real uvicorn process, backed by the
+fake Gemini server, driven at several concurrency levels.
+
+    python bench/suite.py                                   # all scenarios
+    python bench/suite.py --scenarios generate,regenerate --concurrency 1,16
+    python bench/suite.py --latency 0.2 --jitter 0.1 --error-rate 0.05 --output-bytes 4000
+    python bench/suite.py --compare bench/results/<sha>.json
+
+Scenarios:
+
+  generate         /generate, unique items with noCache (every call hits the model)
+  generate_cached  /generate, one repeated body (response cache hits)
+  regenerate       /regenerate by projectId + item_id against an uploaded project
+  outline          /generate/batch with --outline-items items per request
+
+Each (scenario, concurrency) row reports p50/p95/p99/mean/max latency,
+RPS, error count and the server's RSS (current and peak). Results are
+written to bench/results/<git sha>.json (or --out). --compare loads an
+earlier file and exits 1 when a row's p95 rises or its RPS drops by more
+than --tolerance. The rate limiter is off (GENAI_QPS=0, GENAI_TPM=0) so
+the numbers measure the app, not the quota; pass --env to override that
+or any other setting.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_gemini import start_fake_gemini  # noqa: E402
+from load_generate import _free_port  # noqa: E402
+
+SCENARIOS = ("generate", "generate_cached", "regenerate", "outline")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+
+# ---------------------- server process --------------------------------------
+def _start_server(port: int, fake_url: str, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "GENAI_API_KEY": "fake-key",
+        "GENAI_BASE_URL": fake_url,
+        "GENAI_QPS": "0",
+        "GENAI_TPM": "0",
+        "LOG_LEVEL": "WARNING",
+        **extra_env,
+    }
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/cache/stats", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start within 60s")
+
+
+def _rss_mb(pid: int) -> Dict[str, Optional[float]]:
+    """VmRSS / VmHWM from /proc (Linux); None elsewhere."""
+    out: Dict[str, Optional[float]] = {"rss_mb": None, "rss_peak_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    out["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    out["rss_peak_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return out
+
+
+# ---------------------- scenarios -------------------------------------------
+def _outline(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": i,
+            "title": f"Slide {i}",
+            "content": {"generated": {
+                "id": i, "type": "slide", "layout": "title+bullets", "title": f"Slide {i}",
+                "bullets": [f"Point {j} on slide {i}" for j in range(5)], "notes": [], "images": [], "meta": {},
+            }},
+        }
+        for i in range(n)
+    ]
+
+
+class Scenario:
+    def __init__(self, name: str, args):
+        self.name = name
+        self.args = args
+        self.seq = 0
+
+    async def setup(self, client: httpx.AsyncClient) -> None:
+        if self.name == "regenerate":
+            project = {"docType": "pptx", "mainTopic": "Benchmarks", "outline": _outline(self.args.outline_items)}
+            r = await client.put("/projects/bench-project", json={"projects": project, "userId": "bench-user"})
+            r.raise_for_status()
+
+    def request(self) -> Dict[str, Any]:
+        """{"path", "json"} for the next POST."""
+        self.seq += 1
+        n = self.seq
+        base = {"userId": "bench-user", "docType": "pptx", "mainTopic": "Benchmarks"}
+        if self.name == "generate":
+            return {"path": "/generate", "json": {**base, "outlineItem": {"id": n, "title": f"Slide {n}"}, "noCache": True}}
+        if self.name == "generate_cached":
+            return {"path": "/generate", "json": {**base, "outlineItem": {"id": 1, "title": "Cached slide"}}}
+        if self.name == "regenerate":
+            return {"path": "/regenerate", "json": {
+                "projectId": "bench-project", "userId": "bench-user",
+                "item_id": str(n % self.args.outline_items), "feedback_text": f"shorter, take {n}", "noCache": True,
+            }}
+        items = [{"id": i, "title": f"Slide {i}"} for i in range(self.args.outline_items)]
+        return {"path": "/generate/batch", "json": {
+            **base, "mainTopic": f"Outline {n}", "outlineItems": items, "parallelism": 8, "noCache": True,
+        }}
+
+    def total(self, concurrency: int) -> int:
+        requests = self.args.outline_requests if self.name == "outline" else self.args.requests
+        return max(requests, concurrency)
+
+
+async def _one(client: httpx.AsyncClient, req: Dict[str, Any]) -> Optional[float]:
+    t0 = time.perf_counter()
+    try:
+        r = await client.post(req["path"], json=req["json"])
+        r.read()
+        ok = r.status_code < 400 and not (req["path"] == "/generate/batch" and r.json().get("failed"))
+    except httpx.HTTPError:
+        ok = False
+    elapsed = time.perf_counter() - t0
+    return elapsed if ok else None
+
+
+async def _run_level(base_url: str, scenario: Scenario, concurrency: int) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        await scenario.setup(client)
+        for _ in range(2):  # warm-up, not recorded
+            await _one(client, scenario.request())
+
+        total = scenario.total(concurrency)
+        queue = iter(range(total))
+        latencies: List[float] = []
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for _ in queue:
+                elapsed = await _one(client, scenario.request())
+                if elapsed is None:
+                    errors += 1
+                else:
+                    latencies.append(elapsed)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+
+    return {"requests": total, "ok": len(latencies), "errors": errors, "wall_s": round(wall, 3),
+            "rps": round(len(latencies) / wall, 2) if wall else 0.0, **_summary(latencies)}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    # nearest rank
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _summary(latencies: List[float]) -> Dict[str, float]:
+    values = sorted(latencies)
+    ms = lambda s: round(s * 1000, 2)  # noqa: E731
+    return {
+        "p50_ms": ms(_percentile(values, 50)),
+        "p95_ms": ms(_percentile(values, 95)),
+        "p99_ms": ms(_percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else 0.0,
+        "max_ms": ms(values[-1]) if values else 0.0,
+    }
+
+
+# ---------------------- reporting -------------------------------------------
+def _git_sha() -> str:
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=BACKEND_DIR).returncode != 0
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(rows: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["scenario"], r["concurrency"]): r for r in json.load(f)["results"]}
+    failures = []
+    print(f"\nvs {baseline_path} ({tolerance:.0%} tolerance)")
+    for row in rows:
+        base = baseline.get((row["scenario"], row["concurrency"]))
+        if base is None:
+            continue
+        p95_delta = row["p95_ms"] / base["p95_ms"] - 1 if base["p95_ms"] else 0.0
+        rps_delta = row["rps"] / base["rps"] - 1 if base["rps"] else 0.0
+        print(f"  {row['scenario']:16} c={row['concurrency']:<4} p95 {p95_delta:+7.1%}  rps {rps_delta:+7.1%}")
+        if p95_delta > tolerance:
+            failures.append(f"{row['scenario']} c={row['concurrency']}: p95 {base['p95_ms']} -> {row['p95_ms']} ms")
+        if rps_delta < -tolerance:
+            failures.append(f"{row['scenario']} c={row['concurrency']}: rps {base['rps']} -> {row['rps']}")
+    return failures
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated client concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="requests per level (single-item scenarios)")
+    parser.add_argument("--outline-requests", type=int, default=8, help="requests per level for `outline`")
+    parser.add_argument("--outline-items", type=int, default=40, help="items per outline / uploaded project")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model latency (s)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="max extra random fake latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake model calls that fail with 503")
+    parser.add_argument("--output-bytes", type=int, default=0, help="target size of the fake slide JSON")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra server environment")
+    parser.add_argument("--out", help="results file (default bench/results/<git sha>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95 growth / RPS drop (fraction)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    levels = [int(c) for c in args.concurrency.split(",")]
+    extra_env = dict(kv.split("=", 1) for kv in args.env)
+
+    fake, fake_url = start_fake_gemini(args.latency, error_rate=args.error_rate, retry_after="0",
+                                       jitter_s=args.jitter, output_bytes=args.output_bytes)
+    port = _free_port()
+    proc = _start_server(port, fake_url, extra_env)
+    base_url = f"http://127.0.0.1:{port}"
+
+    rows: List[Dict[str, Any]] = []
+    try:
+        print(f"{'scenario':16} {'conc':>4} {'ok':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'rps':>8} {'rss MB':>7}")
+        for name in scenarios:
+            scenario = Scenario(name, args)
+            for level in levels:
+                row = {"scenario": name, "concurrency": level,
+                       **asyncio.run(_run_level(base_url, scenario, level)), **_rss_mb(proc.pid)}
+                rows.append(row)
+                print(f"{name:16} {level:4d} {row['ok']:5d} {row['errors']:4d} {row['p50_ms']:8.1f} "
+                      f"{row['p95_ms']:8.1f} {row['p99_ms']:8.1f} {row['rps']:8.1f} {row['rss_mb'] or 0:7.1f}")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        fake.shutdown()
+
+    result = {
+        "meta": {
+            "git": _git_sha(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "fake": {"latency_s": args.latency, "jitter_s": args.jitter, "error_rate": args.error_rate,
+                     "output_bytes": args.output_bytes},
+            "env": extra_env,
+        },
+        "results": rows,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"{result['meta']['git']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+        f.write("\n")
+    print(f"\nresults written to {out}")
+
+    if args.compare:
+        failures = _compare(rows, args.compare, args.tolerance)
+        if failures:
+            print("\nregressions:\n  " + "\n  ".join(failures))
+            sys.exit(1)
+        print("\nok")
+
+
+if __name__ == "__main__":
+    main_cli()
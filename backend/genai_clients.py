@@ -0,0 +1,102 @@
+# backend/genai_clients.py
+"""
+Shared google-genai clients, created on first use.
+
+Importing google.genai takes most of a second, so nothing here touches the
+SDK until a client is actually needed:
+
+* get_client(model=None): the client for the model's endpoint (its
+  model_router base_url, else GENAI_BASE_URL). One client per endpoint for
+  the whole process. None when GENAI_API_KEY is unset or the SDK is
+  missing; the reason is logged once.
+* ensure_client(model=None): the same from async code. A client that
+  still has to be built (SDK import included) is built in a thread, so
+  the event loop never blocks on the import or on _lock.
+* genai_types(): the google.genai.types module, imported on first use.
+* warm_up_clients(): import the SDK and build every configured client now.
+  The app lifespan runs it in a thread (via generation_pipeline.warm_up)
+  unless GENAI_WARMUP=0, so a worker pays at boot, before it takes
+  traffic, rather than on its first requests.
+"""
+import asyncio
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from model_router import model_router
+
+logger = logging.getLogger("paradocs-gen")
+
+GENAI_API_KEY = os.getenv("GENAI_API_KEY")
+# Optional override so the client can be pointed at a local/fake Gemini endpoint
+GENAI_BASE_URL = os.getenv("GENAI_BASE_URL")
+# Build clients (and other lazy state) in the lifespan instead of on first use
+GENAI_WARMUP = os.getenv("GENAI_WARMUP", "1") == "1"
+
+_lock = threading.Lock()
+_clients: Dict[Optional[str], Any] = {}
+_sdk: Any = None
+_unavailable: Optional[str] = None
+
+
+def _load_sdk() -> Any:
+    """google.genai, or None (with _unavailable set). Caller holds _lock."""
+    global _sdk, _unavailable
+    if _sdk is None and _unavailable is None:
+        if not GENAI_API_KEY:
+            _unavailable = "GENAI_API_KEY not set"
+        else:
+            try:
+                from google import genai
+                _sdk = genai
+            except Exception as e:
+                _unavailable = f"google-genai import failed: {e}"
+        if _unavailable:
+            logger.warning("No model client: %s", _unavailable)
+    return _sdk
+
+
+def genai_types() -> Any:
+    from google.genai import types
+    return types
+
+
+def get_client(model: Optional[str] = None) -> Any:
+    base_url = (model_router.base_url(model) if model else None) or GENAI_BASE_URL
+    c = _clients.get(base_url)
+    if c is not None:
+        return c
+    with _lock:
+        c = _clients.get(base_url)
+        if c is None:
+            sdk = _load_sdk()
+            if sdk is None:
+                return None
+            http_options = genai_types().HttpOptions(base_url=base_url) if base_url else None
+            c = _clients[base_url] = sdk.Client(api_key=GENAI_API_KEY, http_options=http_options)
+            logger.debug("Initialized genai.Client for %s", base_url or "the default endpoint")
+        return c
+
+
+async def ensure_client(model: Optional[str] = None) -> Any:
+    """get_client for the event loop: a client not built yet is built off the loop."""
+    base_url = (model_router.base_url(model) if model else None) or GENAI_BASE_URL
+    c = _clients.get(base_url)
+    if c is not None or _unavailable is not None:
+        return c
+    return await asyncio.to_thread(get_client, model)
+
+
+def client_error() -> str:
+    """Why get_client returned None."""
+    return _unavailable or "google-genai client not initialized"
+
+
+def warm_up_clients() -> int:
+    """Build the default client and one per configured model endpoint; returns how many exist."""
+    get_client()
+    for tier_models in model_router.tiers.values():
+        for model in tier_models:
+            get_client(model)
+    return len(_clients)
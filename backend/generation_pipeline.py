@@ -0,0 +1,550 @@
+# backend/generation_pipeline.py
+"""
+Single generation pipeline for slide/section items.
+
+Every model call for /generate and /regenerate goes through run_pipeline,
+which tries an explicit chain of strategies and stops at the first one
+that yields a JSON object. The chain depends on GENAI_GENERATION_MODE:
+
+  native (default)
+    1. native_schema - generate_content with response_schema=SlideItem,
+                       validated straight into the model   (1 LLM call)
+    2. json_repair   - local repair of that response text   (0 LLM calls)
+
+  legacy
+    1. structured    - StrictJSON gemini_async with SLIDE_SCHEMA  (1 LLM call)
+    2. raw_json      - free-text generate_content + json.loads    (1 LLM call)
+    3. json_repair   - local repair of the raw_json text          (0 LLM calls)
+
+Each strategy makes at most one model call, so the worst case is 1 LLM
+call per request in native mode and 2 in legacy mode (1 when StrictJSON
+is not installed). Per-strategy call/failure counts and latency are kept
+in pipeline_stats().
+
+The chain runs against the models of a model_router Route in order: when
+a model is overloaded (no slot in time, circuit open, 429/503 after
+retries) the whole chain is retried on the next model of the tier.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+from SlideItem import SlideItem
+from genai_clients import client_error, ensure_client, genai_types, get_client, warm_up_clients
+from metrics import count_error, count_fallback, count_tokens_used, observe_stage, set_model
+from model_router import OVERLOAD_STATUS, ModelOverloaded, Route, model_router
+from resilience import CircuitOpenError, breaker_for, call_with_resilience, error_status, estimate_tokens
+from scheduler import llm_scheduler
+
+# "native" (response_schema) or "legacy" (StrictJSON -> free-text JSON)
+GENAI_GENERATION_MODE = os.getenv("GENAI_GENERATION_MODE", "native").lower()
+
+logger = logging.getLogger("paradocs-gen")
+
+DEFAULT_SYSTEM_PROMPT = (
+    "Return exactly ONE JSON object that conforms to the requested schema. "
+    "Do not include commentary or extra text."
+)
+
+# Shared slide/section schema (StrictJSON notation), built once at import
+SLIDE_SCHEMA = {
+    "id": "Slide ID, int",
+    "type": "Item type, str",
+    "layout": "Layout name, str",
+    "title": "Slide title, str",
+    "bullets": ["Bullet text, str"],
+    "notes": ["Speaker note text, str"],
+    "images": ["Image URL or path, str"],
+    "meta": {"generator": "LLM model name, str"},
+}
+
+# Lazily loaded heavy pieces ---------------------------------------------
+# StrictJSON pulls in google.genai too and only legacy mode uses it, so it
+# is imported on first use; so are the genai Schemas for the response
+# models, which the SDK would otherwise rebuild on every call (~2ms).
+_strictjson: Optional[Tuple[Any, Any]] = None
+_strictjson_checked = False
+_response_schemas: Dict[type, Any] = {}
+_lazy_lock = threading.Lock()
+
+
+def _load_strictjson() -> Optional[Tuple[Any, Any]]:
+    """(gemini_async, SlideModel), or None when StrictJSON is not installed."""
+    global _strictjson, _strictjson_checked
+    if not _strictjson_checked:
+        with _lazy_lock:
+            if not _strictjson_checked:
+                try:
+                    from strictjson.llm import gemini_async
+                    from strictjson import convert_schema_to_pydantic
+                    _strictjson = (gemini_async, convert_schema_to_pydantic(SLIDE_SCHEMA))
+                    logger.debug("StrictJSON detected – structured strategy enabled.")
+                except Exception as e:
+                    logger.debug("StrictJSON unavailable (%s); structured strategy disabled.", e)
+                _strictjson_checked = True
+    return _strictjson
+
+
+def strictjson_available() -> bool:
+    return _load_strictjson() is not None
+
+
+async def _strictjson_ready() -> bool:
+    """strictjson_available for the event loop: the first check (an import) runs in a thread."""
+    if _strictjson_checked:
+        return _strictjson is not None
+    return await asyncio.to_thread(strictjson_available)
+
+
+def response_schema_for(response_model: Type[BaseModel] = SlideItem) -> Any:
+    """A pydantic response model as a google.genai Schema, converted once per class."""
+    schema = _response_schemas.get(response_model)
+    if schema is None:
+        types = genai_types()
+        schema = types.Schema.from_json_schema(
+            json_schema=types.JSONSchema(**response_model.model_json_schema()), api_option="GEMINI_API"
+        )
+        # keep the model's field order, as the SDK does for pydantic classes
+        schema.property_ordering = list(response_model.model_fields)
+        _response_schemas[response_model] = schema
+    return schema
+
+
+def warm_up() -> None:
+    """Do the lazy work now: SDK import, clients, schema (and StrictJSON in legacy mode)."""
+    t0 = time.perf_counter()
+    n = warm_up_clients()
+    if n:
+        response_schema_for(SlideItem)
+    if GENAI_GENERATION_MODE != "native":
+        _load_strictjson()
+    logger.info("Generation pipeline warmed up in %.0f ms (%d client(s))", (time.perf_counter() - t0) * 1000, n)
+
+
+@asynccontextmanager
+async def _llm_slot(model: str, wait_s: Optional[float] = None):
+    """
+    Hold one of the worker's GENAI_MAX_CONCURRENCY slots (handed out fairly
+    across users by llm_scheduler), then a slot for `model`; the combined
+    wait is the queue_wait stage. ModelOverloaded if the model has no free
+    slot within wait_s.
+    """
+    t0 = time.perf_counter()
+    async with llm_scheduler.slot():
+        async with model_router.slot(model, wait_s):
+            observe_stage("queue_wait", time.perf_counter() - t0, model=model)
+            yield
+
+
+class GenerationError(RuntimeError):
+    """Every strategy in the chain failed. `failures` maps strategy -> error."""
+
+    def __init__(self, failures: Dict[str, str]):
+        self.failures = failures
+        summary = "; ".join(f"{k}: {v}" for k, v in failures.items()) or "no strategy available"
+        super().__init__(f"LLM call failed ({summary})")
+
+
+# ---------------------- per-strategy stats --------------------------------
+_stats_lock = threading.Lock()
+_strategy_stats: Dict[str, Dict[str, float]] = {}
+
+
+def _record(strategy: str, elapsed_s: float, ok: bool) -> None:
+    with _stats_lock:
+        st = _strategy_stats.setdefault(strategy, {"calls": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0})
+        ms = elapsed_s * 1000.0
+        st["calls"] += 1
+        st["failures"] += 0 if ok else 1
+        st["total_ms"] += ms
+        st["max_ms"] = max(st["max_ms"], ms)
+
+
+def pipeline_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out = {}
+        for name, st in _strategy_stats.items():
+            out[name] = {
+                "calls": int(st["calls"]),
+                "failures": int(st["failures"]),
+                "avg_ms": round(st["total_ms"] / st["calls"], 2) if st["calls"] else 0.0,
+                "max_ms": round(st["max_ms"], 2),
+            }
+        return out
+
+
+# ---------------------- helpers ---------------------------------------
+def response_text(resp: Any) -> str:
+    # best-effort extraction: resp.text, resp.output, or stringify
+    if hasattr(resp, "text") and resp.text:
+        return resp.text
+    if hasattr(resp, "output") and resp.output:
+        return str(resp.output)
+    return str(resp)
+
+
+_FENCE_RE = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+
+
+def repair_json_text(text: str) -> Any:
+    """
+    Best-effort local repair of almost-JSON model output: strips code
+    fences and surrounding prose, drops trailing commas, and closes
+    strings/brackets left open by a truncated response.
+    Raises ValueError if the result still doesn't parse.
+    """
+    s = _FENCE_RE.sub("", text or "").strip()
+    start = s.find("{")
+    if start < 0:
+        raise ValueError("no JSON object in model output")
+    s = s[start:]
+    end = s.rfind("}")
+
+    candidates = []
+    if end >= 0:
+        candidates.append(s[:end + 1])
+    candidates.append(s)
+
+    for cand in candidates:
+        cand = _TRAILING_COMMA_RE.sub(r"\1", cand)
+        try:
+            return json.loads(cand)
+        except ValueError:
+            pass
+        try:
+            return json.loads(_TRAILING_COMMA_RE.sub(r"\1", _close_open_json(cand)))
+        except ValueError:
+            continue
+    raise ValueError("model output is not repairable JSON")
+
+
+def _close_open_json(s: str) -> str:
+    stack: List[str] = []
+    in_str = False
+    escaped = False
+    for ch in s:
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    tail = '"' if in_str else ""
+    return s.rstrip().rstrip(",:") + tail + "".join(reversed(stack))
+
+
+def parse_model_json(text: str) -> Any:
+    """json.loads, falling back to repair_json_text (no extra model call)."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return repair_json_text(text)
+
+
+# ---------------------- strategies --------------------------------------
+# Every model call below goes through call_with_resilience (retry/backoff,
+# circuit breaker, rate limiting). The semaphore is taken per attempt so a
+# call sleeping in backoff doesn't hold a concurrency slot.
+
+async def _structured(model: str, prompt: str, system_prompt: str, temperature: float, max_output_tokens: int,
+                      wait_s: Optional[float]) -> Dict[str, Any]:
+    gemini_async, slide_model = _load_strictjson()
+
+    async def once():
+        async with _llm_slot(model, wait_s):
+            return await gemini_async(
+                system_prompt=system_prompt,
+                user_prompt=prompt,
+                output_format=SLIDE_SCHEMA,
+                model=model,
+                temperature=temperature,
+            )
+
+    res = await call_with_resilience(model, once, estimate_tokens(prompt, max_output_tokens))
+    if not isinstance(res, dict):
+        res = res.model_dump() if hasattr(res, "model_dump") else dict(res)
+    return slide_model(**res).model_dump()
+
+
+async def _raw_text(model: str, prompt: str, temperature: float, max_output_tokens: int,
+                    wait_s: Optional[float]) -> str:
+    async def once():
+        async with _llm_slot(model, wait_s):
+            return await get_client(model).aio.models.generate_content(
+                model=model,
+                contents=[prompt],
+                config=generate_config(model, temperature, max_output_tokens),
+            )
+
+    resp = await call_with_resilience(model, once, estimate_tokens(prompt, max_output_tokens))
+    if count_tokens_used(resp, model):
+        logger.warning("raw_json strategy: %s answer cut off at max_output_tokens", model)
+    return response_text(resp)
+
+
+async def _native_schema(model: str, prompt: str, system_prompt: str, temperature: float, max_output_tokens: int,
+                         wait_s: Optional[float], response_model: Type[BaseModel] = SlideItem) -> Any:
+    """Returns the SDK response; constrained decoding means no repair is needed."""
+    async def once():
+        async with _llm_slot(model, wait_s):
+            return await get_client(model).aio.models.generate_content(
+                model=model,
+                contents=[prompt],
+                config=generate_config(
+                    model, temperature, max_output_tokens,
+                    system_instruction=system_prompt,
+                    response_mime_type="application/json",
+                    response_schema=response_schema_for(response_model),
+                ),
+            )
+
+    return await call_with_resilience(model, once, estimate_tokens(prompt, max_output_tokens))
+
+
+def generate_config(model: str, temperature: float, max_output_tokens: int, **kwargs: Any) -> Any:
+    """
+    GenerateContentConfig with an explicit thinking budget. Gemini 2.5
+    counts thinking tokens against max_output_tokens and thinks as much as
+    it likes by default, which can leave nothing of a 384-token budget for
+    the answer; the budget is added on top, so the answer keeps all of
+    max_output_tokens.
+    """
+    types = genai_types()
+    budget = model_router.thinking_budget(model)
+    if budget is not None:
+        kwargs["thinking_config"] = types.ThinkingConfig(thinking_budget=budget)
+        max_output_tokens += budget
+    return types.GenerateContentConfig(temperature=temperature, max_output_tokens=max_output_tokens, **kwargs)
+
+
+def validate_native_response(resp: Any, response_model: Type[BaseModel] = SlideItem) -> Dict[str, Any]:
+    """Validate a response_schema response straight into the response model."""
+    parsed = getattr(resp, "parsed", None)
+    if isinstance(parsed, response_model):
+        return parsed.model_dump()
+    if isinstance(parsed, dict):
+        # a Schema (not a pydantic class) as response_schema parses to a dict
+        return response_model.model_validate(parsed).model_dump()
+    return response_model.model_validate_json(response_text(resp)).model_dump()
+
+
+def is_overload(exc: BaseException) -> bool:
+    """True when the failure says the model is busy rather than the request being bad."""
+    cause = exc.__cause__ if isinstance(exc, GenerationError) else exc
+    return isinstance(cause, (ModelOverloaded, CircuitOpenError)) or error_status(cause) in OVERLOAD_STATUS
+
+
+async def run_pipeline(prompt: str,
+                       temperature: float = 0.2,
+                       max_output_tokens: int = 1200,
+                       system_prompt: str = DEFAULT_SYSTEM_PROMPT,
+                       route: Optional[Route] = None,
+                       response_model: Type[BaseModel] = SlideItem) -> Tuple[Dict[str, Any], str, str]:
+    """
+    Run the strategy chain on the route's models (default tier if None) and
+    return (parsed object, strategy name, model). Raises GenerationError
+    when every strategy fails on the last model tried.
+
+    response_model is the schema native mode constrains the answer to
+    (SlideItem, or e.g. ItemEdits for patch-mode regeneration). Legacy mode
+    only has a StrictJSON schema for SlideItem; other models go straight to
+    raw_json and are validated by the caller.
+    """
+    models: Sequence[str] = (route or model_router.default_route()).models
+    for i, model in enumerate(models):
+        last = i == len(models) - 1
+        try:
+            parsed, strategy = await _run_chain(
+                model, prompt, temperature, max_output_tokens, system_prompt,
+                # the last candidate waits for a slot as long as it takes
+                None if last else model_router.failover_wait_s,
+                response_model,
+            )
+            set_model(model)
+            return parsed, strategy, model
+        except GenerationError as e:
+            if last or not is_overload(e):
+                set_model(model)
+                raise
+            model_router.note_failover(model, models[i + 1], str(e.__cause__ or e)[:120])
+            count_error("failover", model)
+    raise GenerationError({})  # unreachable: a Route always has a model
+
+
+async def _run_chain(model: str, prompt: str, temperature: float, max_output_tokens: int,
+                     system_prompt: str, wait_s: Optional[float],
+                     response_model: Type[BaseModel] = SlideItem) -> Tuple[Dict[str, Any], str]:
+    failures: Dict[str, str] = {}
+
+    if GENAI_GENERATION_MODE == "native":
+        if await ensure_client(model) is None:
+            failures["native_schema"] = client_error()
+            raise GenerationError(failures)
+        return await _run_text_strategy(
+            "native_schema",
+            model,
+            lambda: _native_schema(model, prompt, system_prompt, temperature, max_output_tokens, wait_s, response_model),
+            lambda resp: validate_native_response(resp, response_model),
+            failures,
+        )
+
+    if response_model is SlideItem and await _strictjson_ready():
+        t0 = time.perf_counter()
+        try:
+            parsed = await _structured(model, prompt, system_prompt, temperature, max_output_tokens, wait_s)
+            _record("structured", time.perf_counter() - t0, True)
+            return parsed, "structured"
+        except asyncio.CancelledError:
+            raise
+        except (ModelOverloaded, CircuitOpenError) as e:
+            # the model is busy: raw_json would hit the same model, so fail over instead
+            _record("structured", time.perf_counter() - t0, False)
+            failures["structured"] = str(e)
+            raise GenerationError(failures) from e
+        except Exception as e:
+            _record("structured", time.perf_counter() - t0, False)
+            failures["structured"] = str(e)[:200]
+            count_fallback("structured", "raw_json", model)
+            logger.warning("structured strategy failed, trying raw_json: %s", e)
+
+    if await ensure_client(model) is None:
+        failures["raw_json"] = client_error()
+        raise GenerationError(failures)
+
+    return await _run_text_strategy(
+        "raw_json",
+        model,
+        lambda: _raw_text(model, prompt, temperature, max_output_tokens, wait_s),
+        json.loads,
+        failures,
+    )
+
+
+async def _run_text_strategy(name: str, model: str, call, parse, failures: Dict[str, str]) -> Tuple[Dict[str, Any], str]:
+    """
+    One model call via `call`, parsed with `parse`; if parsing fails the
+    response text gets one local json_repair attempt (no further calls).
+    """
+    t0 = time.perf_counter()
+    try:
+        resp = await call()
+    except asyncio.CancelledError:
+        raise
+    except (CircuitOpenError, ModelOverloaded) as e:
+        _record(name, time.perf_counter() - t0, False)
+        failures[name] = str(e)
+        count_error("generation_failed", model)
+        logger.warning("%s strategy: %s", name, e)
+        raise GenerationError(failures) from e
+    except Exception as e:
+        _record(name, time.perf_counter() - t0, False)
+        failures[name] = str(e)[:200]
+        count_error("generation_failed", model)
+        if is_overload(e):
+            logger.warning("%s strategy: %s overloaded (%s)", name, model, error_status(e))
+        else:
+            logger.exception("%s strategy: model call failed on %s", name, model)
+        raise GenerationError(failures) from e
+    t_call = time.perf_counter()
+    # includes queue_wait / rate_limit_wait / retries; those are also recorded separately
+    observe_stage("llm_call", t_call - t0, name, model)
+    if not isinstance(resp, str) and count_tokens_used(resp, model):
+        logger.warning("%s strategy: %s answer cut off at max_output_tokens", name, model)
+
+    try:
+        parsed = parse(resp)
+        if not isinstance(parsed, dict):
+            raise ValueError(f"expected a JSON object, got {type(parsed).__name__}")
+        observe_stage("parse", time.perf_counter() - t_call, name, model)
+        _record(name, time.perf_counter() - t0, True)
+        return parsed, name
+    except (ValueError, ValidationError) as e:
+        observe_stage("parse", time.perf_counter() - t_call, name, model)
+        _record(name, time.perf_counter() - t0, False)
+        failures[name] = str(e)[:200]
+        count_fallback(name, "json_repair", model)
+
+    t0 = time.perf_counter()
+    try:
+        parsed = repair_json_text(resp if isinstance(resp, str) else response_text(resp))
+        if not isinstance(parsed, dict):
+            raise ValueError(f"expected a JSON object, got {type(parsed).__name__}")
+        observe_stage("repair", time.perf_counter() - t0, "json_repair", model)
+        _record("json_repair", time.perf_counter() - t0, True)
+        return parsed, "json_repair"
+    except ValueError as e:
+        observe_stage("repair", time.perf_counter() - t0, "json_repair", model)
+        _record("json_repair", time.perf_counter() - t0, False)
+        failures["json_repair"] = str(e)[:200]
+        count_error("generation_failed", model)
+        logger.error("All generation strategies failed: %s", failures)
+        raise GenerationError(failures) from e
+
+
+# ---------------------- streaming ---------------------------------------
+async def stream_genai_text(prompt: str,
+                            temperature: float = 0.2,
+                            max_output_tokens: int = 800,
+                            route: Optional[Route] = None) -> AsyncIterator[str]:
+    """
+    Yields raw text chunks as the model produces them. The caller assembles
+    the final text and parses it with parse_model_json. Tokens already sent
+    can't be taken back, so there is no mid-stream failover: the stream
+    goes to the first model of the route whose circuit isn't open.
+    """
+    models = (route or model_router.default_route()).models
+    model = next((m for m in models if not breaker_for(m).rejecting()), models[0])
+    if await ensure_client(model) is None:
+        raise RuntimeError(f"{client_error()}; streaming unavailable.")
+    set_model(model)
+
+    async def once():
+        # a slot per attempt, as in the other strategies, so backoff sleeps
+        # hold none; the attempt that opens the stream hands its slot over
+        slot = AsyncExitStack()
+        await slot.enter_async_context(_llm_slot(model))
+        try:
+            return slot, await get_client(model).aio.models.generate_content_stream(
+                model=model,
+                contents=[prompt],
+                config=generate_config(model, temperature, max_output_tokens, response_mime_type="application/json"),
+            )
+        except BaseException:
+            await slot.aclose()
+            raise
+
+    # only opening the stream is retried; a stream that fails midway
+    # can't be resumed and is reported to the caller
+    slot, stream = await call_with_resilience(model, once, estimate_tokens(prompt, max_output_tokens))
+    # the slot is held for as long as the stream is being consumed, and
+    # released when it ends, fails or the caller stops reading
+    async with slot:
+        chunk = None
+        try:
+            async for chunk in stream:
+                text = getattr(chunk, "text", None)
+                if text:
+                    yield text
+        finally:
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        # the last chunk carries the finish reason and usage
+        if chunk is not None and count_tokens_used(chunk, model):
+            logger.warning("stream: %s answer cut off at max_output_tokens", model)
@@ -0,0 +1,139 @@
+# backend/id_generator.py
+"""
+Snowflake-style item ids that fit a JavaScript number.
+
+The frontend keeps ids as JS numbers, so ids stay below 2**53 and the
+classic 64-bit layout is squeezed into 53 bits:
+
+    | 41 bits: ms since 2024-01-01 UTC | 5 bits: node | 7 bits: sequence |
+
+* time: good until 2093; ids sort by creation time.
+* node: one of 32 ids per host. ID_NODE pins it; otherwise each process
+  claims the lowest free slot by holding a POSIX lock on
+  ID_NODE_LOCK_DIR/paradocs-id-node-<n>.lock for its lifetime, so
+  gunicorn/uvicorn workers on one host never share a node. Processes on
+  different hosts need distinct ID_NODE values.
+* sequence: 128 ids per ms per node. When a millisecond runs out the
+  generator borrows the next one instead of sleeping, and a clock that
+  steps back is ignored, so ids stay strictly increasing per process.
+
+Thread safe; a forked child drops its parent's node and claims its own on
+first use.
+"""
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger("paradocs-gen")
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+TIME_BITS = 41
+NODE_BITS = 5
+SEQUENCE_BITS = 7
+MAX_NODE = (1 << NODE_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+MAX_ID = (1 << (TIME_BITS + NODE_BITS + SEQUENCE_BITS)) - 1  # 2**53 - 1
+
+ID_NODE = os.getenv("ID_NODE")
+ID_NODE_LOCK_DIR = os.getenv("ID_NODE_LOCK_DIR") or tempfile.gettempdir()
+
+try:
+    import fcntl
+except ImportError:  # Windows: no POSIX locks, fall back to pid-derived nodes
+    fcntl = None
+
+
+def _claim_node() -> Tuple[int, Optional[int]]:
+    """(node, lock fd). The fd is kept open for the life of the process."""
+    if ID_NODE is not None:
+        node = int(ID_NODE)
+        if not 0 <= node <= MAX_NODE:
+            raise ValueError(f"ID_NODE must be 0..{MAX_NODE}, got {node}")
+        return node, None
+    if fcntl is not None:
+        os.makedirs(ID_NODE_LOCK_DIR, exist_ok=True)
+        for node in range(MAX_NODE + 1):
+            path = os.path.join(ID_NODE_LOCK_DIR, f"paradocs-id-node-{node}.lock")
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.lockf(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            return node, fd
+        logger.warning("ids: all %d node slots in %s are taken; falling back to pid", MAX_NODE + 1, ID_NODE_LOCK_DIR)
+    return os.getpid() & MAX_NODE, None
+
+
+class SnowflakeGenerator:
+    def __init__(self, node: Optional[int] = None):
+        self._lock = threading.Lock()
+        self._fixed_node = node
+        self._reset()
+
+    def _after_fork(self) -> None:
+        # another thread may have held the lock at fork time; the child gets a fresh one
+        self._lock = threading.Lock()
+        if self._node_fd is not None:
+            os.close(self._node_fd)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._node: Optional[int] = self._fixed_node
+        self._node_fd: Optional[int] = None
+        self._last_ms = -1
+        self._sequence = 0
+        self.borrowed_ms = 0
+
+    @property
+    def node(self) -> int:
+        if self._node is None:
+            with self._lock:
+                self._ensure_node()
+        return self._node
+
+    def _ensure_node(self) -> None:
+        # claimed lazily, so a pre-fork parent that never makes ids holds no slot
+        if self._node is None:
+            self._node, self._node_fd = _claim_node()
+            logger.debug("ids: pid %d uses node %d", os.getpid(), self._node)
+
+    def next_id(self) -> int:
+        with self._lock:
+            if self._node is None:
+                self._ensure_node()
+            now = int(time.time() * 1000) - EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # same ms, or the clock stepped back: stay on the logical clock
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+                    self.borrowed_ms += 1
+            return (self._last_ms << (NODE_BITS + SEQUENCE_BITS)) | (self._node << SEQUENCE_BITS) | self._sequence
+
+    def next_ids(self, n: int) -> List[int]:
+        return [self.next_id() for _ in range(n)]
+
+
+def parse_id(value: int) -> dict:
+    """Split an id into its parts (for debugging)."""
+    return {
+        "ms": (value >> (NODE_BITS + SEQUENCE_BITS)) + EPOCH_MS,
+        "node": (value >> SEQUENCE_BITS) & MAX_NODE,
+        "sequence": value & MAX_SEQUENCE,
+    }
+
+
+# shared per-process generator behind utils.make_id
+id_generator = SnowflakeGenerator()
+
+if hasattr(os, "register_at_fork"):
+    # the child must not reuse the parent's node (it doesn't inherit the lock either)
+    os.register_at_fork(after_in_child=id_generator._after_fork)
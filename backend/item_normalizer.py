@@ -0,0 +1,434 @@
+# backend/item_normalizer.py
+"""
+Schema-driven normalization of generated items (slides and DOCX sections).
+
+normalize_items() and normalize_item() replace the per-field Python loop
+that used to live in main.normalize_slide_object:
+
+* fast path: items in the shapes JSON from the model comes in (str, int
+  or null scalars, lists of strings or a bare string, the
+  template/speaker_notes aliases) never reach the validator. A batch is
+  reshaped column by column (_columns: each field pulled from every item
+  at once and stripped/defaulted with map() and set() passes in C); a
+  single item takes the unrolled per-item twin (_row). That is nearly
+  every item
+* the rest go through one pydantic-core pass per batch: a TypeAdapter
+  over List[_ItemIn], compiled once at import, does the type coercion,
+  whitespace stripping and key aliases in Rust; a batch that fails
+  validation (say a bullet that is an object) is retried item by item,
+  and only the failing items take the old lenient str() path
+* with enforce_limits, exact-duplicate and empty bullets are dropped and
+  content limits (bullet count, bullet and note length) applied per doc
+  type; too long text is cut with an ellipsis, and every clip is logged
+  and counted
+
+Limits apply to what the model generates on its own (/generate, batch,
+jobs). /regenerate and export pass enforce_limits=False: a regeneration
+follows the user's feedback (which may ask for more bullets) and a
+user's own edits are rendered as they are.
+"""
+import logging
+import os
+import threading
+from itertools import count, repeat
+from operator import contains, itemgetter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple, Union
+
+from pydantic import AliasChoices, ConfigDict, Field, TypeAdapter, ValidationError, with_config
+from typing_extensions import Annotated, TypedDict
+
+from utils import make_id
+
+logger = logging.getLogger("paradocs-gen")
+
+SLIDE_MAX_BULLETS = int(os.getenv("SLIDE_MAX_BULLETS", "10"))
+SLIDE_MAX_BULLET_CHARS = int(os.getenv("SLIDE_MAX_BULLET_CHARS", "300"))
+SLIDE_MAX_NOTE_CHARS = int(os.getenv("SLIDE_MAX_NOTE_CHARS", "2000"))
+SECTION_MAX_BULLETS = int(os.getenv("SECTION_MAX_BULLETS", "40"))
+SECTION_MAX_BULLET_CHARS = int(os.getenv("SECTION_MAX_BULLET_CHARS", "2000"))
+SECTION_MAX_NOTE_CHARS = int(os.getenv("SECTION_MAX_NOTE_CHARS", "4000"))
+
+
+class Limits(NamedTuple):
+    max_bullets: int
+    max_bullet_chars: int
+    max_note_chars: int
+
+
+SLIDE_LIMITS = Limits(SLIDE_MAX_BULLETS, SLIDE_MAX_BULLET_CHARS, SLIDE_MAX_NOTE_CHARS)
+SECTION_LIMITS = Limits(SECTION_MAX_BULLETS, SECTION_MAX_BULLET_CHARS, SECTION_MAX_NOTE_CHARS)
+
+_TextList = Union[List[str], str, None]
+
+
+@with_config(ConfigDict(str_strip_whitespace=True, coerce_numbers_to_str=True))
+class _ItemIn(TypedDict):
+    # everything optional: defaults for empty values are filled in the batch pass
+    id: Annotated[Optional[int], Field(default=None)]
+    type: Annotated[Optional[str], Field(default=None)]
+    layout: Annotated[Optional[str], Field(default=None, validation_alias=AliasChoices("layout", "template"))]
+    title: Annotated[Optional[str], Field(default=None)]
+    bullets: Annotated[_TextList, Field(default=None)]
+    notes: Annotated[_TextList, Field(default=None, validation_alias=AliasChoices("notes", "speaker_notes"))]
+    images: Annotated[_TextList, Field(default=None)]
+    meta: Annotated[Any, Field(default=None)]
+
+
+_MISSING = object()
+_NoneType = type(None)
+_strip = str.strip
+_first = itemgetter(0)
+
+_batch_adapter = TypeAdapter(List[_ItemIn])
+_item_adapter = TypeAdapter(_ItemIn)
+
+_stats_lock = threading.Lock()
+# normalize_item() counts its items here instead of taking the lock: next() on
+# a count is atomic, and the lock would cost more than the item itself
+_single_items = count()
+_single_reads = 0
+_stats = {"items": 0, "batches": 0, "validated": 0, "lenient": 0, "bullets_deduped": 0, "bullets_dropped": 0, "truncated": 0}
+
+
+def limits_for(doc_type: Optional[str]) -> Limits:
+    return SECTION_LIMITS if (doc_type or "").lower() == "docx" else SLIDE_LIMITS
+
+
+def normalize_items(items: List[Dict[str, Any]], doc_type: Optional[str] = None,
+                    enforce_limits: bool = True) -> List[Dict[str, Any]]:
+    """Normalized copies of `items` (id, type, layout, title, bullets, notes, images, meta)."""
+    limits = limits_for(doc_type) if enforce_limits else None
+    counts = [0, 0, 0]  # bullets deduped, bullets dropped, items truncated
+    out = _columns(items, limits, counts)
+    slow = [i for i, item in enumerate(out) if item is None] if None in out else []
+    if slow:
+        batch = [items[i] for i in slow]
+        try:
+            validated = _batch_adapter.validate_python(batch)
+        except ValidationError:
+            validated = [_validate_one(item) for item in batch]
+        # validator output always comes through the column pass
+        for i, item in zip(slow, _columns(validated, limits, counts)):
+            out[i] = item
+    deduped, dropped, truncated = counts
+    if dropped or truncated:
+        logger.info("normalizer: clipped %d of %d items to the %s limits (%d bullets dropped)",
+                    truncated, len(out), doc_type or "slide", dropped)
+    with _stats_lock:
+        _stats["items"] += len(out)
+        _stats["batches"] += 1
+        if slow or deduped or dropped or truncated:
+            _stats["validated"] += len(slow)
+            _stats["bullets_deduped"] += deduped
+            _stats["bullets_dropped"] += dropped
+            _stats["truncated"] += truncated
+    return out
+
+
+def normalize_item(item: Dict[str, Any], doc_type: Optional[str] = None, enforce_limits: bool = True) -> Dict[str, Any]:
+    """One item; same rules as normalize_items() without the batch setup."""
+    counts = [0, 0, 0] if enforce_limits else None
+    out = _row(item, limits_for(doc_type) if enforce_limits else None, counts)
+    if out is None:
+        return normalize_items([item], doc_type, enforce_limits)[0]
+    next(_single_items)
+    if counts and (counts[0] or counts[1] or counts[2]):
+        if counts[1] or counts[2]:
+            logger.info("normalizer: clipped a %s item to its limits (%d bullets dropped)", doc_type or "slide", counts[1])
+        with _stats_lock:
+            _stats["bullets_deduped"] += counts[0]
+            _stats["bullets_dropped"] += counts[1]
+            _stats["truncated"] += counts[2]
+    return out
+
+
+def normalize_stream(items: Iterable[Dict[str, Any]], doc_type: Optional[str] = None,
+                     enforce_limits: bool = True, batch_size: int = 256):
+    """Lazily normalize an iterable, `batch_size` items per validation pass."""
+    batch: List[Dict[str, Any]] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield from normalize_items(batch, doc_type, enforce_limits)
+            batch = []
+    if batch:
+        yield from normalize_items(batch, doc_type, enforce_limits)
+
+
+def normalizer_stats() -> Dict[str, Any]:
+    global _single_reads
+    with _stats_lock:
+        stats = dict(_stats)
+        # every tick of _single_items is an item or one of these reads
+        stats["items"] += next(_single_items) - _single_reads
+        _single_reads += 1
+        return stats
+
+
+# ---------------------- internals -------------------------------------------
+def _validate_one(item: Any) -> Dict[str, Any]:
+    try:
+        return _item_adapter.validate_python(item)
+    except ValidationError as e:
+        logger.debug("normalizer: lenient path for one item (%s)", e.errors()[:1])
+        with _stats_lock:
+            _stats["lenient"] += 1
+        return _lenient(item if isinstance(item, dict) else {})
+
+
+def _lenient(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """The old normalize_slide_object coercion: str() everything."""
+    def text_list(value: Any) -> List[str]:
+        if isinstance(value, str):
+            value = [value] if value.strip() else []
+        return [str(v).strip() for v in value] if isinstance(value, (list, tuple)) else []
+
+    try:
+        item_id = int(obj.get("id")) if obj.get("id") else None
+    except (TypeError, ValueError):
+        item_id = None
+    return {
+        "id": item_id,
+        "type": str(obj.get("type") or "").strip() or None,
+        "layout": str(obj.get("layout") or obj.get("template") or "").strip() or None,
+        "title": str(obj.get("title") or "").strip(),
+        "bullets": text_list(obj.get("bullets")),
+        "notes": text_list(obj.get("notes") or obj.get("speaker_notes")),
+        "images": text_list(obj.get("images")),
+        "meta": obj.get("meta"),
+    }
+
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _row(item: Any, limits: Optional[Limits], counts: Optional[List[int]]) -> Optional[Dict[str, Any]]:
+    """
+    The per-item twin of _columns(), for single items: same shapes, same
+    defaults, None for anything that needs the validator. Unrolled, since
+    it runs once per streamed item.
+    """
+    if item.__class__ is not dict:
+        return None
+    get = item.get
+    item_id = get("id")
+    if item_id.__class__ is str and item_id.isdigit() and item_id.isascii():
+        item_id = int(item_id)
+    elif item_id is not None and item_id.__class__ is not int:
+        return None
+    kind = get("type")
+    if kind.__class__ is str:
+        kind = _strip(kind) or "slide"
+    elif kind is None:
+        kind = "slide"
+    else:
+        return None
+    layout = item["layout"] if "layout" in item else get("template")
+    if layout.__class__ is str:
+        layout = _strip(layout) or "title+bullets"
+    elif layout is None:
+        layout = "title+bullets"
+    else:
+        return None
+    title = get("title")
+    if title.__class__ is str:
+        title = _strip(title)
+    elif title is None:
+        title = ""
+    else:
+        return None
+    bullets = get("bullets")
+    notes = item["notes"] if "notes" in item else get("speaker_notes")
+    images = get("images")
+    try:
+        # lists inline, anything else through _row_list()
+        bullets = [*map(_strip, bullets)] if bullets.__class__ is list else _row_list(bullets)
+        notes = [*map(_strip, notes)] if notes.__class__ is list else _row_list(notes)
+        images = [*map(_strip, images)] if images.__class__ is list else _row_list(images)
+    except TypeError:
+        return None
+    if limits is not None:
+        max_bullets, max_bullet_chars, max_note_chars = limits
+        if len(set(bullets)) != len(bullets):
+            counts[0] += len(bullets)
+            bullets = [*dict.fromkeys(bullets)]
+            counts[0] -= len(bullets)
+        if "" in bullets:
+            bullets = [b for b in bullets if b]
+        if len(bullets) > max_bullets:
+            counts[1] += len(bullets) - max_bullets
+            bullets = bullets[:max_bullets]
+        if bullets and max(map(len, bullets)) > max_bullet_chars:
+            counts[2] += 1
+            bullets = [_clip(b, max_bullet_chars) for b in bullets]
+        if notes and max(map(len, notes)) > max_note_chars:
+            counts[2] += 1
+            notes = [_clip(n, max_note_chars) for n in notes]
+    meta = get("meta")
+    return {"id": item_id or make_id(), "type": kind, "layout": layout, "title": title,
+            "bullets": bullets, "notes": notes, "images": images,
+            "meta": meta if isinstance(meta, dict) else {}}
+
+
+def _row_list(value: Any) -> List[str]:
+    # TypeError for anything but a bare str or null
+    if value is None:
+        return []
+    value = _strip(value)
+    return [value] if value else []
+
+
+def _columns(items: List[Any], limits: Optional[Limits], counts: List[int]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Normalize a batch column by column: each field is pulled out of every
+    item at once and stripped, defaulted and checked with map()/set()
+    passes that run in C, so per-item Python only runs for the rows that
+    actually need a change. Rows holding anything but the shapes JSON from
+    the model comes in (str, int or null scalars, lists of strings or a
+    bare string) come back as None, for the validator. Changes made by
+    `limits` are added to `counts`.
+    """
+    n = len(items)
+    if not n:
+        return []
+    slow: Set[int] = set()
+    if set(map(type, items)) != {dict}:
+        slow.update(i for i, item in enumerate(items) if item.__class__ is not dict)
+        items = [item if item.__class__ is dict else {} for item in items]
+    get = dict.get
+    ids = _id_column([*map(get, items, repeat("id", n))], slow)
+    kinds = _text_column([*map(get, items, repeat("type", n))], "slide", slow)
+    layouts = _text_column(_aliased(items, "layout", "template"), "title+bullets", slow)
+    titles = _text_column([*map(get, items, repeat("title", n))], "", slow)
+    bullets = _list_column([*map(get, items, repeat("bullets", n))], slow)
+    notes = _list_column(_aliased(items, "notes", "speaker_notes"), slow)
+    images = _list_column([*map(get, items, repeat("images", n))], slow)
+    metas = [*map(get, items, repeat("meta", n))]
+    if set(map(type, metas)) != {dict}:
+        metas = [m if isinstance(m, dict) else {} for m in metas]
+    if limits is not None:
+        bullets, notes = _limit_columns(bullets, notes, limits, counts)
+    out: List[Optional[Dict[str, Any]]] = [
+        {"id": i, "type": k, "layout": lay, "title": t, "bullets": b, "notes": nt, "images": im, "meta": m}
+        for i, k, lay, t, b, nt, im, m in zip(ids, kinds, layouts, titles, bullets, notes, images, metas)
+    ]
+    for i in slow:
+        out[i] = None
+    return out
+
+
+def _aliased(items: List[Dict[str, Any]], key: str, alias: str) -> List[Any]:
+    # same rule as AliasChoices: the first key present wins, even if null
+    n = len(items)
+    values = [*map(dict.get, items, repeat(key, n), repeat(_MISSING, n))]
+    if _MISSING in values:
+        values = [items[i].get(alias) if v is _MISSING else v for i, v in enumerate(values)]
+    return values
+
+
+def _id_column(ids: List[Any], slow: Set[int]) -> List[int]:
+    types = set(map(type, ids))
+    if types == {str} and all(map(str.isdigit, ids)) and all(map(str.isascii, ids)):
+        ids = [*map(int, ids)]
+    elif types != {int}:
+        out = []
+        for i, v in enumerate(ids):
+            if v.__class__ is str and v.isdigit() and v.isascii():
+                v = int(v)
+            elif v is not None and v.__class__ is not int:
+                slow.add(i)
+                v = 0
+            out.append(v)
+        ids = out
+    return ids if all(ids) else [v or make_id() for v in ids]
+
+
+def _text_column(values: List[Any], default: str, slow: Set[int]) -> List[str]:
+    """Stripped strings, `default` for null or blank ones."""
+    try:
+        # str.strip raises TypeError for anything but a str (null included)
+        out = [*map(_strip, values)]
+    except TypeError:
+        out = []
+        for i, v in enumerate(values):
+            if v.__class__ is str:
+                v = _strip(v)
+            else:
+                if v is not None:
+                    slow.add(i)
+                v = ""
+            out.append(v)
+    if default and "" in out:
+        out = [v or default for v in out]
+    return out
+
+
+def _list_column(values: List[Any], slow: Set[int]) -> List[List[str]]:
+    """Fresh lists of stripped strings, from lists of str, a bare str or null."""
+    types = set(map(type, values))
+    try:
+        # one branch per common column shape; str.strip raises TypeError for anything but a str
+        if types == {list}:
+            lens = set(map(len, values))
+            if lens == {0}:
+                return [[] for _ in values]
+            if lens == {1}:
+                return [[v] for v in map(_strip, map(_first, values))]
+            return [[*map(_strip, v)] for v in values]
+        if types == {_NoneType}:
+            return [[] for _ in values]
+        if types == {str}:
+            return [[v] if v else [] for v in map(_strip, values)]
+    except TypeError:
+        pass
+    out = []
+    for i, v in enumerate(values):
+        if v.__class__ is list:
+            try:
+                v = [*map(_strip, v)]
+            except TypeError:
+                slow.add(i)
+                v = []
+        elif v is None:
+            v = []
+        elif v.__class__ is str:
+            v = _strip(v)
+            v = [v] if v else []
+        else:
+            slow.add(i)
+            v = []
+        out.append(v)
+    return out
+
+
+def _limit_columns(bullets: List[List[str]], notes: List[List[str]], limits: Limits,
+                   counts: List[int]) -> Tuple[List[List[str]], List[List[str]]]:
+    """Dedupe and drop empty bullets, then apply `limits`; every check is one pass over the column."""
+    max_bullets, max_bullet_chars, max_note_chars = limits
+    lens = [*map(len, bullets)]
+    unique_lens = [*map(len, map(set, bullets))]
+    if unique_lens != lens:
+        counts[0] += sum(lens) - sum(unique_lens)
+        bullets = [b if n == u else [*dict.fromkeys(b)] for b, n, u in zip(bullets, lens, unique_lens)]
+        lens = unique_lens
+    if any(map(contains, bullets, repeat(""))):
+        bullets = [[x for x in b if x] if "" in b else b for b in bullets]
+        lens = [*map(len, bullets)]
+    if max(lens) > max_bullets:
+        counts[1] += sum(n - max_bullets for n in lens if n > max_bullets)
+        bullets = [b[:max_bullets] if n > max_bullets else b for b, n in zip(bullets, lens)]
+    return _clip_column(bullets, max_bullet_chars, counts), _clip_column(notes, max_note_chars, counts)
+
+
+def _clip_column(column: List[List[str]], limit: int, counts: List[int]) -> List[List[str]]:
+    # a row's joined length bounds each of its strings; only rows past the limit are rebuilt
+    if max(map(len, map("".join, column))) <= limit:
+        return column
+    out = []
+    for texts in column:
+        if texts and max(map(len, texts)) > limit:
+            counts[2] += 1
+            texts = [_clip(t, limit) for t in texts]
+        out.append(texts)
+    return out
@@ -0,0 +1,137 @@
+# backend/item_patch.py
+"""
+Patch-mode regeneration: apply a model's edit set to an item, and diff the
+result as an RFC 6902 JSON Patch.
+
+* apply_edits: replace / insert / delete on the item's text fields (title,
+  type, layout: replace only) and text lists (bullets, notes, images).
+  List indexes refer to the original list the model was shown, not to the
+  list after earlier edits, so the order of the edits doesn't matter.
+  Conflicting or out-of-range edits raise ValueError; the caller then
+  falls back to a full regeneration.
+* json_patch: ops that turn one JSON document into another. Dicts are
+  diffed key by key and lists element by element (difflib opcodes, emitted
+  back to front so every index is valid when its op is applied in order).
+"""
+import copy
+import difflib
+import json
+from typing import Any, Dict, List
+
+from pydantic import ValidationError
+
+from ItemEdits import ItemEdits
+
+TEXT_FIELDS = ("title", "type", "layout")
+LIST_FIELDS = ("bullets", "notes", "images")
+
+
+def parse_edits(obj: Any) -> List[Dict[str, Any]]:
+    """Validate a model response as an edit set; ValueError if it isn't one."""
+    try:
+        return [e.model_dump() for e in ItemEdits.model_validate(obj).edits]
+    except ValidationError as e:
+        raise ValueError(f"not an edit set: {e.errors()[:3]}") from e
+
+
+def apply_edits(original: Dict[str, Any], edits: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """A copy of `original` with `edits` applied."""
+    item = copy.deepcopy(original)
+    per_list: Dict[str, List[Dict[str, Any]]] = {}
+    for edit in edits:
+        field, op = edit["field"], edit["op"]
+        if field in TEXT_FIELDS:
+            if op != "replace" or edit.get("value") is None:
+                raise ValueError(f"{field} only supports replace with a value")
+            item[field] = edit["value"]
+        else:
+            per_list.setdefault(field, []).append(edit)
+
+    for field, field_edits in per_list.items():
+        current = item.get(field) or []
+        if isinstance(current, str):
+            current = [current]
+        item[field] = _apply_list_edits(field, list(current), field_edits)
+    return item
+
+
+def _apply_list_edits(field: str, values: List[Any], edits: List[Dict[str, Any]]) -> List[Any]:
+    replaced: Dict[int, str] = {}
+    deleted = set()
+    inserted: Dict[int, List[str]] = {}
+    n = len(values)
+    for edit in edits:
+        op, index, value = edit["op"], edit.get("index"), edit.get("value")
+        if op == "insert":
+            index = n if index is None else index
+            if not 0 <= index <= n or value is None:
+                raise ValueError(f"bad insert into {field} at {index}")
+            inserted.setdefault(index, []).append(value)
+            continue
+        if index is None or not 0 <= index < n:
+            raise ValueError(f"{op} on {field} needs an index in 0..{n - 1}, got {index}")
+        if index in replaced or index in deleted:
+            raise ValueError(f"conflicting edits on {field}[{index}]")
+        if op == "delete":
+            deleted.add(index)
+        elif value is None:
+            raise ValueError(f"replace on {field}[{index}] without a value")
+        else:
+            replaced[index] = value
+
+    out: List[Any] = []
+    for i in range(n):
+        out.extend(inserted.get(i, ()))
+        if i not in deleted:
+            out.append(replaced.get(i, values[i]))
+    out.extend(inserted.get(n, ()))
+    return out
+
+
+# ---------------------- JSON Patch ------------------------------------------
+def _pointer(path: str, key: Any) -> str:
+    return f"{path}/" + str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _same(a: Any, b: Any) -> bool:
+    # 1 == True == 1.0 in Python, but not in JSON
+    return type(a) is type(b) and a == b
+
+
+def json_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """RFC 6902 operations that turn `old` into `new`."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops: List[Dict[str, Any]] = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": _pointer(path, key)})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": _pointer(path, key), "value": value})
+            else:
+                ops.extend(json_patch(old[key], value, _pointer(path, key)))
+        return ops
+    if isinstance(old, list) and isinstance(new, list):
+        return _list_patch(old, new, path)
+    if _same(old, new):
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+
+def _list_patch(old: List[Any], new: List[Any], path: str) -> List[Dict[str, Any]]:
+    keys_old = [json.dumps(v, sort_keys=True) for v in old]
+    keys_new = [json.dumps(v, sort_keys=True) for v in new]
+    ops: List[Dict[str, Any]] = []
+    # back to front: ops at higher indexes never shift the ones still to come
+    opcodes = difflib.SequenceMatcher(a=keys_old, b=keys_new, autojunk=False).get_opcodes()
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        if tag == "equal":
+            continue
+        common = min(i2 - i1, j2 - j1)
+        for k in range(common):
+            ops.append({"op": "replace", "path": _pointer(path, i1 + k), "value": new[j1 + k]})
+        for i in range(i2 - 1, i1 + common - 1, -1):
+            ops.append({"op": "remove", "path": _pointer(path, i)})
+        for k in range(common, j2 - j1):
+            ops.append({"op": "add", "path": _pointer(path, i1 + k), "value": new[j1 + k]})
+    return ops
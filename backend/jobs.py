@@ -0,0 +1,472 @@
+# backend/jobs.py
+"""
+Background generation jobs.
+
+POST /jobs queues a whole outline; a small pool of workers runs the items
+with bounded per-job parallelism and records each finished item in the job
+store as it lands. Clients poll GET /jobs/{id} or follow /jobs/{id}/events.
+
+* Store backends: in-process memory (default) or a SQLite file (JOBS_DB,
+  or SHARED_STATE_DB).
+  Both implement the same small JobStore interface, so another backend
+  (e.g. Redis) only has to provide those methods.
+* Resume: on startup every job still marked queued/running is put back on
+  the queue; items already in the store are skipped, so a restart only
+  redoes the items that were in flight.
+* Cancel: marks the job cancelled and stops its running task; items that
+  already finished stay in the store.
+* Several workers: a job runs under a lease in shared_state, so with a
+  shared store exactly one worker runs it. The lease is renewed while the
+  job runs; jobs whose lease lapsed (dead worker) are picked up by the
+  periodic sweep, and a cancel made on another worker is seen at renewal.
+* Shutdown: stop() lets items that already hold a slot finish (up to
+  JOBS_DRAIN_S); items not yet started are left for the next start.
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from logging_config import request_id_var
+from shared_state import SHARED_STATE_DB, shared_state, worker_id
+
+logger = logging.getLogger("paradocs-gen")
+
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_DB = os.getenv("JOBS_DB") or SHARED_STATE_DB
+JOBS_RETENTION_S = float(os.getenv("JOBS_RETENTION_S", str(24 * 3600)))
+# how long a worker owns a job without renewing (see module docstring)
+JOBS_LEASE_S = float(os.getenv("JOBS_LEASE_S", "30"))
+JOBS_DRAIN_S = float(os.getenv("JOBS_DRAIN_S", "20"))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+# (context, gate, index, scaffold) -> {"index", "item", "error"}
+ItemRunner = Callable[[Dict[str, Any], asyncio.Semaphore, int, Any], Awaitable[Dict[str, Any]]]
+
+
+# ---------------------- stores ---------------------------------------------
+class JobStore:
+    """
+    Persistence interface. A job is a dict with id, status, created_at,
+    updated_at, total, parallelism, context and outline; items are the
+    per-index results produced by the runner.
+    """
+
+    def create(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        raise NotImplementedError
+
+    def start(self, job_id: str) -> bool:
+        """
+        Mark the job running, in one step with checking it is still queued
+        (or running, for a job resumed after a restart or a lost lease);
+        False, and no change, if it finished or was cancelled meanwhile.
+        """
+        raise NotImplementedError
+
+    def save_item(self, job_id: str, result: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def items(self, job_id: str) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def unfinished(self) -> List[str]:
+        raise NotImplementedError
+
+    def prune(self, older_than: float) -> int:
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._items: Dict[str, Dict[int, Dict[str, Any]]] = {}
+
+    def create(self, job: Dict[str, Any]) -> None:
+        self._jobs[job["id"]] = dict(job)
+        self._items[job["id"]] = {}
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        job = self._jobs.get(job_id)
+        if job:
+            job.update(status=status, error=error, updated_at=time.time())
+
+    def start(self, job_id: str) -> bool:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return False
+        job.update(status=RUNNING, updated_at=time.time())
+        return True
+
+    def save_item(self, job_id: str, result: Dict[str, Any]) -> None:
+        if job_id in self._items:
+            self._items[job_id][result["index"]] = result
+            self._jobs[job_id]["updated_at"] = time.time()
+
+    def items(self, job_id: str) -> List[Dict[str, Any]]:
+        return [r for _, r in sorted(self._items.get(job_id, {}).items())]
+
+    def unfinished(self) -> List[str]:
+        return [j["id"] for j in self._jobs.values() if j["status"] not in FINISHED]
+
+    def prune(self, older_than: float) -> int:
+        stale = [jid for jid, j in self._jobs.items() if j["status"] in FINISHED and j["updated_at"] < older_than]
+        for jid in stale:
+            del self._jobs[jid]
+            del self._items[jid]
+        return len(stale)
+
+
+class SqliteJobStore(JobStore):
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, error TEXT, payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS job_items ("
+            " job_id TEXT NOT NULL, idx INTEGER NOT NULL, result TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, idx))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status)")
+        logger.info("Job store: SQLite at %s", path)
+
+    def create(self, job: Dict[str, Any]) -> None:
+        payload = {k: v for k, v in job.items() if k not in ("id", "status", "error", "created_at", "updated_at")}
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, error, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job.get("error"), json.dumps(payload), job["created_at"], job["updated_at"]),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, error, payload, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[3]), "id": row[0], "status": row[1], "error": row[2],
+                "created_at": row[4], "updated_at": row[5]}
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?", (status, error, time.time(), job_id)
+            )
+
+    def start(self, job_id: str) -> bool:
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ? AND status IN (?, ?)",
+                (RUNNING, time.time(), job_id, QUEUED, RUNNING),
+            )
+        return cur.rowcount > 0
+
+    def save_item(self, job_id: str, result: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO job_items (job_id, idx, result) VALUES (?, ?, ?)",
+                (job_id, result["index"], json.dumps(result)),
+            )
+            self._db.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def items(self, job_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT result FROM job_items WHERE job_id = ? ORDER BY idx", (job_id,)
+            ).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id FROM jobs WHERE status NOT IN (?, ?, ?) ORDER BY created_at", FINISHED
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def prune(self, older_than: float) -> int:
+        with self._lock:
+            stale = [r[0] for r in self._db.execute(
+                "SELECT id FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?", (*FINISHED, older_than)
+            )]
+            self._db.executemany("DELETE FROM job_items WHERE job_id = ?", [(j,) for j in stale])
+            self._db.executemany("DELETE FROM jobs WHERE id = ?", [(j,) for j in stale])
+        return len(stale)
+
+
+def make_job_store(path: Optional[str] = JOBS_DB) -> JobStore:
+    if path:
+        try:
+            return SqliteJobStore(path)
+        except Exception as e:
+            logger.warning("Job store: SQLite unavailable (%s); falling back to memory", e)
+    return MemoryJobStore()
+
+
+# ---------------------- manager --------------------------------------------
+class _Draining(Exception):
+    """Raised by a job's gate once the manager is shutting down."""
+
+
+class _JobGate(asyncio.Semaphore):
+    """Per-job parallelism gate that stops handing out slots while the manager drains."""
+
+    def __init__(self, value: int, manager: "JobManager"):
+        super().__init__(value)
+        self._manager = manager
+
+    async def acquire(self) -> bool:
+        await super().acquire()
+        if self._manager.draining:
+            self.release()
+            raise _Draining()
+        return True
+
+
+class JobManager:
+    def __init__(self, store: JobStore, workers: int = JOBS_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self.draining = False
+        self._runner: Optional[ItemRunner] = None
+        self._queue: "asyncio.Queue[str]" = None
+        self._queued: Set[str] = set()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, Set["asyncio.Queue[Tuple[str, Dict[str, Any]]]"]] = {}
+
+    # lifecycle -------------------------------------------------------------
+    async def start(self, runner: ItemRunner) -> None:
+        self._runner = runner
+        self.draining = False
+        self._queue = asyncio.Queue()
+        self._worker_tasks = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        if shared_state.shared:
+            # other workers may die holding a lease; pick their jobs up when it lapses
+            self._worker_tasks.append(asyncio.create_task(self._sweep()))
+        resumed = self.store.unfinished()
+        for job_id in resumed:
+            self._enqueue(job_id)
+        if resumed:
+            logger.info("jobs: resuming %d unfinished job(s)", len(resumed))
+
+    async def stop(self, drain_s: float = JOBS_DRAIN_S) -> None:
+        # jobs stay queued/running in the store and are picked up again on the next start
+        self.draining = True
+        running = list(self._running.values())
+        if running and drain_s > 0:
+            logger.info("jobs: draining %d running job(s) for up to %.0fs", len(running), drain_s)
+            _, pending = await asyncio.wait(running, timeout=drain_s)
+            if pending:
+                logger.warning("jobs: %d job(s) still running after the drain; cancelling", len(pending))
+        for t in self._worker_tasks:
+            t.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    # API -------------------------------------------------------------------
+    def submit(self, context: Dict[str, Any], outline: List[Any], parallelism: int) -> Dict[str, Any]:
+        if self._queue is None:
+            raise RuntimeError("job manager not started")
+        now = time.time()
+        self.store.prune(now - JOBS_RETENTION_S)
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": QUEUED,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "total": len(outline),
+            "parallelism": parallelism,
+            "context": context,
+            "outline": outline,
+        }
+        self.store.create(job)
+        self._enqueue(job["id"])
+        return job
+
+    def status(self, job_id: str, include_items: bool = True) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        items = self.store.items(job_id)
+        out = {
+            "id": job["id"],
+            "status": job["status"],
+            "error": job.get("error"),
+            "total": job["total"],
+            "completed": len(items),
+            "failed": sum(1 for r in items if r.get("error")),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+        if include_items:
+            out["items"] = items
+        return out
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+        if job["status"] not in FINISHED:
+            # a job running on another worker notices at its next lease renewal
+            self.store.set_status(job_id, CANCELLED)
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+            self._publish(job_id, "done", self.status(job_id, include_items=False))
+            logger.info("jobs: %s cancelled", job_id)
+        return self.status(job_id, include_items=False)
+
+    def subscribe(self, job_id: str) -> "asyncio.Queue[Tuple[str, Dict[str, Any]]]":
+        q: "asyncio.Queue[Tuple[str, Dict[str, Any]]]" = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(q)
+        return q
+
+    def unsubscribe(self, job_id: str, q: "asyncio.Queue") -> None:
+        subs = self._subscribers.get(job_id)
+        if subs:
+            subs.discard(q)
+            if not subs:
+                del self._subscribers[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._worker_tasks),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "backend": type(self.store).__name__,
+            "shared": shared_state.shared,
+        }
+
+    # internals -------------------------------------------------------------
+    def _publish(self, job_id: str, event: str, data: Dict[str, Any]) -> None:
+        for q in self._subscribers.get(job_id, ()):
+            q.put_nowait((event, data))
+
+    def _enqueue(self, job_id: str) -> None:
+        if job_id not in self._queued and job_id not in self._running:
+            self._queued.add(job_id)
+            self._queue.put_nowait(job_id)
+
+    async def _sweep(self) -> None:
+        while True:
+            await asyncio.sleep(JOBS_LEASE_S)
+            try:
+                for job_id in self.store.unfinished():
+                    self._enqueue(job_id)
+            except Exception:
+                logger.exception("jobs: sweep failed")
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            job_id = await self._queue.get()
+            self._queued.discard(job_id)
+            task = asyncio.create_task(self._run_job(job_id))
+            self._running[job_id] = task
+            try:
+                # wait() instead of await: a cancelled job must not take the worker down
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+            finally:
+                self._running.pop(job_id, None)
+
+    async def _run_job(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            return
+        lease = f"job:{job_id}"
+        if not shared_state.claim(lease, worker_id(), JOBS_LEASE_S):
+            logger.debug("jobs: %s is running on another worker", job_id)
+            return
+        keeper = asyncio.create_task(self._keep_lease(job_id, lease, asyncio.current_task())) if shared_state.shared else None
+        try:
+            # another worker may have finished it between the read and the claim
+            job = self.store.get(job_id)
+            if job is not None and job["status"] not in FINISHED:
+                await self._run_claimed(job_id, job)
+        finally:
+            if keeper is not None:
+                keeper.cancel()
+            shared_state.release(lease, worker_id())
+
+    async def _keep_lease(self, job_id: str, lease: str, task: asyncio.Task) -> None:
+        while True:
+            await asyncio.sleep(JOBS_LEASE_S / 3)
+            job = self.store.get(job_id)
+            if job is None or job["status"] == CANCELLED:
+                task.cancel()
+                return
+            if not shared_state.claim(lease, worker_id(), JOBS_LEASE_S):
+                logger.warning("jobs: lost the lease on %s; stopping here", job_id)
+                task.cancel()
+                return
+
+    async def _run_claimed(self, job_id: str, job: Dict[str, Any]) -> None:
+        # log lines from this job's items carry the job id as their request id
+        request_id_var.set(job_id)
+        done = {r["index"] for r in self.store.items(job_id)}
+        pending = [(i, it) for i, it in enumerate(job["outline"]) if i not in done]
+        if not self.store.start(job_id):
+            # cancelled (here or on another worker) since it was read
+            logger.info("jobs: %s finished or cancelled before it started; skipping", job_id)
+            return
+        self._publish(job_id, "status", {"status": RUNNING})
+        logger.info("jobs: %s running %d/%d item(s)", job_id, len(pending), job["total"])
+
+        gate = _JobGate(job["parallelism"], self)
+        drained = []
+
+        async def one(index: int, scaffold: Any) -> None:
+            try:
+                result = await self._runner(job["context"], gate, index, scaffold)
+            except _Draining:
+                drained.append(index)
+                return
+            self.store.save_item(job_id, result)
+            self._publish(job_id, "item", result)
+
+        try:
+            await asyncio.gather(*(one(i, it) for i, it in pending))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("jobs: %s failed", job_id)
+            self.store.set_status(job_id, FAILED, str(e)[:500])
+        else:
+            if drained:
+                # still marked running: resumed (without the finished items) on the next start
+                logger.info("jobs: %s paused for shutdown with %d item(s) left", job_id, len(drained))
+                return
+            self.store.set_status(job_id, COMPLETED)
+        self._publish(job_id, "done", self.status(job_id, include_items=False))
+
+
+job_manager = JobManager(make_job_store())
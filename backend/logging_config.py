@@ -0,0 +1,244 @@
+# backend/logging_config.py
+"""
+Logging setup for the backend; configure_logging() is the only place that
+touches handlers or levels (modules just use getLogger("paradocs-gen")).
+
+* LOG_FORMAT=json (default) writes one JSON object per line with ts, level,
+  logger, msg, request_id and any `extra=` fields; LOG_FORMAT=text is the
+  plain format for local development.
+* Request ids: RequestIdMiddleware takes X-Request-ID from the client or
+  makes one, echoes it on the response and puts it in a ContextVar, so
+  every record logged while handling the request carries it. Background
+  jobs use their job id.
+* Sampling: INFO and below are rate limited per message template. The
+  first LOG_SAMPLE_BURST records of a template per second pass, then only
+  a LOG_SAMPLE_RATE fraction; the rest are counted in sampling_stats().
+  Warnings and errors are never sampled.
+* preview(obj) is a lazy, bounded stand-in for str(obj)[:n]: nothing is
+  rendered unless the record is actually emitted, and rendering stops after
+  LOG_PREVIEW_CHARS characters instead of repr-ing the whole object first.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_PREVIEW_CHARS = int(os.getenv("LOG_PREVIEW_CHARS", "300"))
+LOG_SAMPLE_BURST = int(os.getenv("LOG_SAMPLE_BURST", "20"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.05"))
+
+request_id_var: ContextVar[str] = ContextVar("paradocs_request_id", default="-")
+
+# attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+# ---------------------- previews --------------------------------------------
+def _bounded(obj: Any, out: List[str], budget: int, depth: int = 0) -> int:
+    """Append a repr-like rendering of obj to out; returns the budget left."""
+    if budget <= 0:
+        return budget
+    if isinstance(obj, dict):
+        out.append("{")
+        budget -= 1
+        for i, (k, v) in enumerate(obj.items()):
+            if budget <= 0 or depth > 6:
+                out.append(f"…+{len(obj) - i}")
+                budget = 0
+                break
+            if i:
+                out.append(", ")
+            key = f"{k!r}: "
+            out.append(key)
+            budget = _bounded(v, out, budget - len(key) - 2, depth + 1)
+        out.append("}")
+        return budget - 1
+    if isinstance(obj, (list, tuple)):
+        out.append("[")
+        budget -= 1
+        for i, v in enumerate(obj):
+            if budget <= 0 or depth > 6:
+                out.append(f"…+{len(obj) - i}")
+                budget = 0
+                break
+            if i:
+                out.append(", ")
+            budget = _bounded(v, out, budget - 2, depth + 1)
+        out.append("]")
+        return budget - 1
+    if isinstance(obj, str):
+        text = repr(obj[:budget + 1])
+    else:
+        text = repr(obj)
+    if len(text) > budget:
+        text = text[:budget] + "…"
+    out.append(text)
+    return budget - len(text)
+
+
+class preview:
+    """
+    `logger.info("body: %s", preview(body))`. With shape=True only the
+    top-level keys and value types are shown (lengths for lists/strings).
+    """
+
+    __slots__ = ("obj", "limit", "shape")
+
+    def __init__(self, obj: Any, limit: int = LOG_PREVIEW_CHARS, shape: bool = False):
+        self.obj = obj
+        self.limit = limit
+        self.shape = shape
+
+    def __str__(self) -> str:
+        obj = self.obj
+        if self.shape and isinstance(obj, dict):
+            obj = {k: _shape_of(v) for k, v in list(obj.items())[:32]}
+        out: List[str] = []
+        _bounded(obj, out, self.limit)
+        text = "".join(out)
+        return text if len(text) <= self.limit else text[: self.limit] + "…"
+
+    __repr__ = __str__
+
+
+def _shape_of(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, dict, str)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+# ---------------------- request ids -----------------------------------------
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+class RequestIdMiddleware:
+    """Pure ASGI: sets request_id_var for the request and returns X-Request-ID."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rid = ""
+        for name, value in scope.get("headers") or ():
+            if name == b"x-request-id":
+                # client-supplied ids are trusted for correlation only; keep them short
+                rid = value.decode("latin-1").strip()[:64]
+                break
+        rid = rid or new_request_id()
+        token = request_id_var.set(rid)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
+
+
+# ---------------------- filters / formatters --------------------------------
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _SamplingFilter(logging.Filter):
+    """Per-template rate limit for INFO and below (see module docstring)."""
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, rate: float = LOG_SAMPLE_RATE):
+        super().__init__()
+        self.burst = burst
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._windows: Dict[Any, List[float]] = {}
+        self.dropped = 0
+        self.passed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.burst <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.name, record.msg)
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= 1.0:
+                if len(self._windows) > 4096:
+                    self._windows.clear()
+                window = self._windows[key] = [now, 0]
+            window[1] += 1
+            keep = window[1] <= self.burst or random.random() < self.rate
+            if keep:
+                self.passed += 1
+            else:
+                self.dropped += 1
+            return keep
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+_sampler: Optional[_SamplingFilter] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None) -> None:
+    """Install the root handler. Safe to call more than once (last call wins)."""
+    global _sampler
+    # read at call time so values from .env (loaded by main) apply
+    level = level or os.getenv("LOG_LEVEL", LOG_LEVEL).upper()
+    fmt = fmt or os.getenv("LOG_FORMAT", LOG_FORMAT).lower()
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+    _sampler = _SamplingFilter()
+    handler.addFilter(_RequestIdFilter())
+    handler.addFilter(_sampler)
+
+    root = logging.getLogger()
+    for old in list(root.handlers):
+        if getattr(old, "_paradocs", False):
+            root.removeHandler(old)
+    handler._paradocs = True
+    root.addHandler(handler)
+    root.setLevel(level)
+    # per-call INFO lines from the HTTP client stack only show up at DEBUG
+    for name in ("httpx", "httpcore", "asyncio", "google_genai"):
+        logging.getLogger(name).setLevel(logging.NOTSET if root.level <= logging.DEBUG else logging.WARNING)
+
+
+def sampling_stats() -> Dict[str, int]:
+    if _sampler is None:
+        return {"passed": 0, "dropped": 0}
+    return {"passed": _sampler.passed, "dropped": _sampler.dropped}
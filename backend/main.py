@@ -1,50 +1,91 @@
 # backend/main.py
 from fastapi import FastAPI, HTTPException, Body, Request
-from fastapi.responses import JSONResponse
-from typing import Any, Dict
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import json
+import asyncio
+import math
 import uuid
 import time
 import os
 import logging
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+
+# Load environment once, before the local imports below read it
+load_dotenv()
+
 from utils import now_ms, make_id
-from call_genai_json import call_genai_json
+from call_genai_json import call_genai_json_routed_async
+from generation_pipeline import (
+    SLIDE_SCHEMA,
+    GenerationError,
+    is_overload,
+    parse_model_json,
+    pipeline_stats,
+    run_pipeline,
+    stream_genai_text,
+    warm_up as warm_up_pipeline,
+)
+from genai_clients import GENAI_WARMUP
+from resilience import CircuitOpenError, resilience_stats
+from response_cache import response_cache, make_cache_key
+from jobs import FINISHED, job_manager
+from logging_config import RequestIdMiddleware, configure_logging, preview, sampling_stats
+from item_normalizer import normalize_item, normalize_stream, normalizer_stats
+from item_patch import apply_edits, json_patch, parse_edits
+from metrics import MetricsMiddleware, count_cache, count_fallback, current_model, render_metrics, set_doc_type, set_model, stage_timer
+from model_router import Route, model_router
+from office_export import MEDIA_TYPES, RENDERERS
+from prefetch import PrefetchItem, prefetcher, wants_prefetch
+from project_store import ProjectAccessDenied, item_keys, project_store
+from scheduler import BULK, INTERACTIVE, RateLimited, admit, llm_scheduler, set_flow
+from prompt_builder import (
+    OUTLINE_OUTPUT_TOKEN_BUDGET,
+    build_generate_prompt,
+    build_outline_prompt,
+    build_regenerate_patch_prompt,
+    build_regenerate_prompt,
+    compact_json,
+    layout_of,
+    max_output_tokens_for,
+    outline_chunks,
+    prompt_stats,
+)
+from single_flight import generation_flights
 # Your pydantic / dataclass request models
 from ProjectMeta import ProjectMeta
+from ItemEdits import ItemEdits
+from OutlineItems import OutlineItems
+from SlideItem import SlideItem
 from GenerateRequest import GenerateRequest
 from RegenerateRequest import RegenerateRequest
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import ValidationError
 import re
-# NEW: google-genai client import (modern SDK)
-# Install: pip install google-genai
-from google import genai  # modern import path per Google GenAI SDK docs
-import strictjson
-
-# Load environment
-load_dotenv()
-GENAI_API_KEY = os.getenv("GENAI_API_KEY")
-GENAI_MODEL = os.getenv("GENAI_MODEL", "gemini-2.5-flash")
-LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 
-# Logging setup
-logging.basicConfig(level=LOG_LEVEL)
+# Logging setup (level, format, sampling: see logging_config)
+configure_logging()
 logger = logging.getLogger("paradocs-gen")
 
-# Initialize genai client (modern SDK). If key missing, keep server running but warn.
-genai_client = None
-try:
-    if not GENAI_API_KEY:
-        logger.warning("GENAI_API_KEY not set. GenAI client will not be initialized.")
-    else:
-        # genai.Client picks up API key if provided here (or via env). See docs for Client usage.
-        genai_client = genai.Client(api_key=GENAI_API_KEY)
-        logger.info("Initialized google-genai client.")
-except Exception as e:
-    logger.exception("Failed to initialize google-genai client: %s", e)
-    genai_client = None
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if GENAI_WARMUP:
+        # in a thread: the SDK import takes most of a second; the worker
+        # takes traffic once it is done (otherwise the first calls build
+        # the clients, also off the loop, see genai_clients.ensure_client)
+        await asyncio.to_thread(warm_up_pipeline)
+    # background job workers; run_batch_item is defined further down
+    await job_manager.start(run_batch_item)
+    prefetcher.start(prefetch_item)
+    try:
+        yield
+    finally:
+        await prefetcher.stop()
+        await job_manager.stop()
 
-app = FastAPI(title="Paradocs AI - Generation API", version="0.0.1")
+
+app = FastAPI(title="Paradocs AI - Generation API", version="0.0.1", lifespan=lifespan)
 
 # CORS middleware - allow dev origins. For development you may temporarily use ["*"]
 origins = [
@@ -63,73 +104,42 @@ app.add_middleware(
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
     allow_headers=["*"],
 )
+# outermost, so CORS preflights and errors are timed too
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
-def normalize_slide_object(obj: Dict[str, Any]) -> Dict[str, Any]:
+def normalize_slide_object(obj: Dict[str, Any], doc_type: Optional[str] = None,
+                           enforce_limits: bool = True) -> Dict[str, Any]:
     """
-    Normalize and enforce the minimal JSON schema for a slide/section item.
+    Normalize and enforce the minimal JSON schema for a generated slide/section
+    item, including the doc type's content limits unless `enforce_limits` is
+    False (see item_normalizer).
     """
-    out: Dict[str, Any] = {}
-    out["id"] = int(obj.get("id") or make_id())
-    out["type"] = str(obj.get("type") or "slide")
-    out["layout"] = str(obj.get("layout") or obj.get("template") or "title+bullets")
-    out["title"] = str(obj.get("title") or "").strip()
-
-    # bullets -> list[str]
-    bullets = obj.get("bullets") or []
-    if isinstance(bullets, str):
-        bullets = [bullets]
-    out["bullets"] = [str(b).strip() for b in bullets] if bullets else []
-
-    # notes -> list[str]
-    notes = obj.get("notes") or obj.get("speaker_notes") or []
-    if isinstance(notes, str):
-        notes = [notes]
-    out["notes"] = [str(n).strip() for n in notes] if notes else []
-
-    # images -> list[str]
-    images = obj.get("images") or []
-    if isinstance(images, str):
-        images = [images]
-    out["images"] = [str(i).strip() for i in images] if images else []
-
-    meta = obj.get("meta") or {}
-    out["meta"] = meta if isinstance(meta, dict) else {}
-
-    return out
+    return normalize_item(obj, doc_type, enforce_limits)
 
 # ---------------------- Endpoints -----------------------------------------
-# add near the other imports at top of main.py
-try:
-    from strictjson.llm import gemini_sync
-    from strictjson import convert_schema_to_pydantic
-    STRICTJSON_AVAILABLE = True
-    logger.info("StrictJSON available - will try structured output path for /generate")
-except Exception:
-    STRICTJSON_AVAILABLE = False
-    logger.info("StrictJSON not installed; falling back to call_genai_json path for /generate")
-
-# compact StrictJSON slide schema used for structured outputs
-_STRICT_SLIDE_SCHEMA = {
-    "id": "Slide ID, int",
-    "type": "Item type, str",
-    "layout": "Layout name, str",
-    "title": "Slide title, str",
-    "bullets": ["Bullet text, str"],
-    "notes": ["Speaker note text, str"],
-    "images": ["Image URL or path, str"],
-    "meta": {"generator": "LLM model name, str"}
-}
-
-# replace your generate_raw function with this
-@app.post("/generate", response_model=Dict[str, Any])
-async def generate_raw(request: Request, body: Dict[str, Any] = Body(...)):
-    logger.info("Raw /generate body received: %s", str(body)[:1000])
+# Upper bound for /generate/batch fan-out, regardless of what the client asks for
+BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "8"))
+BATCH_DEFAULT_PARALLELISM = int(os.getenv("BATCH_DEFAULT_PARALLELISM", "4"))
+# /jobs/{id}/events re-reads the job store when no local event arrived for this long
+JOB_EVENTS_POLL_S = float(os.getenv("JOB_EVENTS_POLL_S", "2"))
+# /generate/batch without a `mode`: "items" (one call per item), "outline" (one call per
+# chunk of items) or "auto" (outline for outlines of at most OUTLINE_MODE_MAX_ITEMS items)
+BATCH_DEFAULT_MODE = os.getenv("BATCH_DEFAULT_MODE", "items").lower()
+OUTLINE_MODE_MAX_ITEMS = int(os.getenv("OUTLINE_MODE_MAX_ITEMS", "24"))
+# /regenerate without a `mode`: "full" (whole item back) or "patch" (edit set + JSON Patch)
+REGENERATE_DEFAULT_MODE = os.getenv("REGENERATE_DEFAULT_MODE", "full").lower()
 
+
+def resolve_generate_context(body: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Pull userId / docType / mainTopic out of a /generate style body, falling
+    back to the embedded project object. Raises HTTPException on missing fields.
+    """
     user_id = body.get("userId") or body.get("user_id")
     project_id = body.get("projectId") or body.get("project_id") or body.get("projectIdDraft")
     doc_type = body.get("docType") or body.get("doc_type")
     main_topic = body.get("mainTopic") or body.get("main_topic") or ""
-    outline_item = body.get("outlineItem") or body.get("scaffold") or body.get("outline_item")
 
     projects_field = body.get("projects") or body.get("project")
     project_object = None
@@ -155,77 +165,482 @@ async def generate_raw(request: Request, body: Dict[str, Any] = Body(...)):
     if not main_topic:
         raise HTTPException(status_code=422, detail="projects.mainTopic is required (or provide mainTopic at top-level)")
 
-    scaffold = outline_item or {}
-    hints = body.get("hints", {}) or {}
-    temperature = body.get("temperature", 0.2)
-
-    # Build a concise prompt to send to the LLM
-    prompt = (
-        f"Project docType: {doc_type}\n"
-        f"Main topic: {main_topic}\n"
-        f"Scaffold (outline item): {scaffold}\n"
-        f"Hints: {hints}\n\n"
-        "Return a single strictly JSON object only with the following keys: id, type, layout, title, bullets, notes, images, meta. "
-        "Keep bullets concise unless hints request otherwise. Make sure to include all necessary delimeters for proper JSON. DO NOT MISS ANY DELIMETERS. For `meta`, include generator metadata keys only. "
-        "If you cannot supply images, set images to an empty array. No commentary — JSON only."
-    )
+    return {
+        "user_id": user_id,
+        "project_id": project_id,
+        "doc_type": doc_type,
+        "main_topic": main_topic,
+        "project": project_object if isinstance(project_object, dict) else None,
+        "hints": body.get("hints", {}) or {},
+        "temperature": body.get("temperature", 0.2),
+        "use_cache": not request_bypasses_cache(body),
+    }
 
-    # Example: if you want the model to examine an image uploaded earlier, use this local path (you provided this file):
-    # NOTE: the path is local to your environment and will be transformed by your tooling into a usable URL where necessary.
-    example_image_path = "/mnt/data/acf0b352-cd27-467f-91ed-53d3ab1e2dde.png"
 
-    # 1) If StrictJSON is available, prefer structured StrictJSON call (gemini_sync)
-    if STRICTJSON_AVAILABLE:
-        try:
-            # include the example image as part of the user prompt when relevant
-            user_prompt = prompt
-            # only add image hint if scaffold or hints mention images or if you want multimodal extraction:
-            user_prompt += f"\n\nOptional image for context: <<{example_image_path}>>"
-
-            # call gemini_sync with the compact slide schema -> returns typed python dict
-            res = gemini_sync(
-                system_prompt="Return exactly one JSON object that conforms to the requested schema. Do not include commentary or extra text.",
-                user_prompt=user_prompt,
-                output_format=_STRICT_SLIDE_SCHEMA,
-                model=GENAI_MODEL,
-                temperature=temperature,
-            )
-            # gemini_sync should return a python dict consistent with schema
-            # If it returns a pydantic-like object, convert to dict
-            parsed = res if isinstance(res, dict) else (res.model_dump() if hasattr(res, "model_dump") else dict(res))
-            logger.debug("StrictJSON gemini_sync returned: %s", str(parsed)[:800])
-        except Exception as e:
-            logger.warning("StrictJSON gemini_sync failed, falling back to call_genai_json. Error: %s", e)
-            # fallback to call_genai_json below
-            parsed = None
-    else:
-        parsed = None
+def request_bypasses_cache(body: Dict[str, Any]) -> bool:
+    """True when the client asked to skip the response cache (noCache / no_cache)."""
+    bypass = bool(body.get("noCache") or body.get("no_cache"))
+    if bypass:
+        response_cache.note_bypass()
+    return bypass
 
-    # 2) Fallback: call the resilient parser (call_genai_json)
-        if parsed is None:
-            try:
-                parsed = call_genai_json(prompt, temperature=temperature, max_output_tokens=1200)
-            except ValueError as e:
-                logger.error("Model output parse error: %s", e)
-                raise HTTPException(status_code=502, detail=str(e))
-            except Exception as e:
-                logger.exception("LLM call failed")
-                raise HTTPException(status_code=502, detail="LLM call failed") from e
 
-    # Normalize / enforce shape
-    item = normalize_slide_object(parsed)
+def route_for(doc_type: Optional[str], item: Any, hints: Optional[Dict[str, Any]] = None) -> Route:
+    """Pick the model tier for one item (see model_router)."""
+    item_chars = len(compact_json(item)) if item else 0
+    return model_router.route(doc_type, layout_of(item), item_chars, hints)
+
+
+def generate_cache_key(prompt: str, temperature: float, route: Route) -> str:
+    # keyed on the tier's primary: a failover answer is still a valid answer for the tier
+    return make_cache_key(route.primary, prompt, temperature, SLIDE_SCHEMA)
+
+
+def finalize_generated(parsed: Dict[str, Any], model: str, cache_hit: bool = False,
+                       strategy: Optional[str] = None, doc_type: Optional[str] = None) -> Dict[str, Any]:
+    """Normalize a parsed model response and stamp generation metadata."""
+    with stage_timer("normalize"):
+        item = normalize_slide_object(parsed, doc_type)
 
     item_meta = item.get("meta", {})
     item_meta.update({
         "generated_at": now_ms(),
-        "generator": GENAI_MODEL,
-        "raw_response_preview": (str(parsed)[:200])
+        "generator": model,
+        "raw_response_preview": (str(parsed)[:200]),
+        "cache_hit": cache_hit,
+        "strategy": "cache" if cache_hit else strategy,
     })
     item["meta"] = item_meta
+    return item
+
+
+async def generate_item(doc_type: str,
+                        main_topic: str,
+                        scaffold: Any,
+                        hints: Dict[str, Any],
+                        temperature: float = 0.2,
+                        use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Run one outline item through the LLM and return the normalized item.
+    Raises HTTPException(502) when the model call or parsing fails.
+    """
+    set_doc_type(doc_type)
+    route = route_for(doc_type, scaffold, hints)
+    set_model(route.primary)
+    with stage_timer("prompt_build"):
+        prompt = build_generate_prompt(doc_type, main_topic, scaffold, hints)
+
+    cache_key = generate_cache_key(prompt, temperature, route)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        count_cache("miss" if cached is None else "hit")
+        if cached is not None:
+            return finalize_generated(cached, route.primary, cache_hit=True, doc_type=doc_type)
+    else:
+        count_cache("bypass")
+
+    max_output_tokens = max_output_tokens_for(doc_type, layout_of(scaffold))
+
+    async def fetch() -> Tuple[Dict[str, Any], str, str]:
+        parsed, strategy, model = await call_generate_llm(prompt, temperature, max_output_tokens, route)
+        if use_cache:
+            response_cache.set(cache_key, parsed)
+        return parsed, strategy, model
+
+    # identical concurrent requests share one model call
+    parsed, strategy, model = await generation_flights.do(cache_key, fetch)
+
+    # Normalize / enforce shape
+    return finalize_generated(parsed, model, strategy=strategy, doc_type=doc_type)
 
+
+async def call_generate_llm(prompt: str, temperature: float = 0.2, max_output_tokens: int = 1200,
+                            route: Optional[Route] = None) -> Tuple[Dict[str, Any], str, str]:
+    """Model call + parsing for /generate: (parsed, strategy, model). Raises HTTPException(502) on failure."""
+    try:
+        return await run_pipeline(prompt, temperature=temperature, max_output_tokens=max_output_tokens, route=route)
+    except GenerationError as e:
+        logger.error("Generation failed: %s", e.failures)
+        raise llm_http_error(e) from e
+
+
+def llm_http_error(e: GenerationError) -> HTTPException:
+    """502 for model failures; 503 + Retry-After while the circuit is open."""
+    cause = e.__cause__
+    if isinstance(cause, CircuitOpenError):
+        return HTTPException(
+            status_code=503,
+            detail=str(cause),
+            headers={"Retry-After": str(max(1, math.ceil(cause.retry_after_s)))},
+        )
+    return HTTPException(status_code=502, detail=str(e))
+
+
+async def admit_request(user_id: Any, project_id: Any, priority: str, items: int = 1) -> None:
+    """Set the scheduler flow for this request and charge the user's rate limit; 429 + Retry-After when over it."""
+    set_flow(user_id, project_id, priority)
+    try:
+        await admit(user_id, priority, items)
+    except RateLimited as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after_s)))},
+        )
+
+
+@app.post("/generate", response_model=Dict[str, Any])
+async def generate_raw(request: Request, body: Dict[str, Any] = Body(...)):
+    logger.info("/generate: body %s", preview(body))
+
+    ctx = resolve_generate_context(body)
+    await admit_request(ctx["user_id"], ctx["project_id"], INTERACTIVE)
+    outline_item = body.get("outlineItem") or body.get("scaffold") or body.get("outline_item")
+
+    item = await generate_item(
+        ctx["doc_type"], ctx["main_topic"], outline_item or {}, ctx["hints"], ctx["temperature"], ctx["use_cache"]
+    )
     return JSONResponse(status_code=200, content=item)
 
 
+def resolve_batch_items(body: Dict[str, Any], ctx: Dict[str, Any]):
+    """Return (outline_items, parallelism) for a batch body, or raise HTTPException."""
+    outline_items = body.get("outlineItems") or body.get("outline_items")
+    if outline_items is None and ctx["project"]:
+        outline_items = ctx["project"].get("outline")
+    if not isinstance(outline_items, list) or not outline_items:
+        raise HTTPException(status_code=422, detail="outlineItems must be a non-empty list (or provide projects.outline)")
+
+    try:
+        parallelism = int(body.get("parallelism") or BATCH_DEFAULT_PARALLELISM)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="parallelism must be an integer")
+    parallelism = max(1, min(parallelism, BATCH_MAX_PARALLELISM))
+    return outline_items, parallelism
+
+
+async def run_batch_item(ctx: Dict[str, Any], gate: asyncio.Semaphore, index: int, scaffold: Any) -> Dict[str, Any]:
+    """Generate one batch entry under `gate`; failures are reported, not raised."""
+    # batch and job items share the model capacity as bulk work
+    set_flow(ctx["user_id"], ctx.get("project_id"), BULK)
+    async with gate:
+        try:
+            item = await generate_item(
+                ctx["doc_type"], ctx["main_topic"], scaffold or {}, ctx["hints"], ctx["temperature"], ctx["use_cache"]
+            )
+            return {"index": index, "item": item, "error": None}
+        except HTTPException as e:
+            return {"index": index, "item": None, "error": {"status": e.status_code, "detail": e.detail}}
+        except Exception as e:
+            logger.exception("Batch item %d failed", index)
+            return {"index": index, "item": None, "error": {"status": 500, "detail": str(e)}}
+
+
+@app.post("/generate/batch", response_model=Dict[str, Any])
+async def generate_batch(request: Request, body: Dict[str, Any] = Body(...)):
+    """
+    Generate several outline items in one request. Accepts the same body as
+    /generate plus `outlineItems` (defaults to the project's outline) and an
+    optional `parallelism`. Items run concurrently, at most `parallelism` at a
+    time, and each result carries its own error so one failure doesn't sink
+    the batch. Results come back in input order.
+
+    `mode: "outline"` sends the items in chunks, one model call per chunk
+    (see generate_outline_chunk); `"auto"` does that for short outlines.
+    """
+    ctx = resolve_generate_context(body)
+    outline_items, parallelism = resolve_batch_items(body, ctx)
+    await admit_request(ctx["user_id"], ctx["project_id"], BULK, len(outline_items))
+    mode = str(body.get("mode") or BATCH_DEFAULT_MODE).lower()
+    if mode == "auto":
+        mode = "outline" if len(outline_items) <= OUTLINE_MODE_MAX_ITEMS else "items"
+
+    logger.info("/generate/batch: %d items, parallelism=%d, mode=%s", len(outline_items), parallelism, mode)
+    gate = asyncio.Semaphore(parallelism)
+
+    extra: Dict[str, Any] = {}
+    if mode == "outline":
+        results, extra = await run_outline_batch(ctx, gate, outline_items)
+    else:
+        mode = "items"
+        results = await asyncio.gather(*(run_batch_item(ctx, gate, i, it) for i, it in enumerate(outline_items)))
+    failed = sum(1 for r in results if r["error"])
+
+    return JSONResponse(status_code=200, content={"items": results, "failed": failed, "mode": mode, **extra})
+
+
+async def run_outline_batch(ctx: Dict[str, Any], gate: asyncio.Semaphore, outline_items: list):
+    """
+    Outline mode: one model call per chunk of items (prompt_builder.outline_chunks,
+    one model tier per chunk), chunks in parallel under `gate`. Items a chunk's
+    answer has no usable object for are retried with a per-item call.
+    Returns (results in input order, {"chunks", "retried"}).
+    """
+    scaffolds = [it or {} for it in outline_items]
+    tiers = [route_for(ctx["doc_type"], s, ctx["hints"]).tier for s in scaffolds]
+    chunks = outline_chunks(ctx["doc_type"], ctx["main_topic"], scaffolds, ctx["hints"], tiers)
+
+    async def one_chunk(positions):
+        async with gate:
+            return positions, await generate_outline_chunk(ctx, [scaffolds[p] for p in positions])
+
+    results: list = [None] * len(scaffolds)
+    retry = []
+    for positions, items in await asyncio.gather(*(one_chunk(c) for c in chunks)):
+        for pos, item in zip(positions, items):
+            if item is None:
+                retry.append(pos)
+            else:
+                results[pos] = {"index": pos, "item": item, "error": None}
+    if retry:
+        logger.info("outline mode: retrying %d of %d items one by one", len(retry), len(scaffolds))
+        for r in await asyncio.gather(*(run_batch_item(ctx, gate, p, scaffolds[p]) for p in retry)):
+            results[r["index"]] = r
+    return results, {"chunks": len(chunks), "retried": len(retry)}
+
+
+async def generate_outline_chunk(ctx: Dict[str, Any], scaffolds: list) -> list:
+    """
+    One model call for a chunk of outline items, answer constrained to
+    OutlineItems. Returns the normalized item per scaffold, or None where
+    the answer had none (missing, out-of-range or repeated index) or it
+    normalized to an empty item (no title, no bullets); the whole chunk is
+    None when the call fails.
+    """
+    doc_type = ctx["doc_type"]
+    set_doc_type(doc_type)
+    # every item of a chunk routes to the same tier; the biggest one picks the route
+    route = route_for(doc_type, max(scaffolds, key=lambda s: len(compact_json(s))), ctx["hints"])
+    set_model(route.primary)
+    with stage_timer("prompt_build"):
+        prompt = build_outline_prompt(doc_type, ctx["main_topic"], scaffolds, ctx["hints"])
+    max_output_tokens = min(OUTLINE_OUTPUT_TOKEN_BUDGET,
+                            sum(max_output_tokens_for(doc_type, layout_of(s)) for s in scaffolds))
+    try:
+        parsed, model = await call_genai_json_routed_async(
+            prompt, ctx["temperature"], max_output_tokens, ctx["use_cache"], route, response_model=OutlineItems
+        )
+    except GenerationError as e:
+        logger.warning("outline mode: chunk of %d failed, falling back to per-item calls: %s", len(scaffolds), e)
+        count_fallback("outline", "per_item", route.primary)
+        return [None] * len(scaffolds)
+
+    by_index: Dict[int, Dict[str, Any]] = {}
+    # legacy mode's raw_json answer is unvalidated JSON
+    for obj in (parsed.get("items") if isinstance(parsed, dict) else None) or []:
+        if not isinstance(obj, dict):
+            continue
+        index = obj.pop("index", None)
+        if isinstance(index, int) and 0 <= index < len(scaffolds) and index not in by_index:
+            by_index[index] = obj
+    out = []
+    for index in range(len(scaffolds)):
+        obj = by_index.get(index)
+        if obj is None:
+            out.append(None)
+            continue
+        # one answer holds several items: the model's ids would collide
+        obj["id"] = None
+        item = finalize_generated(obj, model, strategy="outline", doc_type=doc_type)
+        out.append(item if item["title"] or item["bullets"] else None)
+    missing = out.count(None)
+    if missing:
+        count_fallback("outline", "per_item", model)
+        logger.info("outline mode: %d of %d items unusable in the answer", missing, len(scaffolds))
+    return out
+
+
+# ---------------------- Streaming -----------------------------------------
+# Streaming endpoints speak NDJSON by default (one JSON object per line with
+# an "event" key). Clients sending `Accept: text/event-stream` get SSE frames
+# with the same payloads instead.
+
+def wants_sse(request: Request) -> bool:
+    return "text/event-stream" in (request.headers.get("accept") or "")
+
+
+def encode_stream_event(event: str, data: Dict[str, Any], sse: bool) -> str:
+    if sse:
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({"event": event, **data}) + "\n"
+
+
+def stream_response(events: AsyncIterator[str], sse: bool) -> StreamingResponse:
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    # X-Accel-Buffering stops nginx-style proxies from holding the stream back
+    return StreamingResponse(events, media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.post("/generate/stream")
+async def generate_stream(request: Request, body: Dict[str, Any] = Body(...)):
+    """
+    Streaming variant of /generate for a single item. Emits `token` events
+    with raw model text as it arrives, then one `item` event carrying the
+    normalized item (or an `error` event if the output can't be parsed).
+    """
+    ctx = resolve_generate_context(body)
+    await admit_request(ctx["user_id"], ctx["project_id"], INTERACTIVE)
+    outline_item = body.get("outlineItem") or body.get("scaffold") or body.get("outline_item")
+    set_doc_type(ctx["doc_type"])
+    route = route_for(ctx["doc_type"], outline_item, ctx["hints"])
+    set_model(route.primary)
+    with stage_timer("prompt_build"):
+        prompt = build_generate_prompt(ctx["doc_type"], ctx["main_topic"], outline_item or {}, ctx["hints"])
+    sse = wants_sse(request)
+
+    cache_key = generate_cache_key(prompt, ctx["temperature"], route)
+
+    async def events():
+        if ctx["use_cache"]:
+            cached = response_cache.get(cache_key)
+            count_cache("miss" if cached is None else "hit")
+            if cached is not None:
+                yield encode_stream_event("item", {"item": finalize_generated(cached, route.primary, cache_hit=True, doc_type=ctx["doc_type"])}, sse)
+                return
+
+        chunks = []
+        try:
+            max_output_tokens = max_output_tokens_for(ctx["doc_type"], layout_of(outline_item))
+            async for text in stream_genai_text(prompt, temperature=ctx["temperature"], max_output_tokens=max_output_tokens,
+                                                route=route):
+                chunks.append(text)
+                yield encode_stream_event("token", {"text": text}, sse)
+            with stage_timer("parse", "stream"):
+                parsed = parse_model_json("".join(chunks))
+            if ctx["use_cache"]:
+                response_cache.set(cache_key, parsed)
+            yield encode_stream_event("item", {"item": finalize_generated(parsed, current_model(), strategy="stream", doc_type=ctx["doc_type"])}, sse)
+        except ValueError as e:
+            logger.error("Streamed model output parse error: %s", e)
+            yield encode_stream_event("error", {"status": 502, "detail": str(e)}, sse)
+        except Exception as e:
+            logger.exception("LLM stream failed")
+            yield encode_stream_event("error", {"status": 502, "detail": f"LLM call failed: {str(e)}"}, sse)
+
+    return stream_response(events(), sse)
+
+
+@app.post("/generate/batch/stream")
+async def generate_batch_stream(request: Request, body: Dict[str, Any] = Body(...)):
+    """
+    Streaming variant of /generate/batch. Each item is emitted as an `item`
+    event as soon as its LLM call finishes (completion order, not input
+    order; use `index` to place it), followed by a final `done` event.
+    """
+    ctx = resolve_generate_context(body)
+    outline_items, parallelism = resolve_batch_items(body, ctx)
+    await admit_request(ctx["user_id"], ctx["project_id"], BULK, len(outline_items))
+    sse = wants_sse(request)
+
+    logger.info("/generate/batch/stream: %d items, parallelism=%d", len(outline_items), parallelism)
+
+    async def events():
+        gate = asyncio.Semaphore(parallelism)
+        tasks = [asyncio.create_task(run_batch_item(ctx, gate, i, it)) for i, it in enumerate(outline_items)]
+        failed = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                failed += 1 if result["error"] else 0
+                yield encode_stream_event("item", result, sse)
+            yield encode_stream_event("done", {"total": len(tasks), "failed": failed}, sse)
+        finally:
+            # client went away mid-stream: don't keep paying for the rest
+            for t in tasks:
+                t.cancel()
+
+    return stream_response(events(), sse)
+
+
+# ---------------------- Jobs ----------------------------------------------
+@app.post("/jobs", response_model=Dict[str, Any])
+async def create_job(body: Dict[str, Any] = Body(...)):
+    """
+    Queue a whole outline for background generation. Same body as
+    /generate/batch; returns 202 with the job id right away.
+    """
+    ctx = resolve_generate_context(body)
+    outline_items, parallelism = resolve_batch_items(body, ctx)
+    await admit_request(ctx["user_id"], ctx["project_id"], BULK, len(outline_items))
+    # the outline is stored separately; no need to keep the whole project twice
+    context = {k: v for k, v in ctx.items() if k != "project"}
+    job = job_manager.submit(context, outline_items, parallelism)
+    logger.info("/jobs: queued %s with %d items", job["id"], job["total"])
+    return JSONResponse(
+        status_code=202,
+        content={"id": job["id"], "status": job["status"], "total": job["total"]},
+        headers={"Location": f"/jobs/{job['id']}"},
+    )
+
+
+@app.get("/jobs/{job_id}", response_model=Dict[str, Any])
+async def get_job(job_id: str, items: bool = True):
+    """Progress counters plus the finished items so far (in input order)."""
+    status = job_manager.status(job_id, include_items=items)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return status
+
+
+@app.post("/jobs/{job_id}/cancel", response_model=Dict[str, Any])
+async def cancel_job(job_id: str):
+    status = job_manager.cancel(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return status
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    """
+    Follow a job: a `status` event, one `item` event per finished item
+    (items finished before connecting are replayed first), then `done`.
+    Reconnecting is always safe.
+    """
+    if job_manager.status(job_id, include_items=False) is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    sse = wants_sse(request)
+
+    async def events():
+        # subscribe before reading the store so nothing lands in between
+        queue = job_manager.subscribe(job_id)
+        try:
+            status = job_manager.status(job_id)
+            seen = set()
+            yield encode_stream_event("status", {"status": status["status"]}, sse)
+            for result in status.pop("items"):
+                seen.add(result["index"])
+                yield encode_stream_event("item", result, sse)
+            if status["status"] in FINISHED:
+                yield encode_stream_event("done", status, sse)
+                return
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=JOB_EVENTS_POLL_S)
+                except asyncio.TimeoutError:
+                    # the job may be running on another worker: catch up from the store
+                    status = job_manager.status(job_id)
+                    for result in status.pop("items"):
+                        if result["index"] not in seen:
+                            seen.add(result["index"])
+                            yield encode_stream_event("item", result, sse)
+                    if status["status"] in FINISHED:
+                        yield encode_stream_event("done", status, sse)
+                        return
+                    continue
+                if event == "item":
+                    if data["index"] in seen:
+                        continue
+                    seen.add(data["index"])
+                yield encode_stream_event(event, data, sse)
+                if event == "done":
+                    return
+        finally:
+            job_manager.unsubscribe(job_id, queue)
+
+    return stream_response(events(), sse)
+
+
 @app.post("/regenerate", response_model=Dict[str, Any])
 async def regenerate(reg_req: RegenerateRequest = None, request: Request = None):
     """
@@ -239,6 +654,11 @@ async def regenerate(reg_req: RegenerateRequest = None, request: Request = None)
     temperature = 0.2
     project_obj = None
     item_id = None
+    doc_type = None
+    project_id = None
+    user_id = None
+    use_cache = True
+    mode = REGENERATE_DEFAULT_MODE
 
     try:
         # If FastAPI gave us a pydantic model, convert it to a dict first (support v2/v1)
@@ -258,20 +678,24 @@ async def regenerate(reg_req: RegenerateRequest = None, request: Request = None)
             feedback = body.get("feedback_text") or body.get("feedbackText") or body.get("feedback") or ""
             temperature = body.get("temperature", 0.2)
             original_item = body.get("originalItem") or body.get("original_item") or body.get("item")
+            project_id = body.get("projectId") or body.get("project_id")
+            user_id = body.get("userId") or body.get("user_id")
+            use_cache = not request_bypasses_cache(body)
+            mode = body.get("mode") or mode
         else:
             # raw request.json() path
             body = await request.json()
-            try:
-                preview = {k: (type(v).__name__ if v is not None else "null") for k, v in (body.items() if isinstance(body, dict) else [])}
-                logger.debug("Regenerate request body keys/types: %s", preview)
-            except Exception:
-                logger.debug("Regenerate request body type: %s", type(body))
+            logger.debug("Regenerate request body keys/types: %s", preview(body, shape=True))
 
             item_id = body.get("item_id") or body.get("itemId") or body.get("item")
             feedback = body.get("feedback_text") or body.get("feedbackText") or body.get("feedback") or ""
             temperature = body.get("temperature", 0.2)
             project_obj = body.get("project") or body.get("projectObj") or body.get("projects")
             original_item = body.get("originalItem") or body.get("original_item") or body.get("item")
+            project_id = body.get("projectId") or body.get("project_id")
+            user_id = body.get("userId") or body.get("user_id")
+            use_cache = not request_bypasses_cache(body)
+            mode = body.get("mode") or mode
 
             if not original_item:
                 outline_item = body.get("outlineItem") or body.get("outline_item")
@@ -286,6 +710,21 @@ async def regenerate(reg_req: RegenerateRequest = None, request: Request = None)
         logger.exception("Failed to parse regenerate body/model: %s", e)
         raise HTTPException(status_code=400, detail="Invalid regenerate request body")
 
+    # single-item edits are interactive: they go ahead of bulk generation
+    await admit_request(user_id, project_id, INTERACTIVE)
+
+    # Indexed lookup in the server-side project store (PUT /projects/{id})
+    from_store = False
+    if original_item is None and item_id is not None and project_id:
+        try:
+            found = project_store.find_item(str(project_id), item_id, user_id)
+        except ProjectAccessDenied as e:
+            raise project_access_error(e)
+        if found:
+            original_item, stored_meta = found
+            doc_type = stored_meta.get("docType")
+            from_store = True
+
     # Deep-search helper
     def deep_search_for_generated(o):
         if not isinstance(o, dict):
@@ -389,7 +828,7 @@ async def regenerate(reg_req: RegenerateRequest = None, request: Request = None)
         logger.debug("Regenerate original_item not found. Debug preview: %s", debug_preview)
         raise HTTPException(
             status_code=400,
-            detail=f"originalItem not found in request. Provide originalItem / item / outlineItem with generated content OR include item_id and project.outline containing that id. DebugPreview: {debug_preview}"
+            detail=f"originalItem not found in request. Provide originalItem / item / outlineItem with generated content OR include item_id and project.outline containing that id (or projectId of a project uploaded via PUT /projects/{{id}}). DebugPreview: {debug_preview}"
         )
 
     # Unwrap if wrapped in generated
@@ -397,28 +836,46 @@ async def regenerate(reg_req: RegenerateRequest = None, request: Request = None)
         original_item = original_item["generated"]
 
     # Build prompt and call LLM
-    prompt = (
-        "You are given a JSON object representing a slide/section. Return a single JSON object ONLY that preserves the same top-level keys "
-        "and the same `id`, but updates the values according to the user's feedback. Do not wrap the JSON in text.\n\n"
-        "Make sure you do exactly as the user says and keep in mind the original content. Always create new content in context to the original content unless otherwise stated by the user"
-        f"Original: {original_item}\n\n"
-        f"User feedback: {feedback}\n\n"
-        "Apply changes necessary to satisfy the feedback. Keep bullets concise."
-    )
+    if doc_type is None and isinstance(project_obj, dict):
+        doc_type = project_obj.get("docType")
+    set_doc_type(doc_type)
+    route = route_for(doc_type, original_item)
+    set_model(route.primary)
+    max_output_tokens = max_output_tokens_for(doc_type, layout_of(original_item))
 
-    try:
-        # call_genai_json will extract/repair JSON as needed
-        parsed = call_genai_json(prompt, temperature=temperature, max_output_tokens=1200)
-        logger.debug("Regenerate parsed result type=%s keys=%s", type(parsed).__name__, (list(parsed.keys()) if isinstance(parsed, dict) else "list"))
-    except ValueError as e:
-        logger.error("Model output parse error on regenerate: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
-    except RuntimeError as e:
-        logger.exception("LLM regenerate runtime error: %s", e)
-        raise HTTPException(status_code=502, detail=str(e))
-    except Exception as e:
-        logger.exception("LLM regenerate failed: %s", e)
-        raise HTTPException(status_code=502, detail=f"LLM call failed: {str(e)}")
+    patch_mode = str(mode).lower() == "patch"
+    parsed = edits = None
+    if patch_mode:
+        # a small edit set instead of the whole item; None -> full regeneration below
+        patched = await regenerate_with_edits(original_item, feedback, temperature, max_output_tokens, use_cache, route)
+        if patched is not None:
+            edits, parsed, model = patched
+
+    if parsed is None:
+        with stage_timer("prompt_build"):
+            prompt = build_regenerate_prompt(original_item, feedback)
+        try:
+            # call_genai_json_routed_async will extract/repair JSON as needed; identical
+            # in-flight regenerations (double-submit, two tabs) share one call
+            flight_key = make_cache_key(route.primary, prompt, temperature, "regenerate")
+            parsed, model = await generation_flights.do(
+                flight_key,
+                lambda: call_genai_json_routed_async(prompt, temperature=temperature, max_output_tokens=max_output_tokens,
+                                                     use_cache=use_cache, route=route),
+            )
+            logger.debug("Regenerate parsed result type=%s keys=%s", type(parsed).__name__, (list(parsed.keys()) if isinstance(parsed, dict) else "list"))
+        except ValueError as e:
+            logger.error("Model output parse error on regenerate: %s", e)
+            raise HTTPException(status_code=502, detail=str(e))
+        except GenerationError as e:
+            logger.error("LLM regenerate failed: %s", e.failures)
+            raise llm_http_error(e) from e
+        except RuntimeError as e:
+            logger.exception("LLM regenerate runtime error: %s", e)
+            raise HTTPException(status_code=502, detail=str(e))
+        except Exception as e:
+            logger.exception("LLM regenerate failed: %s", e)
+            raise HTTPException(status_code=502, detail=f"LLM call failed: {str(e)}")
 
     # Ensure id stays same
     try:
@@ -435,14 +892,265 @@ async def regenerate(reg_req: RegenerateRequest = None, request: Request = None)
     except Exception:
         parsed["id"] = parsed.get("id") or make_id()
 
-    item = normalize_slide_object(parsed)
+    with stage_timer("normalize"):
+        # the user asked for this version; no clipping to the model-output limits
+        item = normalize_slide_object(parsed, doc_type, enforce_limits=False)
     item_meta = item.get("meta", {})
     item_meta.update({
         "regenerated_at": now_ms(),
         "regeneration_feedback": feedback,
-        "generator": GENAI_MODEL,
-        "raw_response_preview": str(parsed)[:200],
+        "generator": model,
+        "raw_response_preview": str(edits if edits is not None else parsed)[:200],
+        "regeneration_mode": "patch" if edits is not None else "full",
     })
     item["meta"] = item_meta
 
+    # keep the stored copy current so the next regenerate starts from this version;
+    # an item the client sent is the client's to save
+    if from_store:
+        try:
+            project_store.update_item(str(project_id), item_id, item, user_id)
+        except ProjectAccessDenied:
+            logger.warning("/regenerate: %s changed owner mid-request; not written back", project_id)
+
+    if patch_mode:
+        # `patch` turns the item the client sent (or we stored) into `item`
+        return JSONResponse(status_code=200, content={
+            "item": item,
+            "patch": json_patch(original_item, item),
+            "edits": edits,
+            "mode": item_meta["regeneration_mode"],
+        })
     return JSONResponse(status_code=200, content=item)
+
+
+async def regenerate_with_edits(original_item: Dict[str, Any], feedback: str, temperature: float,
+                                max_output_tokens: int, use_cache: bool, route: Route):
+    """
+    Patch-mode model call: ask for an edit set, apply it to the original and
+    validate the result. (edits, merged item, model), or None when the model's
+    edits can't be used and the caller should regenerate the whole item.
+    Overload / open circuit is raised as the usual 503, not retried in full.
+    """
+    with stage_timer("prompt_build"):
+        prompt = build_regenerate_patch_prompt(original_item, feedback)
+    flight_key = make_cache_key(route.primary, prompt, temperature, "regenerate-patch")
+    try:
+        parsed, model = await generation_flights.do(
+            flight_key,
+            lambda: call_genai_json_routed_async(prompt, temperature=temperature, max_output_tokens=max_output_tokens,
+                                                 use_cache=use_cache, route=route, response_model=ItemEdits),
+        )
+        with stage_timer("normalize", "patch"):
+            edits = parse_edits(parsed)
+            merged = apply_edits(original_item, edits)
+            SlideItem.model_validate(merged)
+    except GenerationError as e:
+        if is_overload(e):
+            logger.error("LLM regenerate (patch) failed: %s", e.failures)
+            raise llm_http_error(e) from e
+        logger.warning("Patch regenerate failed, regenerating in full: %s", e.failures)
+        count_fallback("patch", "full")
+        return None
+    except (ValueError, ValidationError) as e:
+        logger.warning("Unusable edit set, regenerating in full: %s", str(e)[:200])
+        count_fallback("patch", "full")
+        return None
+    return edits, merged, model
+
+
+# ---------------------- Projects ------------------------------------------
+def project_access_error(e: ProjectAccessDenied) -> HTTPException:
+    """403 for a project owned by another user (or a request without userId)."""
+    return HTTPException(status_code=403, detail=str(e))
+
+
+def check_project_owner(project_id: str, user_id: Optional[str]) -> None:
+    try:
+        project_store.get(project_id, user_id)
+    except ProjectAccessDenied as e:
+        raise project_access_error(e)
+
+
+@app.put("/projects/{project_id}", response_model=Dict[str, Any])
+async def put_project(project_id: str, body: Dict[str, Any] = Body(...)):
+    """
+    Upload (or replace) a project so later calls can refer to it by id.
+    Body: the project itself, or {"projects": {...}, "userId": ...}.
+    """
+    project = body.get("projects") or body.get("project") or body
+    if not isinstance(project, dict):
+        raise HTTPException(status_code=422, detail="project must be an object")
+    user_id = body.get("userId") or body.get("user_id")
+    try:
+        result = project_store.put(project_id, {k: v for k, v in project.items() if k not in PROJECT_CONTROL_KEYS}, user_id)
+    except ProjectAccessDenied as e:
+        raise project_access_error(e)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    logger.info("/projects: stored %s (%d items)", project_id, result["items"])
+
+    queue = wants_prefetch(body)
+    if queue or prefetcher.active(project_id):
+        # a save without the flag still cancels what it edited
+        ctx = prefetch_context(project, user_id, body)
+        if ctx is not None:
+            result["prefetch"] = prefetcher.schedule(project_id, ctx, prefetch_plan(ctx, project.get("outline")), queue)
+    return result
+
+
+@app.get("/projects/{project_id}/prefetch", response_model=Dict[str, Any])
+async def get_prefetch(project_id: str, userId: Optional[str] = None):
+    """This worker's prefetch queue for the project: pending items and outcomes so far."""
+    check_project_owner(project_id, userId)
+    status = prefetcher.status(project_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="no prefetch for this project")
+    return status
+
+
+@app.delete("/projects/{project_id}/prefetch", response_model=Dict[str, Any])
+async def cancel_prefetch(project_id: str, userId: Optional[str] = None):
+    check_project_owner(project_id, userId)
+    return {"projectId": project_id, "cancelled": prefetcher.cancel(project_id)}
+
+
+@app.get("/projects/{project_id}", response_model=Dict[str, Any])
+async def get_project(project_id: str, userId: Optional[str] = None):
+    try:
+        project = project_store.get(project_id, userId)
+    except ProjectAccessDenied as e:
+        raise project_access_error(e)
+    if project is None:
+        raise HTTPException(status_code=404, detail="project not found")
+    return project
+
+
+@app.delete("/projects/{project_id}", response_model=Dict[str, Any])
+async def delete_project(project_id: str, userId: Optional[str] = None):
+    try:
+        project_store.delete(project_id, userId)
+    except ProjectAccessDenied as e:
+        raise project_access_error(e)
+    prefetcher.cancel(project_id)
+    return {"projectId": project_id, "deleted": True}
+
+
+# ---------------------- Prefetch ------------------------------------------
+# request fields of PUT /projects that are not part of the project
+PROJECT_CONTROL_KEYS = ("userId", "user_id", "prefetch")
+
+
+def prefetch_context(project: Dict[str, Any], user_id: Any, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The generate context prefetch runs a saved project's items with; None without docType / mainTopic."""
+    doc_type = project.get("docType") or project.get("doc_type")
+    main_topic = project.get("mainTopic") or project.get("main_topic")
+    if not doc_type or not main_topic:
+        return None
+    return {
+        "user_id": user_id,
+        "doc_type": doc_type,
+        "main_topic": main_topic,
+        "hints": body.get("hints", {}) or {},
+        "temperature": body.get("temperature", 0.2),
+    }
+
+
+def prefetch_plan(ctx: Dict[str, Any], outline: Any) -> list:
+    """Outline entries without content.generated, keyed like /generate's cache will be."""
+    plan = []
+    for pos, entry in enumerate(outline if isinstance(outline, list) else ()):
+        if not isinstance(entry, dict):
+            continue
+        content = entry.get("content")
+        if isinstance(content, dict) and content.get("generated"):
+            continue
+        route = route_for(ctx["doc_type"], entry, ctx["hints"])
+        prompt = build_generate_prompt(ctx["doc_type"], ctx["main_topic"], entry, ctx["hints"])
+        keys = item_keys(entry)
+        plan.append(PrefetchItem(keys[0] if keys else f"#{pos}",
+                                 generate_cache_key(prompt, ctx["temperature"], route), entry))
+    return plan
+
+
+async def prefetch_item(ctx: Dict[str, Any], scaffold: Any) -> None:
+    """Prefetch runner: generate one item into the response cache."""
+    await generate_item(ctx["doc_type"], ctx["main_topic"], scaffold, ctx["hints"], ctx["temperature"], True)
+
+
+# ---------------------- Export --------------------------------------------
+def export_item_source(entry: Any) -> Optional[Dict[str, Any]]:
+    """Outline entries carry the item either directly or under content.generated."""
+    if not isinstance(entry, dict):
+        return None
+    content = entry.get("content")
+    if isinstance(content, dict) and isinstance(content.get("generated"), dict):
+        generated = dict(content["generated"])
+        generated.setdefault("title", entry.get("title"))
+        return generated
+    return entry
+
+
+def iter_export_items(outline: list, doc_type: Optional[str] = None):
+    # lazy on purpose: the renderer pulls items as it writes, normalized a
+    # chunk at a time; no content limits, these are the user's own edits
+    sources = (s for s in map(export_item_source, outline) if s is not None)
+    yield from normalize_stream(sources, doc_type, enforce_limits=False)
+
+
+@app.post("/export")
+async def export_document(body: Dict[str, Any] = Body(...)):
+    """
+    Render a project outline to .docx or .pptx and stream the file back.
+
+    Body: the project (`projects`/`project`, or the project fields at top
+    level) with docType, mainTopic, outline, template and logo_url. Outline
+    entries may be normalized items or outline items with content.generated.
+    """
+    project = body.get("projects") or body.get("project") or body
+    if not isinstance(project, dict):
+        raise HTTPException(status_code=422, detail="project must be an object")
+    doc_type = str(body.get("docType") or project.get("docType") or "").lower()
+    if doc_type not in RENDERERS:
+        raise HTTPException(status_code=422, detail="docType must be 'docx' or 'pptx'")
+    outline = body.get("items") or project.get("outline")
+    if not isinstance(outline, list):
+        raise HTTPException(status_code=422, detail="outline must be a list of items")
+
+    main_topic = str(project.get("mainTopic") or "").strip()
+    stream = RENDERERS[doc_type](
+        iter_export_items(outline, doc_type),
+        title=main_topic if doc_type == "docx" else "",
+        template=project.get("template"),
+        logo_url=project.get("logo_url"),
+    )
+    filename = (re.sub(r"[^A-Za-z0-9_-]+", "-", main_topic).strip("-")[:80] or "paradocs") + "." + doc_type
+    logger.info("/export: %s, %d outline entries", doc_type, len(outline))
+    # a sync iterator: Starlette runs the rendering in its threadpool, off the event loop
+    return StreamingResponse(stream, media_type=MEDIA_TYPES[doc_type],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+@app.get("/cache/stats", response_model=Dict[str, Any])
+async def cache_stats():
+    """Hit/miss/eviction counters for the LLM response cache, plus single-flight coalescing and prefetch."""
+    return {**response_cache.stats(), "single_flight": generation_flights.stats(), "prefetch": prefetcher.stats()}
+
+
+@app.get("/pipeline/stats", response_model=Dict[str, Any])
+async def generation_pipeline_stats():
+    """Per-strategy call counts, failures and latency, plus prompt sizes, normalizer counts and log sampling."""
+    return {**pipeline_stats(), "prompts": prompt_stats(), "normalizer": normalizer_stats(),
+            "log_sampling": sampling_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus text exposition: request latency, per-stage timings, tokens, fallbacks, cache and errors."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/llm/health", response_model=Dict[str, Any])
+async def llm_health():
+    """Circuit breaker state per model, retry counters, rate limiter waits, model routing and fair scheduling."""
+    return {**resilience_stats(), "router": model_router.stats(), "scheduler": llm_scheduler.stats()}
@@ -0,0 +1,329 @@
+# backend/metrics.py
+"""
+In-process metrics, exposed in the Prometheus text format at GET /metrics.
+
+No client library: counters, gauges and fixed-bucket histograms keyed by
+label tuples. Recording is a dict lookup, a bisect and a few float adds under
+an uncontended lock (about a microsecond), so it stays on in
+production. Values are per worker process.
+
+Labels `model` and `doc_type` are attached everywhere. Both come from a
+per-request label dict that MetricsMiddleware puts in a ContextVar: the
+handlers fill in doc_type via set_doc_type() (folded to docx / pptx /
+other / unknown so label cardinality stays bounded) and the pipeline sets
+the model that served the request via set_model(). Requests that never
+reach a model are labelled model="none".
+"""
+import bisect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0)
+STAGE_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_labels: ContextVar[Optional[Dict[str, str]]] = ContextVar("paradocs_metric_labels", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def _labels(self, values: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(str(v))}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1.0) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            cell = self._series.get(labels)
+            if cell is None:
+                self._series[labels] = [amount]
+            else:
+                cell[0] += amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            series = [(k, v[0]) for k, v in self._series.items()]
+        lines += [f"{self.name}_total{self._labels(k)} {_fmt(v)}" for k, v in series]
+        return lines
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, labels: Tuple[str, ...], value: float) -> None:
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._series[labels] = [value]
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            series = [(k, v[0]) for k, v in self._series.items()]
+        lines += [f"{self.name}{self._labels(k)} {_fmt(v)}" for k, v in series]
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        if not METRICS_ENABLED:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            cell = self._series.get(labels)
+            if cell is None:
+                # per-bucket counts (+Inf last), then sum, then count
+                cell = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            cell[i] += 1
+            cell[-2] += value
+            cell[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            series = [(k, list(v)) for k, v in self._series.items()]
+        for key, cell in series:
+            running = 0
+            for bound, n in zip(self.buckets + (float("inf"),), cell):
+                running += n
+                le = 'le="%s"' % ("+Inf" if bound == float("inf") else _fmt(bound))
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {running}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_fmt(round(cell[-2], 6))}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cell[-1]}")
+        return lines
+
+
+# ---------------------- the metrics -----------------------------------------
+http_request_seconds = Histogram(
+    "paradocs_http_request_duration_seconds", "End-to-end request latency (until the last body byte).",
+    ("endpoint", "method", "status", "model", "doc_type"),
+)
+stage_seconds = Histogram(
+    "paradocs_stage_duration_seconds",
+    "Time per generation stage: prompt_build, queue_wait, rate_limit_wait, llm_call, parse, repair, normalize.",
+    ("stage", "strategy", "model", "doc_type"), STAGE_BUCKETS,
+)
+llm_tokens = Counter(
+    "paradocs_llm_tokens", "Model tokens as reported by the API usage metadata (in, out, thinking).",
+    ("direction", "model", "doc_type"),
+)
+strategy_fallbacks = Counter(
+    "paradocs_strategy_fallbacks", "Times a generation strategy failed and the next one was tried.",
+    ("from_strategy", "to_strategy", "model", "doc_type"),
+)
+cache_lookups = Counter(
+    "paradocs_cache_lookups", "LLM response cache lookups by result (hit, miss, bypass).",
+    ("result", "model", "doc_type"),
+)
+errors = Counter(
+    "paradocs_errors", "Errors by class (http_<status>, circuit_open, generation_failed, max_tokens, exception type).",
+    ("error_class", "model", "doc_type"),
+)
+
+scheduler_queue_depth = Gauge(
+    "paradocs_scheduler_queue_depth", "Model calls waiting in the fair scheduler, by priority class.",
+    ("priority",),
+)
+scheduler_wait_seconds = Histogram(
+    "paradocs_scheduler_wait_seconds", "Time a model call waited in the fair scheduler for a slot.",
+    ("priority",), STAGE_BUCKETS,
+)
+rate_limited = Counter(
+    "paradocs_rate_limited", "Requests rejected with 429 by the per-user rate limits.",
+    ("priority",),
+)
+
+REGISTRY: List[_Metric] = [http_request_seconds, stage_seconds, llm_tokens, strategy_fallbacks, cache_lookups, errors,
+                           scheduler_queue_depth, scheduler_wait_seconds, rate_limited]
+
+
+# ---------------------- label helpers ---------------------------------------
+def _fold_doc_type(doc_type: Optional[str]) -> str:
+    value = (doc_type or "").lower()
+    if value in ("docx", "pptx"):
+        return value
+    return "other" if value else "unknown"
+
+
+def _labels_for_task() -> Dict[str, str]:
+    labels = _request_labels.get()
+    if labels is None:
+        # outside an HTTP request (background jobs): scope to the current task
+        labels = {}
+        _request_labels.set(labels)
+    return labels
+
+
+def set_doc_type(doc_type: Optional[str]) -> None:
+    _labels_for_task()["doc_type"] = _fold_doc_type(doc_type)
+
+
+def set_model(model: str) -> None:
+    _labels_for_task()["model"] = model
+
+
+def current_doc_type() -> str:
+    labels = _request_labels.get()
+    return labels.get("doc_type", "unknown") if labels else "unknown"
+
+
+def current_model() -> str:
+    labels = _request_labels.get()
+    return labels.get("model", "none") if labels else "none"
+
+
+def observe_stage(stage: str, seconds: float, strategy: str = "", model: Optional[str] = None) -> None:
+    stage_seconds.observe((stage, strategy, model or current_model(), current_doc_type()), seconds)
+
+
+def count_error(error_class: str, model: Optional[str] = None) -> None:
+    errors.inc((error_class, model or current_model(), current_doc_type()))
+
+
+def count_fallback(from_strategy: str, to_strategy: str, model: Optional[str] = None) -> None:
+    strategy_fallbacks.inc((from_strategy, to_strategy, model or current_model(), current_doc_type()))
+
+
+def count_cache(result: str, model: Optional[str] = None) -> None:
+    cache_lookups.inc((result, model or current_model(), current_doc_type()))
+
+
+def count_rate_limited(priority: str) -> None:
+    rate_limited.inc((priority,))
+
+
+def count_tokens_used(resp: object, model: Optional[str] = None) -> bool:
+    """
+    Token counters from a google-genai response's usage_metadata, if
+    present. True (and a max_tokens error) when the answer was cut off at
+    max_output_tokens.
+    """
+    model = model or current_model()
+    doc_type = current_doc_type()
+    candidates = getattr(resp, "candidates", None) or ()
+    finish = getattr(candidates[0], "finish_reason", None) if candidates else None
+    truncated = getattr(finish, "name", finish) == "MAX_TOKENS"
+    if truncated:
+        errors.inc(("max_tokens", model, doc_type))
+    usage = getattr(resp, "usage_metadata", None)
+    if usage is None:
+        return truncated
+    prompt_tokens = getattr(usage, "prompt_token_count", None)
+    output_tokens = getattr(usage, "candidates_token_count", None)
+    thinking_tokens = getattr(usage, "thoughts_token_count", None)
+    if prompt_tokens:
+        llm_tokens.inc(("in", model, doc_type), prompt_tokens)
+    if output_tokens:
+        llm_tokens.inc(("out", model, doc_type), output_tokens)
+    if thinking_tokens:
+        llm_tokens.inc(("thinking", model, doc_type), thinking_tokens)
+    return truncated
+
+
+class stage_timer:
+    """`with stage_timer("normalize"):` records the block's duration."""
+
+    __slots__ = ("stage", "strategy", "t0")
+
+    def __init__(self, stage: str, strategy: str = ""):
+        self.stage = stage
+        self.strategy = strategy
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.stage, time.perf_counter() - self.t0, self.strategy)
+        return False
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------------------- ASGI middleware -------------------------------------
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no extra task per request, unlike
+    BaseHTTPMiddleware): times each HTTP request until its last body chunk,
+    so streaming responses are measured end to end, and labels it with the
+    matched route template.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        labels: Dict[str, str] = {}
+        token = _request_labels.set(labels)
+        t0 = time.perf_counter()
+        status = ["500"]
+        recorded = [False]
+
+        def record() -> None:
+            if recorded[0]:
+                return
+            recorded[0] = True
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.observe(
+                (endpoint, scope.get("method", ""), status[0], labels.get("model", "none"), labels.get("doc_type", "unknown")),
+                time.perf_counter() - t0,
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+            _request_labels.reset(token)
@@ -0,0 +1,259 @@
+# backend/model_router.py
+"""
+Per-request model selection, per-model concurrency and failover.
+
+Configured from one JSON file (MODEL_ROUTER_CONFIG, default
+backend/models.json, which is not shipped); without it every request goes
+to GENAI_MODEL, as before. models.example.json is a starting point with
+lite / standard / large tiers; copy it to models.json to enable routing.
+
+* models: name -> {max_concurrency, base_url?, thinking_budget?}. base_url
+  points a model at another endpoint (e.g. a fake server in tests).
+  thinking_budget caps the model's thinking tokens per call (default
+  GENAI_THINKING_BUDGET); see thinking_budget().
+* tiers: name -> ordered model list; the first is the primary, the rest
+  are failover candidates.
+* rules: first match wins, else default_tier. A rule can test doc_type,
+  layouts, item size (min_item_chars / max_item_chars, measured on the
+  compact JSON of the outline item or original item) and a hint value
+  (hint + values). Hints come from the client, so a hint rule lets
+  clients choose that tier too.
+* client_tiers: tiers a client may pick itself with hints.modelTier
+  (default none: the hint is ignored and the rules decide, so a client
+  can't put its requests on the large tier by asking).
+* failover: a request moves to the next model in its tier when the
+  primary has no free slot within failover.queue_wait_s, its circuit is
+  open, or it answers 429 / 503 after retries.
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from scheduler import GENAI_MAX_CONCURRENCY
+
+logger = logging.getLogger("paradocs-gen")
+
+MODEL_ROUTER_CONFIG = os.getenv(
+    "MODEL_ROUTER_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "models.json")
+)
+GENAI_MODEL = os.getenv("GENAI_MODEL", "gemini-2.5-flash")
+# a model without max_concurrency may use every model-call slot of the worker
+DEFAULT_MODEL_CONCURRENCY = GENAI_MAX_CONCURRENCY
+# thinking tokens per call for models without thinking_budget: 0 = off, -1 = the model's own (dynamic) default
+GENAI_THINKING_BUDGET = int(os.getenv("GENAI_THINKING_BUDGET", "0"))
+# models that can't turn thinking off, and their smallest budget
+_MIN_THINKING_BUDGET = {"gemini-2.5-pro": 128}
+_THINKING_MODEL_RE = re.compile(r"gemini-(\d+)(?:\.(\d+))?")
+
+# answers that mean "this model is busy", not "this request is bad"
+OVERLOAD_STATUS = {429, 503}
+
+
+class ModelOverloaded(RuntimeError):
+    """No slot for `model` within the failover wait."""
+
+    def __init__(self, model: str, waited_s: float):
+        self.model = model
+        self.waited_s = waited_s
+        super().__init__(f"model {model} busy: no slot within {waited_s:.2f}s")
+
+
+class Route(NamedTuple):
+    tier: str
+    models: Tuple[str, ...]
+
+    @property
+    def primary(self) -> str:
+        return self.models[0]
+
+
+def default_config() -> Dict[str, Any]:
+    return {
+        "models": {GENAI_MODEL: {"max_concurrency": DEFAULT_MODEL_CONCURRENCY}},
+        "tiers": {"default": [GENAI_MODEL]},
+        "default_tier": "default",
+        "rules": [],
+        "client_tiers": [],
+        "failover": {"queue_wait_s": 2.0},
+    }
+
+
+def load_config(path: Optional[str] = MODEL_ROUTER_CONFIG) -> Dict[str, Any]:
+    if not path or not os.path.exists(path):
+        return default_config()
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    tiers = config.get("tiers") or {}
+    if not tiers or config.get("default_tier") not in tiers:
+        raise ValueError(f"{path}: default_tier must name one of tiers {sorted(tiers)}")
+    for tier, models in tiers.items():
+        if not models:
+            raise ValueError(f"{path}: tier {tier!r} has no models")
+    for rule in config.get("rules") or []:
+        if rule.get("tier") not in tiers:
+            raise ValueError(f"{path}: rule {rule} names unknown tier")
+    for tier in config.get("client_tiers") or []:
+        if tier not in tiers:
+            raise ValueError(f"{path}: client_tiers names unknown tier {tier!r}")
+    config.setdefault("models", {})
+    for models in tiers.values():
+        for model in models:
+            config["models"].setdefault(model, {})
+    config.setdefault("rules", [])
+    config.setdefault("client_tiers", [])
+    config.setdefault("failover", {})
+    logger.info("Model router: %d tier(s) from %s", len(tiers), path)
+    return config
+
+
+class _ModelState:
+    __slots__ = ("name", "max_concurrency", "base_url", "thinking_budget", "semaphore", "in_flight", "calls",
+                 "overloaded")
+
+    def __init__(self, name: str, spec: Dict[str, Any]):
+        self.name = name
+        self.max_concurrency = int(spec.get("max_concurrency") or DEFAULT_MODEL_CONCURRENCY)
+        self.base_url = spec.get("base_url")
+        self.thinking_budget = _thinking_budget(name, int(spec.get("thinking_budget", GENAI_THINKING_BUDGET)))
+        # only awaited from the event loop, like llm_semaphore
+        self.semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.calls = 0
+        self.overloaded = 0
+
+
+def _thinking_budget(model: str, budget: int) -> Optional[int]:
+    """
+    The budget to send, or None to send no thinking_config: for a negative
+    budget, and for models older than Gemini 2.5, which don't think and
+    reject the field.
+    """
+    version = _THINKING_MODEL_RE.search(model)
+    if budget < 0 or version is None or (int(version.group(1)), int(version.group(2) or 0)) < (2, 5):
+        return None
+    floor = next((v for prefix, v in _MIN_THINKING_BUDGET.items() if model.startswith(prefix)), 0)
+    return max(budget, floor)
+
+
+class ModelRouter:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.tiers: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in config["tiers"].items()}
+        self.default_tier: str = config["default_tier"]
+        self.rules: List[Dict[str, Any]] = list(config["rules"])
+        self.client_tiers = frozenset(config["client_tiers"])
+        self.failover_wait_s = float(config["failover"].get("queue_wait_s", 2.0))
+        self._models = {name: _ModelState(name, spec or {}) for name, spec in config["models"].items()}
+        self._lock = threading.Lock()
+        self._routed: Dict[str, int] = {}
+        self._failovers: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    def route(self, doc_type: Optional[str] = None, layout: Optional[str] = None,
+              item_chars: int = 0, hints: Optional[Dict[str, Any]] = None) -> Route:
+        hints = hints or {}
+        # a client-supplied tier only counts when the config lets clients pick it
+        tier = hints.get("modelTier")
+        if not isinstance(tier, str) or tier not in self.client_tiers:
+            if tier is not None:
+                logger.debug("model router: ignoring modelTier hint %r (not in client_tiers)", tier)
+            tier = None
+        if tier is None:
+            tier = next((r["tier"] for r in self.rules if self._matches(r, doc_type, layout, item_chars, hints)),
+                        self.default_tier)
+        with self._lock:
+            self._routed[tier] = self._routed.get(tier, 0) + 1
+        return Route(tier, self.tiers[tier])
+
+    def default_route(self) -> Route:
+        return Route(self.default_tier, self.tiers[self.default_tier])
+
+    @staticmethod
+    def _matches(rule: Dict[str, Any], doc_type, layout, item_chars: int, hints: Dict[str, Any]) -> bool:
+        if "doc_type" in rule and (doc_type or "").lower() != rule["doc_type"]:
+            return False
+        if "layouts" in rule and (layout or "").lower() not in rule["layouts"]:
+            return False
+        if "max_item_chars" in rule and item_chars > rule["max_item_chars"]:
+            return False
+        if "min_item_chars" in rule and item_chars < rule["min_item_chars"]:
+            return False
+        if "hint" in rule:
+            # without `values` the hint only has to be present
+            value = hints.get(rule["hint"])
+            if value is None:
+                return False
+            if "values" in rule and str(value).lower() not in {str(v).lower() for v in rule["values"]}:
+                return False
+        return True
+
+    # ------------------------------------------------------------------
+    def base_url(self, model: str) -> Optional[str]:
+        state = self._models.get(model)
+        return state.base_url if state else None
+
+    def thinking_budget(self, model: str) -> Optional[int]:
+        """
+        Thinking tokens `model` may spend per call, None to leave it to the
+        model. Gemini 2.5 counts them against max_output_tokens, so callers
+        add this on top of the answer's budget.
+        """
+        return self._state(model).thinking_budget
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            # a model outside the config (e.g. a caller-supplied name) gets defaults
+            with self._lock:
+                state = self._models.setdefault(model, _ModelState(model, {}))
+        return state
+
+    @asynccontextmanager
+    async def slot(self, model: str, wait_s: Optional[float] = None):
+        """Hold one of the model's concurrency slots; ModelOverloaded if none frees up within wait_s."""
+        state = self._state(model)
+        t0 = time.perf_counter()
+        if wait_s is None:
+            await state.semaphore.acquire()
+        else:
+            try:
+                await asyncio.wait_for(state.semaphore.acquire(), timeout=wait_s)
+            except asyncio.TimeoutError:
+                state.overloaded += 1
+                raise ModelOverloaded(model, time.perf_counter() - t0) from None
+        state.in_flight += 1
+        state.calls += 1
+        try:
+            yield
+        finally:
+            state.in_flight -= 1
+            state.semaphore.release()
+
+    def note_failover(self, from_model: str, to_model: str, reason: str) -> None:
+        key = f"{from_model}->{to_model}"
+        with self._lock:
+            self._failovers[key] = self._failovers.get(key, 0) + 1
+        logger.warning("model router: %s -> %s (%s)", from_model, to_model, reason)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tiers": {k: list(v) for k, v in self.tiers.items()},
+                "routed": dict(self._routed),
+                "failovers": dict(self._failovers),
+                "models": {
+                    m.name: {"max_concurrency": m.max_concurrency, "thinking_budget": m.thinking_budget,
+                             "in_flight": m.in_flight, "calls": m.calls, "overloaded": m.overloaded}
+                    for m in self._models.values()
+                },
+            }
+
+
+# shared instance used by the generation pipeline and main
+model_router = ModelRouter(load_config())
@@ -0,0 +1,658 @@
+# backend/office_export.py
+"""
+Streaming DOCX / PPTX export.
+
+Documents are written as raw OOXML parts straight into a zip whose bytes are
+handed to the client as they are produced. Items are rendered one at a time
+from an iterator, so memory stays flat no matter how long the deck is; only
+small per-item bookkeeping (slide numbers, hyperlink ids) is kept until the
+package manifest is written at the end.
+
+Templates supply every static part (styles, numbering, theme, masters,
+layouts). "paradocs-default" is built in; any other name is looked up as
+<EXPORT_TEMPLATE_DIR>/<name>.docx or .pptx and its parts are reused as-is.
+Templates are read and parsed once and then served from an in-process cache.
+"""
+import base64
+import binascii
+import functools
+import logging
+import os
+import re
+import struct
+import zipfile
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+logger = logging.getLogger("paradocs-gen")
+
+EXPORT_TEMPLATE_DIR = os.getenv("EXPORT_TEMPLATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+EXPORT_CHUNK_BYTES = int(os.getenv("EXPORT_CHUNK_BYTES", str(64 * 1024)))
+EXPORT_LOGO_MAX_BYTES = int(os.getenv("EXPORT_LOGO_MAX_BYTES", str(2 * 1024 * 1024)))
+DEFAULT_TEMPLATE = "paradocs-default"
+
+MEDIA_TYPES = {
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+}
+
+NS_W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+NS_R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS_A = "http://schemas.openxmlformats.org/drawingml/2006/main"
+NS_P = "http://schemas.openxmlformats.org/presentationml/2006/main"
+NS_WP = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+NS_PIC = "http://schemas.openxmlformats.org/drawingml/2006/picture"
+NS_PKG_REL = "http://schemas.openxmlformats.org/package/2006/relationships"
+NS_CT = "http://schemas.openxmlformats.org/package/2006/content-types"
+REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+CT_PML = "application/vnd.openxmlformats-officedocument.presentationml."
+CT_WML = "application/vnd.openxmlformats-officedocument.wordprocessingml."
+
+XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_INVALID_XML_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+_TEMPLATE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def _text(value: Any) -> str:
+    return escape(_INVALID_XML_CHARS.sub("", str(value)))
+
+
+def _attr(value: Any) -> str:
+    return quoteattr(_INVALID_XML_CHARS.sub("", str(value)))
+
+
+def _rel(rid: str, rel_type: str, target: str, external: bool = False) -> str:
+    mode = ' TargetMode="External"' if external else ""
+    return f'<Relationship Id="{rid}" Type="{REL}{rel_type}" Target={_attr(target)}{mode}/>'
+
+
+def _rels_xml(rels: Iterable[str]) -> str:
+    return f'{XML_DECL}<Relationships xmlns="{NS_PKG_REL}">{"".join(rels)}</Relationships>'
+
+
+# ---------------------- zip streaming ---------------------------------------
+class _ChunkSink:
+    """Write-only, non-seekable file object; zipfile falls back to data descriptors."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        out = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return out
+
+
+def _zip_stream(write_parts: Callable[[zipfile.ZipFile], Iterator[None]]) -> Iterator[bytes]:
+    """Run a part writer against a streaming zip, yielding compressed bytes as they pile up."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for _ in write_parts(zf):
+            if sink.size >= EXPORT_CHUNK_BYTES:
+                yield sink.drain()
+    tail = sink.drain()
+    if tail:
+        yield tail
+
+
+# ---------------------- logo handling ----------------------------------------
+class _Logo:
+    """Logo from ProjectMeta.logo_url: data: URLs are embedded, http(s) URLs are linked, never fetched."""
+
+    def __init__(self, target: str, external: bool, data: Optional[bytes] = None, ext: str = "png"):
+        self.target = target
+        self.external = external
+        self.data = data
+        self.ext = ext
+        size = _image_size(data) if data else None
+        # unknown size (linked logo): assume a square mark
+        self.aspect = (size[0] / size[1]) if size and size[1] else 1.0
+
+    def extent(self, height_emu: int, max_width_emu: int) -> Tuple[int, int]:
+        width = int(height_emu * self.aspect)
+        if width > max_width_emu:
+            return max_width_emu, int(max_width_emu / self.aspect)
+        return width, height_emu
+
+
+def _parse_logo(logo_url: Optional[str]) -> Optional[_Logo]:
+    if not logo_url:
+        return None
+    url = logo_url.strip()
+    if url.startswith(("http://", "https://")):
+        return _Logo(url, external=True)
+    m = re.match(r"^data:image/(png|jpe?g|gif);base64,(.*)$", url, re.S)
+    if not m:
+        logger.warning("export: unsupported logo_url ignored (%s)", url[:40])
+        return None
+    try:
+        data = base64.b64decode(m.group(2), validate=False)
+    except (binascii.Error, ValueError):
+        logger.warning("export: logo_url is not valid base64, ignored")
+        return None
+    if len(data) > EXPORT_LOGO_MAX_BYTES:
+        logger.warning("export: logo of %d bytes exceeds EXPORT_LOGO_MAX_BYTES, ignored", len(data))
+        return None
+    ext = {"jpg": "jpeg"}.get(m.group(1), m.group(1))
+    return _Logo(f"paradocs_logo.{ext}", external=False, data=data, ext=ext)
+
+
+def _image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from a PNG/GIF/JPEG header, or None."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF):
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return w, h
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def _with_default_types(content_types: str, exts: Iterable[str]) -> str:
+    for ext in exts:
+        if f'Extension="{ext}"' not in content_types:
+            content_types = content_types.replace(
+                "</Types>", f'<Default Extension="{ext}" ContentType="image/{ext}"/></Types>'
+            )
+    return content_types
+
+
+# ---------------------- templates -------------------------------------------
+class OfficeTemplate:
+    """
+    Static parts of a template package plus what the writers need to splice
+    generated parts in: the content-type manifest and the main part's
+    relationships without any generated entries, and the next free rId.
+    """
+
+    def __init__(self, kind: str, name: str, parts: Dict[str, bytes]):
+        self.kind = kind
+        self.name = name
+        self.content_types = parts.pop("[Content_Types].xml").decode("utf-8")
+        main_rels = "word/_rels/document.xml.rels" if kind == "docx" else "ppt/_rels/presentation.xml.rels"
+        rels_xml = parts.pop(main_rels).decode("utf-8")
+        self.rels: List[str] = re.findall(r"<Relationship\b[^>]*/>", rels_xml)
+
+        if kind == "docx":
+            parts.pop("word/document.xml", None)
+        else:
+            self._load_pptx(parts)
+
+        ids = [int(n) for n in re.findall(r'Id="rId(\d+)"', "".join(self.rels))]
+        self.next_rid = max(ids, default=0) + 1
+        self.parts = parts
+
+    def _load_pptx(self, parts: Dict[str, bytes]) -> None:
+        # generated slides replace whatever the template shipped with
+        slide_parts = [n for n in parts if n.startswith(("ppt/slides/", "ppt/notesSlides/"))]
+        for n in slide_parts:
+            del parts[n]
+        self.rels = [r for r in self.rels if f'{REL}slide"' not in r]
+        self.content_types = re.sub(
+            r'<Override PartName="/ppt/(slides|notesSlides)/[^"]+"[^>]*/>', "", self.content_types
+        )
+
+        presentation = parts.pop("ppt/presentation.xml").decode("utf-8")
+        presentation = re.sub(r"<p:sldIdLst>.*?</p:sldIdLst>|<p:sldIdLst/>", "", presentation, flags=re.S)
+        if "<p:sldSz" not in presentation:
+            raise ValueError("presentation.xml has no <p:sldSz>")
+        self.presentation = presentation
+
+        # notes slides are only written when the template has a notes master
+        notes_master = [r for r in self.rels if f'{REL}notesMaster"' in r]
+        self.notes_master_target: Optional[str] = None
+        if notes_master:
+            target = re.search(r'Target="([^"]+)"', notes_master[0]).group(1)
+            self.notes_master_target = target if target.startswith("/") else "../" + target
+
+        # slides use the "Title and Content" style layout: type="obj" if present
+        layouts = sorted(
+            (n for n in parts if re.match(r"^ppt/slideLayouts/slideLayout\d+\.xml$", n)),
+            key=lambda n: int(re.search(r"(\d+)\.xml$", n).group(1)),
+        )
+        if not layouts:
+            raise ValueError("template has no slide layouts")
+        chosen = next((n for n in layouts if b'type="obj"' in parts[n][:2000]), layouts[0])
+        self.layout_target = "../slideLayouts/" + chosen.rsplit("/", 1)[1]
+
+
+@functools.lru_cache(maxsize=16)
+def _load_template(kind: str, name: str, path: Optional[str], mtime: float) -> OfficeTemplate:
+    # mtime is part of the cache key so an edited template file is picked up
+    if path is None:
+        parts = _builtin_docx_parts() if kind == "docx" else _builtin_pptx_parts()
+    else:
+        with zipfile.ZipFile(path) as zf:
+            parts = {n: zf.read(n) for n in zf.namelist() if not n.endswith("/")}
+    logger.info("export: loaded %s template %s (%d parts)", kind, name, len(parts))
+    return OfficeTemplate(kind, name, parts)
+
+
+def get_template(kind: str, name: Optional[str]) -> OfficeTemplate:
+    """Resolve a template by name; unknown or broken templates fall back to the built-in one."""
+    name = name or DEFAULT_TEMPLATE
+    if name != DEFAULT_TEMPLATE and _TEMPLATE_NAME.match(name):
+        path = os.path.join(EXPORT_TEMPLATE_DIR, f"{name}.{kind}")
+        if os.path.isfile(path):
+            try:
+                return _load_template(kind, name, path, os.path.getmtime(path))
+            except (zipfile.BadZipFile, KeyError, ValueError) as e:
+                logger.warning("export: template %s is not a usable .%s (%s); using %s", path, kind, e, DEFAULT_TEMPLATE)
+        else:
+            logger.warning("export: template %r not found for %s; using %s", name, kind, DEFAULT_TEMPLATE)
+    return _load_template(kind, DEFAULT_TEMPLATE, None, 0.0)
+
+
+# ---------------------- DOCX -------------------------------------------------
+def _docx_paragraph(text: str, style: Optional[str] = None, run_props: str = "") -> str:
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    rpr = f"<w:rPr>{run_props}</w:rPr>" if run_props else ""
+    return f'<w:p>{ppr}<w:r>{rpr}<w:t xml:space="preserve">{_text(text)}</w:t></w:r></w:p>'
+
+
+def _docx_item(item: Dict[str, Any], link_rid: Callable[[str], str]) -> str:
+    out = [_docx_paragraph(item.get("title") or "", "Heading1")]
+    for bullet in item.get("bullets") or []:
+        out.append(_docx_paragraph(bullet, "ListBullet"))
+    for note in item.get("notes") or []:
+        out.append(_docx_paragraph(note, None, '<w:i/><w:color w:val="6B7280"/>'))
+    for url in item.get("images") or []:
+        out.append(
+            f'<w:p><w:hyperlink r:id="{link_rid(url)}"><w:r><w:rPr><w:rStyle w:val="Hyperlink"/></w:rPr>'
+            f'<w:t xml:space="preserve">{_text(url)}</w:t></w:r></w:hyperlink></w:p>'
+        )
+    return "".join(out)
+
+
+def _docx_logo_header(logo: _Logo) -> str:
+    cx, cy = logo.extent(457200, 2743200)
+    blip = 'r:link="rId1"' if logo.external else 'r:embed="rId1"'
+    return (
+        f'{XML_DECL}<w:hdr xmlns:w="{NS_W}" xmlns:r="{NS_R}" xmlns:wp="{NS_WP}" xmlns:a="{NS_A}" xmlns:pic="{NS_PIC}">'
+        '<w:p><w:pPr><w:jc w:val="right"/></w:pPr><w:r><w:drawing>'
+        f'<wp:inline distT="0" distB="0" distL="0" distR="0"><wp:extent cx="{cx}" cy="{cy}"/>'
+        '<wp:docPr id="1" name="Logo"/><wp:cNvGraphicFramePr><a:graphicFrameLocks noChangeAspect="1"/></wp:cNvGraphicFramePr>'
+        f'<a:graphic><a:graphicData uri="{NS_PIC}"><pic:pic><pic:nvPicPr><pic:cNvPr id="0" name="logo"/><pic:cNvPicPr/></pic:nvPicPr>'
+        f'<pic:blipFill><a:blip {blip}/><a:stretch><a:fillRect/></a:stretch></pic:blipFill>'
+        f'<pic:spPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm><a:prstGeom prst="rect"><a:avLst/></a:prstGeom></pic:spPr>'
+        '</pic:pic></a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p></w:hdr>'
+    )
+
+
+def render_docx(items: Iterable[Dict[str, Any]], title: str = "", template: Optional[str] = None,
+                logo_url: Optional[str] = None) -> Iterator[bytes]:
+    """Stream a .docx: optional title, then per item a heading, bullets, notes and image links."""
+    tpl = get_template("docx", template)
+    logo = _parse_logo(logo_url)
+
+    def write_parts(zf: zipfile.ZipFile) -> Iterator[None]:
+        for name, data in tpl.parts.items():
+            zf.writestr(name, data)
+            yield
+
+        next_rid = [tpl.next_rid]
+        links: Dict[str, str] = {}
+
+        def new_rid() -> str:
+            rid = f"rId{next_rid[0]}"
+            next_rid[0] += 1
+            return rid
+
+        def link_rid(url: str) -> str:
+            if url not in links:
+                links[url] = new_rid()
+            return links[url]
+
+        header_ref = ""
+        extra_rels: List[str] = []
+        content_types = tpl.content_types
+        if logo:
+            rid = new_rid()
+            extra_rels.append(_rel(rid, "header", "paradocs_header.xml"))
+            header_ref = f'<w:headerReference w:type="default" r:id="{rid}"/>'
+            content_types = content_types.replace(
+                "</Types>", f'<Override PartName="/word/paradocs_header.xml" ContentType="{CT_WML}header+xml"/></Types>'
+            )
+            zf.writestr("word/paradocs_header.xml", _docx_logo_header(logo))
+            if logo.external:
+                zf.writestr("word/_rels/paradocs_header.xml.rels", _rels_xml([_rel("rId1", "image", logo.target, True)]))
+            else:
+                zf.writestr("word/media/" + logo.target, logo.data)
+                zf.writestr("word/_rels/paradocs_header.xml.rels", _rels_xml([_rel("rId1", "image", "media/" + logo.target)]))
+                content_types = _with_default_types(content_types, [logo.ext])
+
+        count = 0
+        with zf.open("word/document.xml", "w") as doc:
+            doc.write(f'{XML_DECL}<w:document xmlns:w="{NS_W}" xmlns:r="{NS_R}"><w:body>'.encode("utf-8"))
+            if title:
+                doc.write(_docx_paragraph(title, "Title").encode("utf-8"))
+            for item in items:
+                doc.write(_docx_item(item, link_rid).encode("utf-8"))
+                count += 1
+                yield
+            doc.write((
+                f'<w:sectPr>{header_ref}<w:pgSz w:w="12240" w:h="15840"/>'
+                '<w:pgMar w:top="1440" w:right="1440" w:bottom="1440" w:left="1440" w:header="720" w:footer="720" w:gutter="0"/>'
+                "</w:sectPr></w:body></w:document>"
+            ).encode("utf-8"))
+
+        extra_rels.extend(_rel(rid, "hyperlink", url, True) for url, rid in links.items())
+        zf.writestr("word/_rels/document.xml.rels", _rels_xml(tpl.rels + extra_rels))
+        zf.writestr("[Content_Types].xml", content_types)
+        logger.info("export: docx with %d items (template=%s)", count, tpl.name)
+        yield
+
+    return _zip_stream(write_parts)
+
+
+# ---------------------- PPTX -------------------------------------------------
+SLIDE_CX = 12192000
+SLIDE_CY = 6858000
+
+_GRP_SP = (
+    '<p:nvGrpSpPr><p:cNvPr id="1" name=""/><p:cNvGrpSpPr/><p:nvPr/></p:nvGrpSpPr>'
+    '<p:grpSpPr><a:xfrm><a:off x="0" y="0"/><a:ext cx="0" cy="0"/><a:chOff x="0" y="0"/><a:chExt cx="0" cy="0"/></a:xfrm></p:grpSpPr>'
+)
+_PML_NS = f'xmlns:a="{NS_A}" xmlns:r="{NS_R}" xmlns:p="{NS_P}"'
+
+
+def _pptx_paragraphs(lines: List[str]) -> str:
+    if not lines:
+        return '<a:p><a:endParaRPr lang="en-US"/></a:p>'
+    return "".join(f'<a:p><a:r><a:rPr lang="en-US" dirty="0"/><a:t>{_text(line)}</a:t></a:r></a:p>' for line in lines)
+
+
+def _pptx_placeholder(shape_id: int, name: str, ph: str, lines: List[str]) -> str:
+    return (
+        f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/><p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr>'
+        f'<p:nvPr>{ph}</p:nvPr></p:nvSpPr><p:spPr/>'
+        f'<p:txBody><a:bodyPr/><a:lstStyle/>{_pptx_paragraphs(lines)}</p:txBody></p:sp>'
+    )
+
+
+def _pptx_slide(item: Dict[str, Any], logo: Optional[_Logo]) -> str:
+    shapes = [
+        _pptx_placeholder(2, "Title 1", '<p:ph type="title"/>', [item.get("title") or ""]),
+        _pptx_placeholder(3, "Content 2", '<p:ph idx="1"/>', list(item.get("bullets") or [])),
+    ]
+    if logo:
+        cx, cy = logo.extent(548640, 2743200)
+        blip = 'r:link="rId3"' if logo.external else 'r:embed="rId3"'
+        shapes.append(
+            '<p:pic><p:nvPicPr><p:cNvPr id="4" name="Logo"/><p:cNvPicPr><a:picLocks noChangeAspect="1"/></p:cNvPicPr><p:nvPr/></p:nvPicPr>'
+            f'<p:blipFill><a:blip {blip}/><a:stretch><a:fillRect/></a:stretch></p:blipFill>'
+            f'<p:spPr><a:xfrm><a:off x="{SLIDE_CX - cx - 182880}" y="182880"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm>'
+            '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr></p:pic>'
+        )
+    return (
+        f'{XML_DECL}<p:sld {_PML_NS}><p:cSld><p:spTree>{_GRP_SP}{"".join(shapes)}</p:spTree></p:cSld>'
+        '<p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sld>'
+    )
+
+
+def _pptx_notes(lines: List[str]) -> str:
+    return (
+        f'{XML_DECL}<p:notes {_PML_NS}><p:cSld><p:spTree>{_GRP_SP}'
+        '<p:sp><p:nvSpPr><p:cNvPr id="2" name="Slide Image Placeholder 1"/><p:cNvSpPr><a:spLocks noGrp="1" noRot="1" noChangeAspect="1"/></p:cNvSpPr>'
+        '<p:nvPr><p:ph type="sldImg"/></p:nvPr></p:nvSpPr><p:spPr/></p:sp>'
+        + _pptx_placeholder(3, "Notes Placeholder 2", '<p:ph type="body" idx="1"/>', lines)
+        +         '</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:notes>'
+    )
+
+
+def render_pptx(items: Iterable[Dict[str, Any]], title: str = "", template: Optional[str] = None,
+                logo_url: Optional[str] = None) -> Iterator[bytes]:
+    """
+    Stream a .pptx with one slide per item: title and bullets go into the
+    layout placeholders, notes (plus any image URLs) become speaker notes.
+    """
+    tpl = get_template("pptx", template)
+    logo = _parse_logo(logo_url)
+
+    def write_parts(zf: zipfile.ZipFile) -> Iterator[None]:
+        for name, data in tpl.parts.items():
+            zf.writestr(name, data)
+            yield
+        if logo and not logo.external:
+            zf.writestr("ppt/media/" + logo.target, logo.data)
+
+        count = 0
+        notes_slides: List[int] = []
+        for item in items:
+            count += 1
+            n = count
+            rels = [_rel("rId1", "slideLayout", tpl.layout_target)]
+            notes = list(item.get("notes") or []) + [f"Image: {url}" for url in item.get("images") or []]
+            if notes and tpl.notes_master_target:
+                rels.append(_rel("rId2", "notesSlide", f"../notesSlides/notesSlide{n}.xml"))
+                zf.writestr(f"ppt/notesSlides/notesSlide{n}.xml", _pptx_notes(notes))
+                zf.writestr(f"ppt/notesSlides/_rels/notesSlide{n}.xml.rels", _rels_xml([
+                    _rel("rId1", "notesMaster", tpl.notes_master_target),
+                    _rel("rId2", "slide", f"../slides/slide{n}.xml"),
+                ]))
+                notes_slides.append(n)
+            if logo:
+                target = logo.target if logo.external else "../media/" + logo.target
+                rels.append(_rel("rId3", "image", target, logo.external))
+            zf.writestr(f"ppt/slides/slide{n}.xml", _pptx_slide(item, logo))
+            zf.writestr(f"ppt/slides/_rels/slide{n}.xml.rels", _rels_xml(rels))
+            yield
+
+        first_rid = tpl.next_rid
+        slide_rels = [_rel(f"rId{first_rid + i}", "slide", f"slides/slide{i + 1}.xml") for i in range(count)]
+        sld_ids = "".join(f'<p:sldId id="{256 + i}" r:id="rId{first_rid + i}"/>' for i in range(count))
+        presentation = tpl.presentation
+        if sld_ids:
+            presentation = presentation.replace("<p:sldSz", f"<p:sldIdLst>{sld_ids}</p:sldIdLst><p:sldSz", 1)
+        zf.writestr("ppt/presentation.xml", presentation)
+        zf.writestr("ppt/_rels/presentation.xml.rels", _rels_xml(tpl.rels + slide_rels))
+
+        overrides = "".join(
+            f'<Override PartName="/ppt/slides/slide{i + 1}.xml" ContentType="{CT_PML}slide+xml"/>' for i in range(count)
+        ) + "".join(
+            f'<Override PartName="/ppt/notesSlides/notesSlide{n}.xml" ContentType="{CT_PML}notesSlide+xml"/>'
+            for n in notes_slides
+        )
+        content_types = tpl.content_types.replace("</Types>", overrides + "</Types>")
+        if logo and not logo.external:
+            content_types = _with_default_types(content_types, [logo.ext])
+        zf.writestr("[Content_Types].xml", content_types)
+        logger.info("export: pptx with %d slides (template=%s)", count, tpl.name)
+        yield
+
+    return _zip_stream(write_parts)
+
+
+RENDERERS = {"docx": render_docx, "pptx": render_pptx}
+
+
+# ---------------------- built-in template ------------------------------------
+def _content_types(defaults: Dict[str, str], overrides: Dict[str, str]) -> str:
+    return (
+        f'{XML_DECL}<Types xmlns="{NS_CT}">'
+        + "".join(f'<Default Extension="{e}" ContentType="{t}"/>' for e, t in defaults.items())
+        + "".join(f'<Override PartName="{p}" ContentType="{t}"/>' for p, t in overrides.items())
+        + "</Types>"
+    )
+
+
+_PKG_DEFAULTS = {"rels": "application/vnd.openxmlformats-package.relationships+xml", "xml": "application/xml"}
+
+
+def _builtin_docx_parts() -> Dict[str, bytes]:
+    styles = (
+        f'{XML_DECL}<w:styles xmlns:w="{NS_W}">'
+        '<w:docDefaults><w:rPrDefault><w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri" w:cs="Calibri"/>'
+        '<w:sz w:val="22"/><w:szCs w:val="22"/><w:lang w:val="en-US"/></w:rPr></w:rPrDefault>'
+        '<w:pPrDefault><w:pPr><w:spacing w:after="160" w:line="259" w:lineRule="auto"/></w:pPr></w:pPrDefault></w:docDefaults>'
+        '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/><w:qFormat/></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:qFormat/>'
+        '<w:pPr><w:spacing w:after="240"/></w:pPr><w:rPr><w:b/><w:color w:val="1F2937"/><w:sz w:val="52"/><w:szCs w:val="52"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/><w:basedOn w:val="Normal"/><w:next w:val="Normal"/><w:qFormat/>'
+        '<w:pPr><w:keepNext/><w:spacing w:before="360" w:after="120"/><w:outlineLvl w:val="0"/></w:pPr>'
+        '<w:rPr><w:b/><w:color w:val="4F46E5"/><w:sz w:val="32"/><w:szCs w:val="32"/></w:rPr></w:style>'
+        '<w:style w:type="paragraph" w:styleId="ListBullet"><w:name w:val="List Bullet"/><w:basedOn w:val="Normal"/>'
+        '<w:pPr><w:numPr><w:numId w:val="1"/></w:numPr><w:spacing w:after="60"/><w:ind w:left="360" w:hanging="360"/></w:pPr></w:style>'
+        '<w:style w:type="character" w:styleId="Hyperlink"><w:name w:val="Hyperlink"/><w:rPr><w:color w:val="4F46E5"/><w:u w:val="single"/></w:rPr></w:style>'
+        "</w:styles>"
+    )
+    numbering = (
+        f'{XML_DECL}<w:numbering xmlns:w="{NS_W}">'
+        '<w:abstractNum w:abstractNumId="0"><w:multiLevelType w:val="singleLevel"/>'
+        '<w:lvl w:ilvl="0"><w:start w:val="1"/><w:numFmt w:val="bullet"/><w:lvlText w:val="•"/><w:lvlJc w:val="left"/>'
+        '<w:pPr><w:ind w:left="360" w:hanging="360"/></w:pPr></w:lvl></w:abstractNum>'
+        '<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num></w:numbering>'
+    )
+    return {
+        "[Content_Types].xml": _content_types(_PKG_DEFAULTS, {
+            "/word/document.xml": CT_WML + "document.main+xml",
+            "/word/styles.xml": CT_WML + "styles+xml",
+            "/word/numbering.xml": CT_WML + "numbering+xml",
+        }).encode("utf-8"),
+        "_rels/.rels": _rels_xml([_rel("rId1", "officeDocument", "word/document.xml")]).encode("utf-8"),
+        "word/_rels/document.xml.rels": _rels_xml([
+            _rel("rId1", "styles", "styles.xml"),
+            _rel("rId2", "numbering", "numbering.xml"),
+        ]).encode("utf-8"),
+        "word/styles.xml": styles.encode("utf-8"),
+        "word/numbering.xml": numbering.encode("utf-8"),
+    }
+
+
+def _builtin_theme(name: str) -> str:
+    accents = ["4F46E5", "0EA5E9", "10B981", "F59E0B", "EF4444", "8B5CF6"]
+    fill = '<a:solidFill><a:schemeClr val="phClr"/></a:solidFill>'
+    return (
+        f'{XML_DECL}<a:theme xmlns:a="{NS_A}" name="{name}"><a:themeElements>'
+        f'<a:clrScheme name="{name}">'
+        '<a:dk1><a:sysClr val="windowText" lastClr="000000"/></a:dk1><a:lt1><a:sysClr val="window" lastClr="FFFFFF"/></a:lt1>'
+        '<a:dk2><a:srgbClr val="1F2937"/></a:dk2><a:lt2><a:srgbClr val="F3F4F6"/></a:lt2>'
+        + "".join(f'<a:accent{i + 1}><a:srgbClr val="{c}"/></a:accent{i + 1}>' for i, c in enumerate(accents))
+        + '<a:hlink><a:srgbClr val="4F46E5"/></a:hlink><a:folHlink><a:srgbClr val="7C3AED"/></a:folHlink></a:clrScheme>'
+        f'<a:fontScheme name="{name}">'
+        '<a:majorFont><a:latin typeface="Calibri Light"/><a:ea typeface=""/><a:cs typeface=""/></a:majorFont>'
+        '<a:minorFont><a:latin typeface="Calibri"/><a:ea typeface=""/><a:cs typeface=""/></a:minorFont></a:fontScheme>'
+        f'<a:fmtScheme name="{name}"><a:fillStyleLst>{fill * 3}</a:fillStyleLst><a:lnStyleLst>'
+        + "".join(f'<a:ln w="{w}">{fill}</a:ln>' for w in (6350, 12700, 19050))
+        + "</a:lnStyleLst><a:effectStyleLst>" + "<a:effectStyle><a:effectLst/></a:effectStyle>" * 3
+        + f"</a:effectStyleLst><a:bgFillStyleLst>{fill * 3}</a:bgFillStyleLst></a:fmtScheme>"
+        "</a:themeElements><a:objectDefaults/><a:extraClrSchemeLst/></a:theme>"
+    )
+
+
+def _builtin_pptx_parts() -> Dict[str, bytes]:
+    clr_map = (
+        '<p:clrMap bg1="lt1" tx1="dk1" bg2="lt2" tx2="dk2" accent1="accent1" accent2="accent2" accent3="accent3" '
+        'accent4="accent4" accent5="accent5" accent6="accent6" hlink="hlink" folHlink="folHlink"/>'
+    )
+    bg = '<p:bg><p:bgRef idx="1001"><a:schemeClr val="bg1"/></p:bgRef></p:bg>'
+
+    def placed(shape_id: int, name: str, ph: str, x: int, y: int, cx: int, cy: int, text: str, body_pr: str = "<a:bodyPr/>") -> str:
+        return (
+            f'<p:sp><p:nvSpPr><p:cNvPr id="{shape_id}" name="{name}"/><p:cNvSpPr><a:spLocks noGrp="1"/></p:cNvSpPr>'
+            f'<p:nvPr>{ph}</p:nvPr></p:nvSpPr>'
+            f'<p:spPr><a:xfrm><a:off x="{x}" y="{y}"/><a:ext cx="{cx}" cy="{cy}"/></a:xfrm><a:prstGeom prst="rect"><a:avLst/></a:prstGeom></p:spPr>'
+            f'<p:txBody>{body_pr}<a:lstStyle/>{_pptx_paragraphs([text] if text else [])}</p:txBody></p:sp>'
+        )
+
+    master = (
+        f'{XML_DECL}<p:sldMaster {_PML_NS}><p:cSld>{bg}<p:spTree>{_GRP_SP}'
+        + placed(2, "Title Placeholder 1", '<p:ph type="title"/>', 838200, 365125, 10515600, 1325563,
+                 "Click to edit Master title style", '<a:bodyPr anchor="ctr"/>')
+        + placed(3, "Text Placeholder 2", '<p:ph type="body" idx="1"/>', 838200, 1825625, 10515600, 4351338,
+                 "Click to edit Master text styles")
+        + f"</p:spTree></p:cSld>{clr_map}"
+        '<p:sldLayoutIdLst><p:sldLayoutId id="2147483649" r:id="rId1"/></p:sldLayoutIdLst><p:txStyles>'
+        '<p:titleStyle><a:lvl1pPr algn="l"><a:defRPr sz="4000" b="1"><a:solidFill><a:schemeClr val="tx2"/></a:solidFill>'
+        '<a:latin typeface="+mj-lt"/></a:defRPr></a:lvl1pPr></p:titleStyle>'
+        '<p:bodyStyle><a:lvl1pPr marL="342900" indent="-342900"><a:spcBef><a:spcPts val="1000"/></a:spcBef>'
+        '<a:buFont typeface="Arial"/><a:buChar char="•"/><a:defRPr sz="2400"><a:solidFill><a:schemeClr val="tx1"/></a:solidFill>'
+        '<a:latin typeface="+mn-lt"/></a:defRPr></a:lvl1pPr></p:bodyStyle>'
+        '<p:otherStyle><a:lvl1pPr><a:defRPr sz="1800"><a:solidFill><a:schemeClr val="tx1"/></a:solidFill></a:defRPr></a:lvl1pPr></p:otherStyle>'
+        "</p:txStyles></p:sldMaster>"
+    )
+    layout = (
+        f'{XML_DECL}<p:sldLayout {_PML_NS} type="obj" preserve="1"><p:cSld name="Title and Content"><p:spTree>{_GRP_SP}'
+        + _pptx_placeholder(2, "Title 1", '<p:ph type="title"/>', [])
+        + _pptx_placeholder(3, "Content Placeholder 2", '<p:ph idx="1"/>', [])
+        + "</p:spTree></p:cSld><p:clrMapOvr><a:masterClrMapping/></p:clrMapOvr></p:sldLayout>"
+    )
+    notes_master = (
+        f'{XML_DECL}<p:notesMaster {_PML_NS}><p:cSld>{bg}<p:spTree>{_GRP_SP}'
+        '<p:sp><p:nvSpPr><p:cNvPr id="2" name="Slide Image Placeholder 1"/><p:cNvSpPr><a:spLocks noGrp="1" noRot="1" noChangeAspect="1"/></p:cNvSpPr>'
+        '<p:nvPr><p:ph type="sldImg" idx="2"/></p:nvPr></p:nvSpPr><p:spPr><a:xfrm><a:off x="685800" y="1143000"/><a:ext cx="5486400" cy="3086100"/></a:xfrm>'
+        '<a:prstGeom prst="rect"><a:avLst/></a:prstGeom><a:noFill/><a:ln w="12700"><a:solidFill><a:prstClr val="black"/></a:solidFill></a:ln></p:spPr></p:sp>'
+        + placed(3, "Notes Placeholder 2", '<p:ph type="body" idx="1"/>', 685800, 4400550, 5486400, 3600450, "")
+        + f"</p:spTree></p:cSld>{clr_map}"
+        '<p:notesStyle><a:lvl1pPr marL="0"><a:defRPr sz="1200"><a:solidFill><a:schemeClr val="tx1"/></a:solidFill>'
+        '<a:latin typeface="+mn-lt"/></a:defRPr></a:lvl1pPr></p:notesStyle></p:notesMaster>'
+    )
+    presentation = (
+        f'{XML_DECL}<p:presentation {_PML_NS} saveSubsetFonts="1">'
+        '<p:sldMasterIdLst><p:sldMasterId id="2147483648" r:id="rId1"/></p:sldMasterIdLst>'
+        '<p:notesMasterIdLst><p:notesMasterId r:id="rId3"/></p:notesMasterIdLst>'
+        f'<p:sldSz cx="{SLIDE_CX}" cy="{SLIDE_CY}"/><p:notesSz cx="6858000" cy="9144000"/></p:presentation>'
+    )
+    return {
+        "[Content_Types].xml": _content_types(_PKG_DEFAULTS, {
+            "/ppt/presentation.xml": CT_PML + "presentation.main+xml",
+            "/ppt/slideMasters/slideMaster1.xml": CT_PML + "slideMaster+xml",
+            "/ppt/slideLayouts/slideLayout1.xml": CT_PML + "slideLayout+xml",
+            "/ppt/notesMasters/notesMaster1.xml": CT_PML + "notesMaster+xml",
+            "/ppt/theme/theme1.xml": "application/vnd.openxmlformats-officedocument.theme+xml",
+            "/ppt/theme/theme2.xml": "application/vnd.openxmlformats-officedocument.theme+xml",
+            "/ppt/presProps.xml": CT_PML + "presProps+xml",
+            "/ppt/viewProps.xml": CT_PML + "viewProps+xml",
+            "/ppt/tableStyles.xml": CT_PML + "tableStyles+xml",
+        }).encode("utf-8"),
+        "_rels/.rels": _rels_xml([_rel("rId1", "officeDocument", "ppt/presentation.xml")]).encode("utf-8"),
+        "ppt/presentation.xml": presentation.encode("utf-8"),
+        "ppt/_rels/presentation.xml.rels": _rels_xml([
+            _rel("rId1", "slideMaster", "slideMasters/slideMaster1.xml"),
+            _rel("rId2", "theme", "theme/theme1.xml"),
+            _rel("rId3", "notesMaster", "notesMasters/notesMaster1.xml"),
+            _rel("rId4", "presProps", "presProps.xml"),
+            _rel("rId5", "viewProps", "viewProps.xml"),
+            _rel("rId6", "tableStyles", "tableStyles.xml"),
+        ]).encode("utf-8"),
+        "ppt/slideMasters/slideMaster1.xml": master.encode("utf-8"),
+        "ppt/slideMasters/_rels/slideMaster1.xml.rels": _rels_xml([
+            _rel("rId1", "slideLayout", "../slideLayouts/slideLayout1.xml"),
+            _rel("rId2", "theme", "../theme/theme1.xml"),
+        ]).encode("utf-8"),
+        "ppt/slideLayouts/slideLayout1.xml": layout.encode("utf-8"),
+        "ppt/slideLayouts/_rels/slideLayout1.xml.rels": _rels_xml([
+            _rel("rId1", "slideMaster", "../slideMasters/slideMaster1.xml"),
+        ]).encode("utf-8"),
+        "ppt/notesMasters/notesMaster1.xml": notes_master.encode("utf-8"),
+        "ppt/notesMasters/_rels/notesMaster1.xml.rels": _rels_xml([
+            _rel("rId1", "theme", "../theme/theme2.xml"),
+        ]).encode("utf-8"),
+        "ppt/theme/theme1.xml": _builtin_theme("Paradocs").encode("utf-8"),
+        "ppt/theme/theme2.xml": _builtin_theme("Paradocs Notes").encode("utf-8"),
+        "ppt/presProps.xml": f'{XML_DECL}<p:presentationPr {_PML_NS}/>'.encode("utf-8"),
+        "ppt/viewProps.xml": f'{XML_DECL}<p:viewPr {_PML_NS}/>'.encode("utf-8"),
+        "ppt/tableStyles.xml": (
+            f'{XML_DECL}<a:tblStyleLst xmlns:a="{NS_A}" def="{{5C22544A-7EE6-4342-B048-85BDC9FD1C3A}}"/>'
+        ).encode("utf-8"),
+    }
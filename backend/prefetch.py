@@ -0,0 +1,263 @@
+# backend/prefetch.py
+"""
+Speculative generation of a saved outline (opt-in).
+
+Once a user saves the outline, every item in it is going to be generated;
+prefetch starts on that work in the background, so the later /generate
+clicks are response-cache hits.
+
+* trigger: PUT /projects/{id} with "prefetch": true (PREFETCH_MODE=opt_in,
+  the default), or every save (PREFETCH_MODE=always); PREFETCH_MODE=off
+  disables it. Entries that already have content.generated, or whose answer
+  is already cached, are skipped.
+* priority: items run as the `prefetch` scheduler class (see scheduler.py),
+  behind interactive and bulk work, and at most PREFETCH_CONCURRENCY at a
+  time per worker. Results go to the response cache under the key /generate
+  will look up, so a click on an item still in flight joins its call, and
+  promotes it to the click's priority (scheduler.FairScheduler.promote).
+* cancel-on-edit: every item is tracked by its outline key and the cache key
+  of its prompt. The next save of the project cancels items that were
+  removed, edited (a different prompt) or generated in the meantime, keeps
+  the unchanged ones and queues the new ones; a save without the prefetch
+  flag only cancels. DELETE /projects/{id} cancels everything. Each save
+  bumps the project's prefetch version in shared_state and a queued item
+  re-checks it before its model call, so a save handled by another worker
+  supersedes this worker's queue.
+* budget: at most PREFETCH_MAX_ITEMS items per save, and each model call
+  is charged to a per-user (PREFETCH_USER_ITEMS_PER_HOUR) and a global
+  (PREFETCH_ITEMS_PER_HOUR) bucket in shared_state. An item that doesn't
+  fit is skipped, never delayed: speculative work doesn't wait for budget.
+
+A prefetched answer only helps when the later /generate builds the same
+prompt: the same outline item, hints and temperature. Prefetch uses the
+hints and temperature sent with the save (the frontend's /generate sends
+no hints and 0.2, which are the defaults).
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from response_cache import response_cache
+from scheduler import PREFETCH, set_flow
+from shared_state import shared_state
+
+logger = logging.getLogger("paradocs-gen")
+
+# off | opt_in | always
+PREFETCH_MODE = os.getenv("PREFETCH_MODE", "opt_in").lower()
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "2"))
+PREFETCH_MAX_ITEMS = int(os.getenv("PREFETCH_MAX_ITEMS", "50"))
+# 0 disables the corresponding budget
+PREFETCH_USER_ITEMS_PER_HOUR = float(os.getenv("PREFETCH_USER_ITEMS_PER_HOUR", "200"))
+PREFETCH_ITEMS_PER_HOUR = float(os.getenv("PREFETCH_ITEMS_PER_HOUR", "2000"))
+# finished projects whose last counts /projects/{id}/prefetch still reports
+PREFETCH_MAX_PROJECTS = int(os.getenv("PREFETCH_MAX_PROJECTS", "256"))
+
+QUEUED = "queued"
+RUNNING = "running"
+
+
+class PrefetchItem(NamedTuple):
+    key: str          # outline key (item id, or "#<position>")
+    cache_key: str    # response cache key /generate will use for it
+    scaffold: Any
+
+
+# (context, scaffold) -> generates the item into the response cache
+Runner = Callable[[Dict[str, Any], Any], Awaitable[Any]]
+
+
+class _Item:
+    __slots__ = ("cache_key", "version", "state", "task")
+
+    def __init__(self, cache_key: str, version: int):
+        self.cache_key = cache_key
+        # prefetch version of the save this item belongs to (kept items move to the newest)
+        self.version = version
+        self.state = QUEUED
+        self.task: Optional[asyncio.Task] = None
+
+
+class _Project:
+    __slots__ = ("items", "counts")
+
+    def __init__(self):
+        self.items: Dict[str, _Item] = {}
+        # outcomes since the first save, as reported by status()
+        self.counts = {"generated": 0, "cached": 0, "failed": 0, "cancelled": 0, "over_budget": 0}
+
+
+def wants_prefetch(body: Dict[str, Any]) -> bool:
+    if PREFETCH_MODE == "always":
+        return True
+    return PREFETCH_MODE == "opt_in" and bool(body.get("prefetch"))
+
+
+class Prefetcher:
+    """Per-worker prefetch queues, one per project; only used from the event loop."""
+
+    def __init__(self, concurrency: int = PREFETCH_CONCURRENCY, max_items: int = PREFETCH_MAX_ITEMS):
+        self.concurrency = max(1, concurrency)
+        self.max_items = max_items
+        self._runner: Optional[Runner] = None
+        self._gate: Optional[asyncio.Semaphore] = None
+        self._projects: "OrderedDict[str, _Project]" = OrderedDict()
+        self._stats = {"saves": 0, "queued": 0, "generated": 0, "cached": 0, "failed": 0, "over_budget": 0,
+                       "over_limit": 0, "cancelled_edited": 0, "cancelled_removed": 0, "superseded": 0}
+
+    def start(self, runner: Runner) -> None:
+        self._runner = runner
+        self._gate = asyncio.Semaphore(self.concurrency)
+
+    async def stop(self) -> None:
+        tasks = [i.task for p in self._projects.values() for i in p.items.values() if i.task]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._projects.clear()
+
+    def active(self, project_id: str) -> bool:
+        project = self._projects.get(project_id)
+        return project is not None and bool(project.items)
+
+    def schedule(self, project_id: str, context: Dict[str, Any], plan: List[PrefetchItem],
+                 queue: bool = True) -> Dict[str, Any]:
+        """
+        Reconcile the project's prefetch with `plan`, the items of a new save
+        still worth generating: cancel what changed or went away, keep what
+        is unchanged and (with queue) start the rest, up to max_items.
+        """
+        if self._runner is None:
+            return {"enabled": False}
+        version = shared_state.bump(f"prefetch:{project_id}")
+        project = self._projects.get(project_id) or _Project()
+        self._remember(project_id, project)
+        self._stats["saves"] += 1
+
+        wanted = {p.key: p for p in plan}
+        cancelled = 0
+        for key, item in list(project.items.items()):
+            new = wanted.get(key)
+            if new is not None and new.cache_key == item.cache_key:
+                item.version = version
+                continue
+            del project.items[key]
+            item.task.cancel()
+            cancelled += 1
+            project.counts["cancelled"] += 1
+            self._stats["cancelled_removed" if new is None else "cancelled_edited"] += 1
+
+        queued = skipped = 0
+        for p in plan if queue else ():
+            if p.key in project.items:
+                continue
+            if len(project.items) >= self.max_items:
+                skipped += 1
+                continue
+            item = _Item(p.cache_key, version)
+            item.task = asyncio.create_task(self._run(project_id, project, p, item, context))
+            project.items[p.key] = item
+            queued += 1
+        self._stats["queued"] += queued
+        self._stats["over_limit"] += skipped
+        if queued or cancelled:
+            logger.info("prefetch %s: queued %d, cancelled %d, pending %d, over limit %d",
+                        project_id, queued, cancelled, len(project.items), skipped)
+        return {"queued": queued, "cancelled": cancelled, "pending": len(project.items), "overLimit": skipped}
+
+    def cancel(self, project_id: str) -> int:
+        project = self._projects.get(project_id)
+        if project is None:
+            return 0
+        shared_state.bump(f"prefetch:{project_id}")
+        n = len(project.items)
+        for item in project.items.values():
+            item.task.cancel()
+        project.items.clear()
+        project.counts["cancelled"] += n
+        self._stats["cancelled_removed"] += n
+        return n
+
+    def status(self, project_id: str) -> Optional[Dict[str, Any]]:
+        project = self._projects.get(project_id)
+        if project is None:
+            return None
+        states = [i.state for i in project.items.values()]
+        return {
+            "projectId": project_id,
+            QUEUED: states.count(QUEUED),
+            RUNNING: states.count(RUNNING),
+            **project.counts,
+            "items": {key: item.state for key, item in project.items.items()},
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        pending = [i for p in self._projects.values() for i in p.items.values()]
+        return {
+            **self._stats,
+            "mode": PREFETCH_MODE,
+            "pending": len(pending),
+            "running": sum(1 for i in pending if i.state == RUNNING),
+            "projects": len(self._projects),
+            "budget": {"concurrency": self.concurrency, "max_items": self.max_items,
+                       "user_items_per_hour": PREFETCH_USER_ITEMS_PER_HOUR,
+                       "items_per_hour": PREFETCH_ITEMS_PER_HOUR},
+        }
+
+    # internals -------------------------------------------------------------
+    async def _run(self, project_id: str, project: _Project, plan: PrefetchItem, item: _Item,
+                   context: Dict[str, Any]) -> None:
+        set_flow(context.get("user_id"), project_id, PREFETCH)
+        outcome = None
+        try:
+            async with self._gate:
+                if shared_state.version(f"prefetch:{project_id}") != item.version:
+                    # saved again on another worker, which queues its own
+                    outcome = "superseded"
+                elif response_cache.contains(plan.cache_key):
+                    outcome = "cached"
+                elif not await self._charge(context.get("user_id")):
+                    outcome = "over_budget"
+                else:
+                    item.state = RUNNING
+                    await self._runner(context, plan.scaffold)
+                    outcome = "generated"
+        except asyncio.CancelledError:
+            # counted by whoever cancelled it
+            raise
+        except Exception as e:
+            outcome = "failed"
+            logger.warning("prefetch %s: item %s failed: %s", project_id, plan.key, e)
+        finally:
+            if project.items.get(plan.key) is item:
+                del project.items[plan.key]
+            if outcome:
+                self._stats[outcome] += 1
+                project.counts[outcome if outcome != "superseded" else "cancelled"] += 1
+
+    async def _charge(self, user_id: Any) -> bool:
+        buckets = []
+        if PREFETCH_USER_ITEMS_PER_HOUR > 0:
+            buckets.append((f"prefetch:user:{user_id or 'anonymous'}", 1.0,
+                            PREFETCH_USER_ITEMS_PER_HOUR / 3600.0, PREFETCH_USER_ITEMS_PER_HOUR))
+        if PREFETCH_ITEMS_PER_HOUR > 0:
+            buckets.append(("prefetch:global", 1.0, PREFETCH_ITEMS_PER_HOUR / 3600.0, PREFETCH_ITEMS_PER_HOUR))
+        if not buckets:
+            return True
+        # a SQLite take is a write transaction: off the loop, as in scheduler.admit
+        wait = await asyncio.to_thread(shared_state.take, buckets) if shared_state.shared else shared_state.take(buckets)
+        return wait <= 0
+
+    def _remember(self, project_id: str, project: _Project) -> None:
+        self._projects[project_id] = project
+        self._projects.move_to_end(project_id)
+        if len(self._projects) > PREFETCH_MAX_PROJECTS:
+            # drop the oldest idle ones; projects with pending items stay
+            for pid in [pid for pid, p in self._projects.items() if not p.items][:len(self._projects) - PREFETCH_MAX_PROJECTS]:
+                del self._projects[pid]
+
+
+# shared instance used by /projects
+prefetcher = Prefetcher()
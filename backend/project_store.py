@@ -0,0 +1,266 @@
+# backend/project_store.py
+"""
+Server-side project store with an id -> outline position index.
+
+Clients upload a project once (PUT /projects/{id}) and afterwards refer to
+it by id, so /regenerate can take just projectId + item_id + feedback and
+resolve the item with a dict lookup instead of scanning the request body.
+
+* memory: LRU of indexed projects, bounded by PROJECTS_MAX_CACHED
+* persistence (optional): SQLite file, enabled by setting PROJECTS_DB.
+  Outline entries are stored one row each, so writing back a regenerated
+  item touches one row, not the whole document. Projects evicted from
+  memory are reloaded (and re-indexed) from here on the next lookup.
+
+With several workers, PROJECTS_DB (or SHARED_STATE_DB) is also how they
+see each other's writes: every write bumps the project's version in
+shared_state, and a cached copy with an older version is reloaded.
+
+Without PROJECTS_DB an evicted or never-uploaded project is simply unknown;
+callers then fall back to the project sent in the request body.
+
+Ownership: a project uploaded with a userId belongs to that user. Every
+read and write of it (get, find_item, update_item, put over it, delete)
+must pass the same userId, else ProjectAccessDenied; a missing userId is
+not a wildcard. Projects uploaded without one stay open to everyone.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared_state import SHARED_STATE_DB, shared_state
+
+logger = logging.getLogger("paradocs-gen")
+
+PROJECTS_MAX_CACHED = int(os.getenv("PROJECTS_MAX_CACHED", "256"))
+PROJECTS_DB = os.getenv("PROJECTS_DB") or SHARED_STATE_DB
+
+# outline entries are matched on any of these keys (same as the old body scan)
+ITEM_ID_KEYS = ("id", "item_id", "slide_id")
+
+
+def item_keys(entry: Dict[str, Any]) -> List[str]:
+    keys = [str(entry[k]) for k in ITEM_ID_KEYS if entry.get(k) is not None]
+    content = entry.get("content")
+    if isinstance(content, dict) and isinstance(content.get("generated"), dict):
+        gen_id = content["generated"].get("id")
+        if gen_id is not None:
+            keys.append(str(gen_id))
+    return keys
+
+
+def generated_of(entry: Dict[str, Any]) -> Dict[str, Any]:
+    """The generated item for an outline entry (content.generated if present)."""
+    content = entry.get("content")
+    if isinstance(content, dict) and isinstance(content.get("generated"), dict):
+        return content["generated"]
+    return entry
+
+
+class ProjectAccessDenied(PermissionError):
+    def __init__(self, project_id: str):
+        self.project_id = project_id
+        super().__init__(f"project {project_id} belongs to another user")
+
+
+class _Project:
+    __slots__ = ("meta", "outline", "index", "user_id", "version")
+
+    def __init__(self, meta: Dict[str, Any], outline: List[Any], user_id: Optional[str]):
+        self.meta = meta
+        self.outline = outline
+        self.user_id = user_id
+        # shared_state version this copy reflects (multi-worker only)
+        self.version = 0
+        self.index: Dict[str, int] = {}
+        for pos, entry in enumerate(outline):
+            if isinstance(entry, dict):
+                for key in item_keys(entry):
+                    # first occurrence wins, like the linear scan it replaces
+                    self.index.setdefault(key, pos)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**self.meta, "outline": self.outline}
+
+
+class _SqlitePersistence:
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS projects ("
+            " id TEXT PRIMARY KEY, user_id TEXT, meta TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS project_items ("
+            " project_id TEXT NOT NULL, pos INTEGER NOT NULL, entry TEXT NOT NULL,"
+            " PRIMARY KEY (project_id, pos))"
+        )
+        logger.info("Project store: SQLite at %s", path)
+
+    def save(self, project_id: str, project: _Project) -> None:
+        self._db.execute("BEGIN")
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO projects (id, user_id, meta, updated_at) VALUES (?, ?, ?, ?)",
+                (project_id, project.user_id, json.dumps(project.meta), time.time()),
+            )
+            self._db.execute("DELETE FROM project_items WHERE project_id = ?", (project_id,))
+            self._db.executemany(
+                "INSERT INTO project_items (project_id, pos, entry) VALUES (?, ?, ?)",
+                [(project_id, pos, json.dumps(entry)) for pos, entry in enumerate(project.outline)],
+            )
+            self._db.execute("COMMIT")
+        except Exception:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def save_entry(self, project_id: str, pos: int, entry: Any) -> None:
+        self._db.execute(
+            "UPDATE project_items SET entry = ? WHERE project_id = ? AND pos = ?", (json.dumps(entry), project_id, pos)
+        )
+        self._db.execute("UPDATE projects SET updated_at = ? WHERE id = ?", (time.time(), project_id))
+
+    def load(self, project_id: str) -> Optional[_Project]:
+        row = self._db.execute("SELECT user_id, meta FROM projects WHERE id = ?", (project_id,)).fetchone()
+        if row is None:
+            return None
+        entries = [json.loads(r[0]) for r in self._db.execute(
+            "SELECT entry FROM project_items WHERE project_id = ? ORDER BY pos", (project_id,)
+        )]
+        return _Project(json.loads(row[1]), entries, row[0])
+
+    def delete(self, project_id: str) -> None:
+        self._db.execute("DELETE FROM project_items WHERE project_id = ?", (project_id,))
+        self._db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+
+class ProjectStore:
+    def __init__(self, max_cached: int = PROJECTS_MAX_CACHED, db_path: Optional[str] = PROJECTS_DB):
+        self.max_cached = max_cached
+        self._mem: "OrderedDict[str, _Project]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "lookups": 0, "hits": 0, "misses": 0, "loads": 0, "stale": 0, "evictions": 0}
+        self._persist: Optional[_SqlitePersistence] = None
+        if db_path:
+            try:
+                self._persist = _SqlitePersistence(db_path)
+            except Exception as e:
+                logger.warning("Project store: persistence disabled (%s)", e)
+        # other workers write the same file: check versions before trusting memory
+        self._shared = self._persist is not None and shared_state.shared
+
+    # ------------------------------------------------------------------
+    def put(self, project_id: str, project: Dict[str, Any], user_id: Optional[str] = None) -> Dict[str, Any]:
+        outline = project.get("outline") or []
+        if not isinstance(outline, list):
+            raise ValueError("outline must be a list")
+        meta = {k: v for k, v in project.items() if k != "outline"}
+        entry = _Project(meta, list(outline), user_id)
+        with self._lock:
+            # replacing someone else's project is a write to it
+            self._lookup(project_id, user_id)
+            self._remember(project_id, entry)
+            self._stats["puts"] += 1
+            if self._persist is not None:
+                self._persist.save(project_id, entry)
+                self._bump(project_id, entry)
+        return {"projectId": project_id, "items": len(entry.outline), "indexed": len(entry.index)}
+
+    def get(self, project_id: str, user_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The project, None if unknown; ProjectAccessDenied if it is someone else's."""
+        with self._lock:
+            project = self._lookup(project_id, user_id)
+            return project.as_dict() if project else None
+
+    def find_item(self, project_id: str, item_id: Any, user_id: Optional[str] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(generated item, project meta) for item_id, or None if the project or item is unknown."""
+        with self._lock:
+            self._stats["lookups"] += 1
+            project = self._lookup(project_id, user_id)
+            pos = project.index.get(str(item_id)) if project else None
+            if pos is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            return generated_of(project.outline[pos]), project.meta
+
+    def update_item(self, project_id: str, item_id: Any, item: Dict[str, Any], user_id: Optional[str] = None) -> bool:
+        """Write a regenerated item back into its outline entry."""
+        with self._lock:
+            project = self._lookup(project_id, user_id)
+            pos = project.index.get(str(item_id)) if project else None
+            if pos is None:
+                return False
+            entry = project.outline[pos]
+            if isinstance(entry.get("content"), dict) and isinstance(entry["content"].get("generated"), dict):
+                entry = {**entry, "content": {**entry["content"], "generated": item}}
+            else:
+                entry = {**entry, **item}
+            project.outline[pos] = entry
+            for key in item_keys(entry):
+                project.index.setdefault(key, pos)
+            if self._persist is not None:
+                self._persist.save_entry(project_id, pos, entry)
+                self._bump(project_id, project)
+            return True
+
+    def delete(self, project_id: str, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._lookup(project_id, user_id)
+            self._mem.pop(project_id, None)
+            if self._persist is not None:
+                self._persist.delete(project_id)
+                self._bump(project_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._stats, "cached": len(self._mem), "persistent": self._persist is not None,
+                    "shared": self._shared}
+
+    # ------------------------------------------------------------------
+    # internals: callers hold self._lock
+    def _lookup(self, project_id: str, user_id: Optional[str]) -> Optional[_Project]:
+        project = self._mem.get(project_id)
+        version = shared_state.version(f"project:{project_id}") if self._shared else 0
+        if project is not None and project.version != version:
+            # written by another worker since we cached it
+            self._mem.pop(project_id)
+            project = None
+            self._stats["stale"] += 1
+        if project is not None:
+            self._mem.move_to_end(project_id)
+        elif self._persist is not None:
+            project = self._persist.load(project_id)
+            if project is not None:
+                project.version = version
+                self._stats["loads"] += 1
+                self._remember(project_id, project)
+        if project is None:
+            return None
+        # a project uploaded with an owner is only readable and writable by that owner
+        if project.user_id and str(user_id or "") != str(project.user_id):
+            raise ProjectAccessDenied(project_id)
+        return project
+
+    def _bump(self, project_id: str, project: Optional[_Project]) -> None:
+        if self._shared:
+            version = shared_state.bump(f"project:{project_id}")
+            if project is not None:
+                project.version = version
+
+    def _remember(self, project_id: str, project: _Project) -> None:
+        self._mem[project_id] = project
+        self._mem.move_to_end(project_id)
+        while len(self._mem) > self.max_cached:
+            self._mem.popitem(last=False)
+            self._stats["evictions"] += 1
+
+
+# shared instance used by /projects and /regenerate
+project_store = ProjectStore()
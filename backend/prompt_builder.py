@@ -0,0 +1,249 @@
+# backend/prompt_builder.py
+"""
+Prompt construction for /generate and /regenerate (full and patch mode).
+
+* Context objects (scaffold, hints, original item) go in as compact JSON,
+  not Python reprs, with volatile meta (timestamps, response previews,
+  previous feedback, cache flags) and empty fields stripped, so a prompt
+  doesn't grow with every regeneration and identical content renders to
+  identical text (which is also what the response cache keys on).
+* Every prompt is checked against PROMPT_INPUT_TOKEN_BUDGET using a local
+  estimate (~PROMPT_CHARS_PER_TOKEN characters per token; no extra round
+  trip to count_tokens). Over budget, long strings and lists in the
+  context (scaffold, hints) are shortened step by step until it fits. What
+  the user typed (main topic, feedback) is never shortened, and neither is
+  the item being regenerated: cutting its bullets would drop them from the
+  result (and shift patch-mode indexes), so an oversized original is sent
+  whole, over budget, with a warning.
+* max_output_tokens is picked per doc type and layout instead of a flat
+  1200.
+* Outline mode (several items in one call) states the preamble once for a
+  chunk of items; outline_chunks() sizes the chunks so each prompt fits
+  OUTLINE_INPUT_TOKEN_BUDGET and the answers fit OUTLINE_OUTPUT_TOKEN_BUDGET.
+"""
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("paradocs-gen")
+
+PROMPT_INPUT_TOKEN_BUDGET = int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "1500"))
+PROMPT_CHARS_PER_TOKEN = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+OUTLINE_INPUT_TOKEN_BUDGET = int(os.getenv("OUTLINE_INPUT_TOKEN_BUDGET", "4000"))
+OUTLINE_OUTPUT_TOKEN_BUDGET = int(os.getenv("OUTLINE_OUTPUT_TOKEN_BUDGET", "8192"))
+OUTLINE_MAX_CHUNK_ITEMS = int(os.getenv("OUTLINE_MAX_CHUNK_ITEMS", "16"))
+
+# meta keys the server stamps on items; they say nothing about the content
+VOLATILE_META_KEYS = {
+    "generated_at", "regenerated_at", "regeneration_feedback", "generator",
+    "raw_response_preview", "cache_hit", "strategy", "regeneration_mode",
+}
+
+# Output budgets (tokens) by (docType, layout), then docType. DOCX sections
+# carry paragraphs of text; slides are a title and a handful of bullets.
+# These are for the answer only: the model's thinking budget is added on
+# top when the call is made (generation_pipeline.generate_config).
+OUTPUT_TOKEN_BUDGETS: Dict[Any, int] = {
+    ("pptx", "title"): 384,
+    ("pptx", "title+image"): 640,
+    "pptx": 800,
+    "docx": 1200,
+}
+DEFAULT_OUTPUT_TOKENS = 1200
+
+# (max string length, max list length) per shrink step; None = untouched
+_SHRINK_STEPS = [(None, None), (600, 24), (300, 12), (160, 8), (80, 5), (40, 3)]
+
+_stats = {"prompts": 0, "tokens": 0, "truncated": 0, "over_budget": 0}
+
+
+def count_tokens(text: str) -> int:
+    return math.ceil(len(text) / PROMPT_CHARS_PER_TOKEN)
+
+
+def strip_volatile(obj: Any, in_meta: bool = False) -> Any:
+    """Drop volatile meta keys and empty values, recursively."""
+    if isinstance(obj, dict):
+        out = {}
+        for k, v in obj.items():
+            if in_meta and k in VOLATILE_META_KEYS:
+                continue
+            v = strip_volatile(v, in_meta=(k == "meta"))
+            if v is None or v == "" or v == [] or v == {}:
+                continue
+            out[k] = v
+        return out
+    if isinstance(obj, list):
+        return [strip_volatile(v) for v in obj]
+    return obj
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(strip_volatile(obj), separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _shrink(obj: Any, max_str: int, max_list: int) -> Any:
+    if isinstance(obj, str):
+        return obj if len(obj) <= max_str else obj[: max_str - 1] + "…"
+    if isinstance(obj, list):
+        return [_shrink(v, max_str, max_list) for v in obj[:max_list]]
+    if isinstance(obj, dict):
+        return {k: _shrink(v, max_str, max_list) for k, v in obj.items()}
+    return obj
+
+
+def _fit(render, sections: Dict[str, Any], budget: int, keep: Sequence[str] = ()) -> str:
+    """
+    render(**sections) -> prompt. Shrink the sections, except those named in
+    `keep`, until the prompt fits the budget; past the last step (or with
+    nothing left to shrink), send the smallest version.
+    """
+    prompt = ""
+    steps = _SHRINK_STEPS if set(sections) - set(keep) else _SHRINK_STEPS[:1]
+    for step, (max_str, max_list) in enumerate(steps):
+        shrunk = sections if max_str is None else {
+            k: v if k in keep else _shrink(v, max_str, max_list) for k, v in sections.items()
+        }
+        prompt = render(**shrunk)
+        if count_tokens(prompt) <= budget:
+            if step:
+                _stats["truncated"] += 1
+                logger.info("prompt: context shortened (step %d) to fit %d tokens", step, budget)
+            break
+    else:
+        _stats["over_budget"] += 1
+        logger.warning("prompt: ~%d tokens, over budget %d (%s not shortened)",
+                       count_tokens(prompt), budget, ", ".join(keep) or "nothing")
+    _stats["prompts"] += 1
+    _stats["tokens"] += count_tokens(prompt)
+    return prompt
+
+
+# ---------------------- builders -------------------------------------------
+def build_generate_prompt(doc_type: str, main_topic: str, scaffold: Any, hints: Dict[str, Any],
+                          budget: int = PROMPT_INPUT_TOKEN_BUDGET) -> str:
+    def render(main_topic: Any, scaffold: Any, hints: Any) -> str:
+        return (
+            f"Project docType: {doc_type}\n"
+            f"Main topic: {main_topic}\n"
+            f"Scaffold (outline item): {compact_json(scaffold)}\n"
+            f"Hints: {compact_json(hints)}\n\n"
+            "Return one JSON object with keys id, type, layout, title, bullets, notes, images, meta. "
+            "Keep bullets concise unless hints say otherwise. meta: generator metadata only. "
+            "images: [] if you cannot supply any. JSON only, no commentary."
+        )
+
+    return _fit(render, {"main_topic": main_topic, "scaffold": scaffold, "hints": hints or {}}, budget,
+                keep=("main_topic",))
+
+
+def build_regenerate_prompt(original_item: Dict[str, Any], feedback: str,
+                            budget: int = PROMPT_INPUT_TOKEN_BUDGET) -> str:
+    def render(original: Any, feedback: Any) -> str:
+        return (
+            "You are given a JSON object representing a slide/section. Return a single JSON object ONLY that keeps "
+            "the same top-level keys and the same `id`, with values updated according to the user's feedback. "
+            "Do exactly what the user asks; unless they say otherwise, new content stays in context of the original.\n\n"
+            f"Original: {compact_json(original)}\n\n"
+            f"User feedback: {feedback}\n\n"
+            "Keep bullets concise."
+        )
+
+    return _fit(render, {"original": original_item, "feedback": feedback or ""}, budget,
+                keep=("original", "feedback"))
+
+
+def build_regenerate_patch_prompt(original_item: Dict[str, Any], feedback: str,
+                                  budget: int = PROMPT_INPUT_TOKEN_BUDGET) -> str:
+    def render(original: Any, feedback: Any) -> str:
+        return (
+            "You are given a JSON object representing a slide/section and the user's feedback. Do NOT return the "
+            "object. Return ONLY {\"edits\": [...]}, the smallest list of edits that does what the user asks. "
+            "Each edit is {\"op\": \"replace\" | \"insert\" | \"delete\", \"field\": one of title, type, layout, "
+            "bullets, notes, images, \"index\": 0-based position in the list (list fields only), \"value\": the new text "
+            "(replace and insert)}. title, type and layout only take replace. Indexes always refer to the ORIGINAL "
+            "lists below, not to the lists after your other edits; insert at the list length appends. Unless the "
+            "user says otherwise, new content stays in context of the original.\n\n"
+            f"Original: {compact_json(original)}\n\n"
+            f"User feedback: {feedback}\n\n"
+            "Keep bullets concise."
+        )
+
+    return _fit(render, {"original": original_item, "feedback": feedback or ""}, budget,
+                keep=("original", "feedback"))
+
+
+def _render_outline(doc_type: str, main_topic: Any, scaffolds: Dict[str, Any], hints: Any) -> str:
+    lines = "".join(f"{i}: {compact_json(s)}\n" for i, s in scaffolds.items())
+    return (
+        f"Project docType: {doc_type}\n"
+        f"Main topic: {main_topic}\n"
+        f"Hints: {compact_json(hints)}\n\n"
+        f"Outline items ({len(scaffolds)}), one per line as `index: item`:\n{lines}\n"
+        "Return {\"items\": [...]} with exactly one JSON object per outline item, in the same order, each with "
+        "`index` (the number before the item) and keys id, type, layout, title, bullets, notes, images, meta. "
+        "Keep bullets concise unless hints say otherwise. meta: generator metadata only. "
+        "images: [] if you cannot supply any. JSON only, no commentary."
+    )
+
+
+def build_outline_prompt(doc_type: str, main_topic: str, scaffolds: Sequence[Any], hints: Dict[str, Any],
+                         budget: int = OUTLINE_INPUT_TOKEN_BUDGET) -> str:
+    """One prompt for several outline items; they are numbered 0..n-1 in order."""
+    def render(main_topic: Any, scaffolds: Any, hints: Any) -> str:
+        return _render_outline(doc_type, main_topic, scaffolds, hints)
+
+    # keyed by index, so shortening trims the items but never drops one
+    numbered = {str(i): s for i, s in enumerate(scaffolds)}
+    return _fit(render, {"main_topic": main_topic, "scaffolds": numbered, "hints": hints or {}}, budget,
+                keep=("main_topic",))
+
+
+def outline_chunks(doc_type: str, main_topic: str, scaffolds: Sequence[Any], hints: Dict[str, Any],
+                   groups: Optional[Sequence[Any]] = None) -> List[List[int]]:
+    """
+    Split outline positions into consecutive chunks for build_outline_prompt:
+    each within the input and output token budgets and OUTLINE_MAX_CHUNK_ITEMS,
+    and, when `groups` (e.g. the model tier per item) is given, one group per
+    chunk. An item too big for any chunk gets one of its own.
+    """
+    base = count_tokens(_render_outline(doc_type, main_topic, {}, hints or {}))
+    chunks: List[List[int]] = []
+    current: List[int] = []
+    tokens_in = tokens_out = 0
+    for pos, scaffold in enumerate(scaffolds):
+        item_in = count_tokens(f"{len(current)}: {compact_json(scaffold)}\n")
+        item_out = max_output_tokens_for(doc_type, layout_of(scaffold))
+        if current and (base + tokens_in + item_in > OUTLINE_INPUT_TOKEN_BUDGET
+                        or tokens_out + item_out > OUTLINE_OUTPUT_TOKEN_BUDGET
+                        or len(current) >= OUTLINE_MAX_CHUNK_ITEMS
+                        or (groups is not None and groups[pos] != groups[current[0]])):
+            chunks.append(current)
+            current, tokens_in, tokens_out = [], 0, 0
+        current.append(pos)
+        tokens_in += item_in
+        tokens_out += item_out
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def max_output_tokens_for(doc_type: Optional[str], layout: Optional[str] = None) -> int:
+    doc_type = (doc_type or "").lower()
+    layout = (layout or "").lower()
+    return OUTPUT_TOKEN_BUDGETS.get((doc_type, layout)) or OUTPUT_TOKEN_BUDGETS.get(doc_type) or DEFAULT_OUTPUT_TOKENS
+
+
+def layout_of(obj: Any) -> Optional[str]:
+    if isinstance(obj, dict):
+        return obj.get("layout") or obj.get("template")
+    return None
+
+
+def prompt_stats() -> Dict[str, Any]:
+    out: Dict[str, Any] = dict(_stats)
+    out["avg_tokens"] = round(out["tokens"] / out["prompts"], 1) if out["prompts"] else 0.0
+    out["budget"] = PROMPT_INPUT_TOKEN_BUDGET
+    return out
@@ -0,0 +1,322 @@
+# backend/resilience.py
+"""
+Resilience layer wrapped around every Gemini call.
+
+* Retries: jittered exponential backoff on transient errors (429, 5xx,
+  timeouts, connection resets), honoring Retry-After when the server sends it.
+* Circuit breaker (one per model): after GENAI_CB_FAILURE_THRESHOLD
+  consecutive failures the circuit opens and calls fail fast with
+  CircuitOpenError until GENAI_CB_RESET_S has passed; then a single
+  half-open probe decides whether to close it again.
+* Token bucket (global, off by default): requests per second and tokens
+  per minute matching our Gemini quota (GENAI_QPS / GENAI_TPM), so we
+  queue locally instead of collecting 429s. With SHARED_STATE_DB the
+  buckets live in shared_state and the quota holds across all workers.
+
+State and counters are exposed via resilience_stats().
+"""
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from metrics import count_error, observe_stage
+from shared_state import SharedState, shared_state
+
+logger = logging.getLogger("paradocs-gen")
+
+GENAI_RETRY_MAX_ATTEMPTS = int(os.getenv("GENAI_RETRY_MAX_ATTEMPTS", "4"))
+GENAI_RETRY_BASE_DELAY_S = float(os.getenv("GENAI_RETRY_BASE_DELAY_S", "0.5"))
+GENAI_RETRY_MAX_DELAY_S = float(os.getenv("GENAI_RETRY_MAX_DELAY_S", "20"))
+GENAI_CB_FAILURE_THRESHOLD = int(os.getenv("GENAI_CB_FAILURE_THRESHOLD", "5"))
+GENAI_CB_RESET_S = float(os.getenv("GENAI_CB_RESET_S", "30"))
+# 0 (the default) disables the corresponding limit; set them to the project's quota
+GENAI_QPS = float(os.getenv("GENAI_QPS", "0"))
+GENAI_TPM = float(os.getenv("GENAI_TPM", "0"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, model: str, retry_after_s: float):
+        self.model = model
+        self.retry_after_s = retry_after_s
+        super().__init__(f"circuit open for {model}; retry in {retry_after_s:.1f}s")
+
+
+# ---------------------- error classification ---------------------------
+def error_status(exc: BaseException) -> Optional[int]:
+    code = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+    try:
+        return int(code) if code is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, CircuitOpenError):
+        return False
+    status = error_status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # transport-level problems (timeouts, resets) carry no status
+    name = type(exc).__name__
+    return isinstance(exc, (TimeoutError, ConnectionError)) or name in (
+        "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError", "ReadError", "PoolTimeout",
+    )
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Retry-After from the error's HTTP response (delta-seconds or HTTP date)."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+        return max(0.0, when.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: BaseException) -> float:
+    """Full-jitter exponential backoff; Retry-After wins when present."""
+    hinted = retry_after_seconds(exc)
+    if hinted is not None:
+        return min(hinted, GENAI_RETRY_MAX_DELAY_S)
+    cap = min(GENAI_RETRY_MAX_DELAY_S, GENAI_RETRY_BASE_DELAY_S * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+# ---------------------- circuit breaker -----------------------------------
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, model: str,
+                 failure_threshold: int = GENAI_CB_FAILURE_THRESHOLD,
+                 reset_timeout_s: float = GENAI_CB_RESET_S):
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+        self.times_opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError if the call must not go out."""
+        if self.state == self.OPEN:
+            elapsed = time.monotonic() - self.opened_at
+            if elapsed < self.reset_timeout_s:
+                self.rejected += 1
+                raise CircuitOpenError(self.model, self.reset_timeout_s - elapsed)
+            self.state = self.HALF_OPEN
+            logger.info("circuit %s: half-open, sending probe", self.model)
+        if self.state == self.HALF_OPEN:
+            if self.probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(self.model, 1.0)
+            self.probe_in_flight = True
+
+    def rejecting(self) -> bool:
+        """True while calls would fail fast (open and not yet due for a probe)."""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout_s
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info("circuit %s: closed", self.model)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self.probe_in_flight = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+                logger.warning("circuit %s: open after %d consecutive failures", self.model, self.consecutive_failures)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release_probe(self) -> None:
+        """Call finished without a verdict (e.g. cancelled); let another probe through."""
+        self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+# ---------------------- token bucket ---------------------------------------
+class TokenBucket:
+    """
+    Two-dimensional bucket: one bucket of requests (refilled at qps) and one
+    of model tokens (refilled at tpm / 60). acquire() waits until both can
+    cover the call. With a shared `state` the levels are kept there, and
+    the (SQLite) take runs on a worker thread.
+
+    A take is atomic (plain code on the event loop, or one shared_state
+    transaction) and debits nothing when it has to wait, so callers sleep
+    without holding anything and simply try again.
+    """
+
+    def __init__(self, qps: float = GENAI_QPS, tpm: float = GENAI_TPM, state: Optional[SharedState] = None):
+        self.qps = qps
+        self.tokens_per_s = tpm / 60.0
+        self._req = max(qps, 1.0)
+        self._tok = tpm if tpm > 0 else 0.0
+        self._last = time.monotonic()
+        self._state = state if state is not None and state.shared else None
+        self.waits = 0
+        self.wait_s_total = 0.0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        dt = now - self._last
+        self._last = now
+        if self.qps > 0:
+            self._req = min(max(self.qps, 1.0), self._req + dt * self.qps)
+        if self.tokens_per_s > 0:
+            self._tok = min(self.tokens_per_s * 60.0, self._tok + dt * self.tokens_per_s)
+
+    def _take_local(self, cost: float) -> float:
+        self._refill()
+        need_req = 0.0 if self.qps <= 0 else max(0.0, 1.0 - self._req) / self.qps
+        need_tok = 0.0 if self.tokens_per_s <= 0 else max(0.0, cost - self._tok) / self.tokens_per_s
+        wait = max(need_req, need_tok)
+        if wait <= 0:
+            if self.qps > 0:
+                self._req -= 1.0
+            if self.tokens_per_s > 0:
+                self._tok -= cost
+        return wait
+
+    def _take_shared(self, cost: float) -> float:
+        buckets = []
+        if self.qps > 0:
+            buckets.append(("genai:requests", 1.0, self.qps, max(self.qps, 1.0)))
+        if self.tokens_per_s > 0:
+            buckets.append(("genai:tokens", cost, self.tokens_per_s, self.tokens_per_s * 60.0))
+        return self._state.take(buckets)
+
+    async def acquire(self, est_tokens: int = 0) -> None:
+        if self.qps <= 0 and self.tokens_per_s <= 0:
+            return
+        cost = min(float(est_tokens), self.tokens_per_s * 60.0) if self.tokens_per_s > 0 else 0.0
+        waited = 0.0
+        while True:
+            if self._state is not None:
+                wait = await asyncio.to_thread(self._take_shared, cost)
+            else:
+                wait = self._take_local(cost)
+            if wait <= 0:
+                break
+            waited += wait
+            await asyncio.sleep(wait)
+        if waited:
+            self.waits += 1
+            self.wait_s_total += waited
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "qps": self.qps,
+            "tpm": round(self.tokens_per_s * 60.0),
+            "shared": self._state is not None,
+            "waits": self.waits,
+            "wait_s_total": round(self.wait_s_total, 3),
+        }
+
+
+# ---------------------- wrapper ------------------------------------------
+_breakers: Dict[str, CircuitBreaker] = {}
+rate_limiter = TokenBucket(state=shared_state)
+_retry_stats = {"calls": 0, "retries": 0, "gave_up": 0, "fast_failed": 0}
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    cb = _breakers.get(model)
+    if cb is None:
+        cb = _breakers[model] = CircuitBreaker(model)
+    return cb
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int = 0) -> int:
+    # ~4 characters per token is close enough for quota pacing
+    return len(prompt) // 4 + max_output_tokens
+
+
+async def call_with_resilience(model: str,
+                               fn: Callable[[], Awaitable[Any]],
+                               est_tokens: int = 0,
+                               max_attempts: int = GENAI_RETRY_MAX_ATTEMPTS) -> Any:
+    """
+    Run `fn` (one model call) under the breaker for `model`, the global rate
+    limiter and the retry policy. Non-retryable errors propagate at once.
+    """
+    cb = breaker_for(model)
+    _retry_stats["calls"] += 1
+    attempt = 0
+    while True:
+        try:
+            cb.before_call()
+        except CircuitOpenError:
+            _retry_stats["fast_failed"] += 1
+            count_error("circuit_open", model)
+            raise
+
+        try:
+            t0 = time.perf_counter()
+            await rate_limiter.acquire(est_tokens)
+            observe_stage("rate_limit_wait", time.perf_counter() - t0, model=model)
+            result = await fn()
+        except asyncio.CancelledError:
+            cb.release_probe()
+            raise
+        except Exception as e:
+            status = error_status(e)
+            count_error(f"http_{status}" if status else type(e).__name__, model)
+            if not is_retryable(e):
+                # the model answered, the request was bad: not a health signal
+                cb.release_probe()
+                raise
+            cb.record_failure()
+            attempt += 1
+            if attempt >= max_attempts or cb.state == CircuitBreaker.OPEN:
+                _retry_stats["gave_up"] += 1
+                raise
+            delay = backoff_delay(attempt - 1, e)
+            _retry_stats["retries"] += 1
+            logger.warning("model %s: transient error (%s), retry %d/%d in %.2fs",
+                           model, status or type(e).__name__, attempt, max_attempts - 1, delay)
+            await asyncio.sleep(delay)
+            continue
+
+        cb.record_success()
+        return result
+
+
+def resilience_stats() -> Dict[str, Any]:
+    return {
+        "retries": dict(_retry_stats),
+        "breakers": {m: cb.snapshot() for m, cb in _breakers.items()},
+        "rate_limiter": rate_limiter.snapshot(),
+    }
@@ -0,0 +1,244 @@
+# backend/response_cache.py
+"""
+Content-addressed cache for LLM generations.
+
+Keys are a sha256 over (model, rendered prompt, schema, temperature), so
+retries, double-clicks and re-runs on an unchanged outline are served
+locally. Two tiers:
+
+* memory: LRU with TTL, bounded by entry count and total payload bytes
+* disk (optional): SQLite file, enabled by setting GENAI_CACHE_DB (or
+  SHARED_STATE_DB); every worker process reads and writes the same file.
+  Expired rows and the LRU excess over GENAI_CACHE_DB_MAX_BYTES are
+  removed by a background thread, every GENAI_CACHE_DB_TRIM_S or as soon
+  as this worker's running size estimate goes over the cap, never inline
+  in set()
+
+Values are stored as JSON text and decoded on every hit, so callers are
+free to mutate what they get back.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from shared_state import SHARED_STATE_DB
+
+logger = logging.getLogger("paradocs-gen")
+
+GENAI_CACHE_ENABLED = os.getenv("GENAI_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+GENAI_CACHE_TTL_S = float(os.getenv("GENAI_CACHE_TTL_S", "3600"))
+GENAI_CACHE_MAX_ENTRIES = int(os.getenv("GENAI_CACHE_MAX_ENTRIES", "1024"))
+GENAI_CACHE_MAX_BYTES = int(os.getenv("GENAI_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+GENAI_CACHE_DB = os.getenv("GENAI_CACHE_DB") or SHARED_STATE_DB
+GENAI_CACHE_DB_MAX_BYTES = int(os.getenv("GENAI_CACHE_DB_MAX_BYTES", str(256 * 1024 * 1024)))
+GENAI_CACHE_DB_TRIM_S = float(os.getenv("GENAI_CACHE_DB_TRIM_S", "60"))
+
+
+def make_cache_key(model: str, prompt: str, temperature: float, schema: Any = None) -> str:
+    material = json.dumps(
+        {"model": model, "prompt": prompt, "temperature": temperature, "schema": schema},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self,
+                 ttl_s: float = GENAI_CACHE_TTL_S,
+                 max_entries: int = GENAI_CACHE_MAX_ENTRIES,
+                 max_bytes: int = GENAI_CACHE_MAX_BYTES,
+                 db_path: Optional[str] = GENAI_CACHE_DB,
+                 db_max_bytes: int = GENAI_CACHE_DB_MAX_BYTES,
+                 db_trim_s: float = GENAI_CACHE_DB_TRIM_S,
+                 enabled: bool = GENAI_CACHE_ENABLED):
+        self.enabled = enabled
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_max_bytes = db_max_bytes
+        self.db_trim_s = db_trim_s
+
+        # key -> (expires_at, payload)
+        self._mem: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits_memory": 0, "hits_disk": 0, "misses": 0, "stores": 0, "evictions": 0, "bypassed": 0}
+
+        self._db = None
+        self._db_path = db_path
+        # running estimate of the disk tier's payload bytes; the trim resyncs
+        # it with the file, which other workers write to as well
+        self._db_bytes = 0
+        self._next_trim = 0.0
+        self._trimming = False
+        self._trim_conn = None  # only used by the (single) trim thread
+        if enabled and db_path:
+            try:
+                self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache ("
+                    " key TEXT PRIMARY KEY, payload TEXT NOT NULL,"
+                    " size INTEGER NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+                )
+                self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_used_at ON llm_cache(used_at)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_expires_at ON llm_cache(expires_at)")
+                self._db_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+                self._next_trim = time.time() + db_trim_s
+                logger.info("LLM response cache: disk tier at %s", db_path)
+            except Exception as e:
+                logger.warning("LLM response cache: disk tier disabled (%s)", e)
+                self._db = None
+
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > now:
+                    self._mem.move_to_end(key)
+                    self._stats["hits_memory"] += 1
+                    return json.loads(payload)
+                self._drop_mem(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT payload, expires_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    self._db.execute("UPDATE llm_cache SET used_at = ? WHERE key = ?", (now, key))
+                    self._put_mem(key, row[0], row[1])
+                    self._stats["hits_disk"] += 1
+                    return json.loads(row[0])
+
+            self._stats["misses"] += 1
+            return None
+
+    def contains(self, key: str) -> bool:
+        """Whether `key` has a live entry; unlike get(), no stats, no LRU touch, no decode."""
+        if not self.enabled:
+            return False
+        now = time.time()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None and entry[0] > now:
+                return True
+            if self._db is not None:
+                row = self._db.execute("SELECT 1 FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+                return row is not None
+            return False
+
+    def set(self, key: str, value: Any) -> None:
+        if not self.enabled:
+            return
+        try:
+            payload = json.dumps(value)
+        except (TypeError, ValueError):
+            return
+        now = time.time()
+        expires_at = now + self.ttl_s
+        with self._lock:
+            self._put_mem(key, payload, expires_at)
+            self._stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, payload, size, expires_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), expires_at, now),
+                )
+                self._db_bytes += len(payload)
+                if not self._trimming and (now >= self._next_trim or self._db_bytes > self.db_max_bytes):
+                    self._trimming = True
+                    self._next_trim = now + self.db_trim_s
+                    threading.Thread(target=self._trim_db, name="llm-cache-trim", daemon=True).start()
+
+    def note_bypass(self) -> None:
+        with self._lock:
+            self._stats["bypassed"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out.update({
+                "enabled": self.enabled,
+                "entries": len(self._mem),
+                "bytes": self._mem_bytes,
+                "disk": self._db is not None,
+                "disk_bytes": self._db_bytes,
+            })
+        lookups = out["hits_memory"] + out["hits_disk"] + out["misses"]
+        out["hit_rate"] = round((out["hits_memory"] + out["hits_disk"]) / lookups, 4) if lookups else 0.0
+        return out
+
+    # ------------------------------------------------------------------
+    # internals: callers hold self._lock
+    def _put_mem(self, key: str, payload: str, expires_at: float) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        self._drop_mem(key)
+        self._mem[key] = (expires_at, payload)
+        self._mem_bytes += len(payload)
+        while self._mem and (len(self._mem) > self.max_entries or self._mem_bytes > self.max_bytes):
+            old_key, _ = next(iter(self._mem.items()))
+            self._drop_mem(old_key)
+            self._stats["evictions"] += 1
+
+    def _drop_mem(self, key: str) -> None:
+        entry = self._mem.pop(key, None)
+        if entry is not None:
+            self._mem_bytes -= len(entry[1])
+
+    # ------------------------------------------------------------------
+    # disk trim: runs on its own thread and connection, without self._lock
+    def _trim_db(self) -> None:
+        evicted = 0
+        total = None
+        try:
+            if self._trim_conn is None:
+                self._trim_conn = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+            db = self._trim_conn
+            db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+            if total > self.db_max_bytes:
+                # evict least recently used rows until we're back under budget
+                excess = total - self.db_max_bytes
+                freed = 0
+                victims = []
+                for key, size in db.execute("SELECT key, size FROM llm_cache ORDER BY used_at ASC"):
+                    victims.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                db.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+                evicted = len(victims)
+                total -= freed
+        except Exception as e:
+            logger.warning("LLM response cache: disk trim failed (%s)", e)
+        finally:
+            with self._lock:
+                if total is not None:
+                    self._db_bytes = total
+                self._stats["evictions"] += evicted
+                self._trimming = False
+
+
+# shared instance used by the generation paths
+response_cache = ResponseCache()
@@ -0,0 +1,242 @@
+# backend/scheduler.py
+"""
+Per-user rate limits and fair scheduling of model capacity.
+
+Two layers, so one user generating a 100-slide deck can't starve everyone:
+
+* admission (per request): admit() debits the user's token bucket for the
+  request's priority class and raises RateLimited when it is empty;
+  endpoints answer 429 + Retry-After. Interactive requests (/regenerate,
+  /generate, /generate/stream) cost 1 from USER_RATE_PER_MIN / USER_BURST.
+  Bulk requests (/generate/batch*, /jobs) cost their item count from
+  USER_BULK_ITEMS_PER_MIN / USER_BULK_BURST, capped at the burst so a full
+  deck is admissible when the bucket is full. Buckets live in shared_state,
+  so the limits hold across workers.
+* scheduling (per model call): llm_scheduler hands out the
+  GENAI_MAX_CONCURRENCY model-call slots of this worker by start-time fair
+  queuing. Each (class, user, project) is a flow; a call's start tag is
+  max(virtual time, the flow's last finish tag) and its finish tag adds
+  1 / weight. The smallest start tag goes next, so a flow with a long
+  backlog only advances its own tags, and a new flow (a /regenerate click)
+  is served ahead of everyone's backlog. Interactive flows weigh
+  SCHED_INTERACTIVE_WEIGHT (8) against 1 for bulk, so under contention
+  they get that much more of the capacity; ties go to interactive.
+  Speculative prefetch (see prefetch.py) is a third class weighing
+  SCHED_PREFETCH_WEIGHT (0.25), so it only soaks up capacity nobody else
+  is asking for; it is not rate limited here, prefetch has its own budget.
+
+Handlers (and run_batch_item, for jobs) set the flow with set_flow(); calls
+that never set one run as the anonymous interactive flow. A coalesced call
+(single_flight) runs in the flow of whoever started it; promote() lets a
+higher-priority caller that joins it take it over, queued model calls
+included, so a click never waits at the priority of a prefetch or batch.
+"""
+import asyncio
+import itertools
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from heapq import heappop, heappush
+from typing import Any, Dict, List, NamedTuple
+
+from metrics import count_rate_limited, scheduler_queue_depth, scheduler_wait_seconds
+from shared_state import shared_state
+
+logger = logging.getLogger("paradocs-gen")
+
+# Max number of model calls in flight per worker process
+GENAI_MAX_CONCURRENCY = int(os.getenv("GENAI_MAX_CONCURRENCY", "8"))
+SCHED_INTERACTIVE_WEIGHT = float(os.getenv("SCHED_INTERACTIVE_WEIGHT", "8"))
+SCHED_PREFETCH_WEIGHT = float(os.getenv("SCHED_PREFETCH_WEIGHT", "0.25"))
+# 0 disables the corresponding limit
+USER_RATE_PER_MIN = float(os.getenv("USER_RATE_PER_MIN", "60"))
+USER_BURST = float(os.getenv("USER_BURST", "20"))
+USER_BULK_ITEMS_PER_MIN = float(os.getenv("USER_BULK_ITEMS_PER_MIN", "300"))
+USER_BULK_BURST = float(os.getenv("USER_BULK_BURST", "200"))
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+PREFETCH = "prefetch"
+# in tie-break order
+PRIORITIES = (INTERACTIVE, BULK, PREFETCH)
+
+
+class RateLimited(RuntimeError):
+    def __init__(self, user_id: str, priority: str, retry_after_s: float):
+        self.user_id = user_id
+        self.priority = priority
+        self.retry_after_s = retry_after_s
+        super().__init__(f"rate limit exceeded for {priority} requests; retry in {retry_after_s:.1f}s")
+
+
+class Flow(NamedTuple):
+    priority: str
+    key: str
+
+
+_flow: ContextVar[Flow] = ContextVar("paradocs_sched_flow", default=Flow(INTERACTIVE, "anonymous"))
+
+
+def set_flow(user_id: Any, project_id: Any, priority: str) -> None:
+    """Attribute the model calls made from this task (and tasks it spawns) to a flow."""
+    _flow.set(Flow(priority, f"{user_id or 'anonymous'}:{project_id or '-'}"))
+
+
+def _limits(priority: str):
+    if priority == BULK:
+        return USER_BULK_ITEMS_PER_MIN, USER_BULK_BURST
+    return USER_RATE_PER_MIN, USER_BURST
+
+
+async def admit(user_id: Any, priority: str, items: int = 1) -> None:
+    """Charge `items` to the user's bucket for `priority`; RateLimited if it can't cover them."""
+    per_min, burst = _limits(priority)
+    if per_min <= 0 or burst <= 0:
+        return
+    amount = min(float(max(1, items)), burst)
+    buckets = [(f"user:{user_id or 'anonymous'}:{priority}", amount, per_min / 60.0, burst)]
+    # a SQLite take is a write transaction that can wait on the lock: off the loop, as in TokenBucket.acquire
+    wait = await asyncio.to_thread(shared_state.take, buckets) if shared_state.shared else shared_state.take(buckets)
+    if wait > 0:
+        count_rate_limited(priority)
+        logger.info("rate limited: user=%s priority=%s items=%d retry_after=%.1fs", user_id, priority, items, wait)
+        raise RateLimited(str(user_id), priority, wait)
+
+
+class FairScheduler:
+    """Start-time fair queue over `capacity` slots; only used from the event loop."""
+
+    def __init__(self, capacity: int = GENAI_MAX_CONCURRENCY, interactive_weight: float = SCHED_INTERACTIVE_WEIGHT,
+                 prefetch_weight: float = SCHED_PREFETCH_WEIGHT):
+        self.capacity = max(1, capacity)
+        self.weights = {INTERACTIVE: max(interactive_weight, 1e-6), BULK: 1.0, PREFETCH: max(prefetch_weight, 1e-6)}
+        self._in_use = 0
+        self._vtime = 0.0
+        # flow -> finish tag of its last queued or dispatched call
+        self._finish: Dict[Flow, float] = {}
+        # [start tag, priority rank, seq, future, priority]
+        self._heap: List[list] = []
+        self._seq = itertools.count()
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._stats = {p: {"granted": 0, "queued": 0, "wait_s": 0.0, "promoted": 0} for p in PRIORITIES}
+        # task -> flow its calls run as after promote(); task -> its queued heap entry
+        self._promoted: Dict[asyncio.Task, Flow] = {}
+        self._waiting: Dict[asyncio.Task, list] = {}
+
+    @asynccontextmanager
+    async def slot(self):
+        task = asyncio.current_task()
+        flow = self._promoted.get(task) or _flow.get()
+        start = self._tag(flow)
+        t0 = time.perf_counter()
+        if self._in_use < self.capacity and not self._heap:
+            self._in_use += 1
+            self._vtime = start
+        else:
+            fut = asyncio.get_running_loop().create_future()
+            entry = [start, PRIORITIES.index(flow.priority), next(self._seq), fut, flow.priority]
+            heappush(self._heap, entry)
+            self._waiting[task] = entry
+            self._set_queued(flow.priority, 1)
+            self._stats[flow.priority]["queued"] += 1
+            # free slots with a non-empty heap: only cancelled entries are ahead
+            self._dispatch()
+            try:
+                await fut
+            except asyncio.CancelledError:
+                if fut.done() and not fut.cancelled():
+                    # granted and cancelled in the same tick: hand the slot on
+                    self._release()
+                # a still-queued entry is skipped (and un-counted) when it reaches the top
+                raise
+            finally:
+                # promote() may have re-queued it under another class
+                flow = Flow(self._waiting.pop(task, entry)[4], flow.key)
+        self._granted(flow.priority, time.perf_counter() - t0)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def promote(self, task: asyncio.Task) -> None:
+        """
+        Run `task`'s model calls, the one queued now and any later ones, as
+        the caller's flow if that outranks the task's own (called by
+        single_flight when a caller joins the task's in-flight call).
+        """
+        flow = _flow.get()
+        rank = PRIORITIES.index(flow.priority)
+        current = self._promoted.get(task)
+        if current is not None and PRIORITIES.index(current.priority) <= rank:
+            return
+        entry = self._waiting.get(task)
+        if entry is not None and entry[1] <= rank:
+            return
+        if current is None:
+            task.add_done_callback(lambda t: self._promoted.pop(t, None))
+        self._promoted[task] = flow
+        if entry is None or entry[3] is None or entry[3].done():
+            # not queued (or already granted): the next slot() uses the promoted flow
+            return
+        # re-queue the waiting call under the new flow; the old entry is skipped when popped
+        new = [self._tag(flow), rank, next(self._seq), entry[3], flow.priority]
+        entry[3] = None
+        heappush(self._heap, new)
+        self._waiting[task] = new
+        self._set_queued(flow.priority, 1)
+        self._stats[flow.priority]["promoted"] += 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "in_use": self._in_use,
+            "flows": len(self._finish),
+            "weights": dict(self.weights),
+            "classes": {p: {**s, "waiting": self._queued[p], "wait_s": round(s["wait_s"], 3)}
+                        for p, s in self._stats.items()},
+            "user_limits": {
+                INTERACTIVE: {"per_min": USER_RATE_PER_MIN, "burst": USER_BURST},
+                BULK: {"items_per_min": USER_BULK_ITEMS_PER_MIN, "burst": USER_BULK_BURST},
+            },
+        }
+
+    # ------------------------------------------------------------------
+    def _release(self) -> None:
+        self._in_use -= 1
+        self._dispatch()
+
+    def _tag(self, flow: Flow) -> float:
+        """Start tag for the flow's next call; advances the flow's finish tag."""
+        start = max(self._vtime, self._finish.get(flow, 0.0))
+        self._finish[flow] = start + 1.0 / self.weights[flow.priority]
+        return start
+
+    def _dispatch(self) -> None:
+        while self._heap and self._in_use < self.capacity:
+            start, _, _, fut, priority = heappop(self._heap)
+            self._set_queued(priority, -1)
+            # None: re-queued by promote()
+            if fut is None or fut.cancelled():
+                continue
+            self._in_use += 1
+            self._vtime = start
+            fut.set_result(None)
+        if len(self._finish) > 4 * self.capacity + 1024:
+            # flows whose tags the virtual clock has passed restart at it anyway
+            self._finish = {f: t for f, t in self._finish.items() if t > self._vtime}
+
+    def _granted(self, priority: str, waited: float) -> None:
+        self._stats[priority]["granted"] += 1
+        self._stats[priority]["wait_s"] += waited
+        scheduler_wait_seconds.observe((priority,), waited)
+
+    def _set_queued(self, priority: str, delta: int) -> None:
+        self._queued[priority] += delta
+        scheduler_queue_depth.set((priority,), self._queued[priority])
+
+
+# shared instance used by the generation pipeline for every model call
+llm_scheduler = FairScheduler()
@@ -0,0 +1,130 @@
+# backend/serve.py
+"""
+Production entry point: several worker processes behind one port.
+
+    cd backend && python serve.py [--workers 4] [--port 8000]
+
+* Server: gunicorn with uvicorn workers when gunicorn is installed
+  (`pip install gunicorn`, Linux/macOS), otherwise uvicorn's own process
+  manager. Each worker imports main and runs its own event loop; the app
+  is not preloaded in the parent because the SQLite-backed stores open
+  their connections at import.
+* Workers: WEB_CONCURRENCY, default one per CPU. The app is async and the
+  model calls are I/O, so more workers than cores only adds memory.
+* Keep-alive: KEEPALIVE_S (75) is longer than the 60s idle timeout of
+  common load balancers, so the balancer closes idle connections rather
+  than racing a request onto one we just closed.
+* Graceful drain: on SIGTERM a worker stops accepting connections and
+  gives in-flight requests (streams and model calls included) up to
+  GRACEFUL_TIMEOUT_S to finish; then the lifespan shutdown gives running
+  background jobs JOBS_DRAIN_S (see jobs).
+* Warm-up: each worker (a recycled one too) imports google-genai and
+  builds its model clients in the lifespan, before it takes traffic;
+  GENAI_WARMUP=0 defers that to the first model calls (see genai_clients).
+* Shared state: set SHARED_STATE_DB so the workers share the rate limits,
+  response cache, jobs and projects (see shared_state). /metrics and the
+  */stats endpoints stay per worker.
+"""
+import argparse
+import importlib.util
+import os
+import sys
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# the same .env main reads, so the settings below (and the check in main_cli) see it
+load_dotenv()
+# workers warm up in the lifespan (see module docstring) unless told otherwise
+os.environ.setdefault("GENAI_WARMUP", "1")
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+KEEPALIVE_S = int(os.getenv("KEEPALIVE_S", "75"))
+GRACEFUL_TIMEOUT_S = int(os.getenv("GRACEFUL_TIMEOUT_S", "30"))
+BACKLOG = int(os.getenv("BACKLOG", "2048"))
+# recycle a worker after this many requests (0 = never), with jitter so they don't all restart together
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", "0"))
+
+
+def _gunicorn_available() -> bool:
+    # find_spec looks the modules up without importing them (uvicorn.workers imports uvicorn only)
+    try:
+        return all(importlib.util.find_spec(name) is not None for name in ("gunicorn", "uvicorn.workers"))
+    except ImportError:
+        return False
+
+
+def run_gunicorn(args) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind": f"{args.host}:{args.port}",
+        "workers": args.workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "keepalive": KEEPALIVE_S,
+        "graceful_timeout": GRACEFUL_TIMEOUT_S,
+        # heartbeat only: long model calls don't block the worker's event loop
+        "timeout": max(120, GRACEFUL_TIMEOUT_S * 2),
+        "backlog": BACKLOG,
+        "max_requests": MAX_REQUESTS,
+        "max_requests_jitter": MAX_REQUESTS // 10,
+        "chdir": BACKEND_DIR,
+        "preload_app": False,
+    }
+
+    class _Application(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from main import app
+            return app
+
+    _Application().run()
+
+
+def run_uvicorn(args) -> None:
+    import uvicorn
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=BACKEND_DIR,
+        timeout_keep_alive=KEEPALIVE_S,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT_S,
+        backlog=BACKLOG,
+        limit_max_requests=MAX_REQUESTS or None,
+        limit_max_requests_jitter=MAX_REQUESTS // 10,
+        log_level=args.log_level,
+    )
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    parser.add_argument("--server", choices=("auto", "gunicorn", "uvicorn"), default="auto")
+    parser.add_argument("--log-level", default="info", help="server log level (uvicorn only)")
+    args = parser.parse_args()
+    args.workers = max(1, args.workers)
+
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if _gunicorn_available() else "uvicorn"
+    if server == "gunicorn" and not _gunicorn_available():
+        sys.exit("gunicorn is not installed (pip install gunicorn)")
+    if args.workers > 1 and not os.getenv("SHARED_STATE_DB"):
+        print("serve: SHARED_STATE_DB is not set; rate limits, caches and jobs are per worker", file=sys.stderr)
+    print(f"serve: {server}, {args.workers} worker(s) on {args.host}:{args.port}", file=sys.stderr)
+    (run_gunicorn if server == "gunicorn" else run_uvicorn)(args)
+
+
+if __name__ == "__main__":
+    main_cli()
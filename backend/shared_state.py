@@ -0,0 +1,244 @@
+# backend/shared_state.py
+"""
+State that every worker process of a deployment has to agree on.
+
+Module globals are per process, so with several workers (see serve.py)
+each one would grant itself the whole Gemini quota, run a resumed job
+again, and keep serving a project another worker has since changed.
+SHARED_STATE_DB points all workers at one SQLite file (WAL mode) that
+holds the few pieces that must be shared:
+
+* token buckets: take() debits several buckets in one transaction, so
+  GENAI_QPS / GENAI_TPM and the per-user limits (scheduler) hold for the
+  deployment, not per worker
+* leases: claim() / release() give one worker ownership of a job while it
+  runs (renewed as it goes, expiring if the worker dies)
+* versions: bump() / version() tell a per-process cache that another
+  worker wrote the entry (project_store)
+
+Without SHARED_STATE_DB the same interface is served from process memory,
+which is the single-worker behaviour. SHARED_STATE_DB is also the default
+for GENAI_CACHE_DB, JOBS_DB and PROJECTS_DB, so one setting puts the
+response cache, jobs and projects on the same file.
+"""
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger("paradocs-gen")
+
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB")
+
+# (name, amount, refill per second, capacity)
+Bucket = Tuple[str, float, float, float]
+
+# buckets untouched this long are full again at any rate we use; dropping
+# them keeps per-user buckets from piling up (a missing bucket starts full)
+_BUCKET_IDLE_S = 3600.0
+_PRUNE_EVERY = 1024
+
+
+def worker_id() -> str:
+    # read per call: forked workers must not report their parent's pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _refilled(level: float, updated: float, rate: float, capacity: float, now: float) -> float:
+    return min(capacity, level + max(0.0, now - updated) * rate)
+
+
+def _wait_for(buckets: Sequence[Bucket], levels: List[float]) -> float:
+    """Seconds until every bucket covers its amount (0 if they all do now)."""
+    wait = 0.0
+    for (_, amount, rate, _), level in zip(buckets, levels):
+        if level < amount and rate > 0:
+            wait = max(wait, (amount - level) / rate)
+    return wait
+
+
+class SharedState:
+    """Interface; see the module docstring."""
+
+    shared = False
+
+    def take(self, buckets: Sequence[Bucket]) -> float:
+        """Debit every bucket and return 0, or debit none and return the seconds to wait."""
+        raise NotImplementedError
+
+    def claim(self, name: str, owner: str, ttl_s: float) -> bool:
+        """Take or renew lease `name`; False while another owner holds it."""
+        raise NotImplementedError
+
+    def release(self, name: str, owner: str) -> None:
+        raise NotImplementedError
+
+    def bump(self, key: str) -> int:
+        raise NotImplementedError
+
+    def version(self, key: str) -> int:
+        raise NotImplementedError
+
+
+class MemorySharedState(SharedState):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._leases: Dict[str, Tuple[str, float]] = {}
+        self._versions: Dict[str, int] = {}
+        self._takes = 0
+
+    def take(self, buckets: Sequence[Bucket]) -> float:
+        now = time.time()
+        with self._lock:
+            self._takes += 1
+            if self._takes % _PRUNE_EVERY == 0:
+                self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < _BUCKET_IDLE_S}
+            levels = []
+            for name, _, rate, capacity in buckets:
+                level, updated = self._buckets.get(name, (capacity, now))
+                levels.append(_refilled(level, updated, rate, capacity, now))
+            wait = _wait_for(buckets, levels)
+            if wait <= 0:
+                for (name, amount, _, _), level in zip(buckets, levels):
+                    self._buckets[name] = (level - amount, now)
+            return wait
+
+    def claim(self, name: str, owner: str, ttl_s: float) -> bool:
+        now = time.time()
+        with self._lock:
+            held = self._leases.get(name)
+            if held and held[0] != owner and held[1] > now:
+                return False
+            self._leases[name] = (owner, now + ttl_s)
+            return True
+
+    def release(self, name: str, owner: str) -> None:
+        with self._lock:
+            if self._leases.get(name, ("",))[0] == owner:
+                del self._leases[name]
+
+    def bump(self, key: str) -> int:
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            return self._versions[key]
+
+    def version(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+
+class SqliteSharedState(SharedState):
+    shared = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self._takes = 0
+        self._conn()  # fail early on a bad path
+        logger.info("Shared state: SQLite at %s", path)
+
+    def _conn(self) -> sqlite3.Connection:
+        # connections must not cross a fork; each worker opens its own
+        if self._pid != os.getpid():
+            self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=10)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS state_buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS state_leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS state_versions (key TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._db
+
+    def _write(self, fn):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences from different workers can't interleave
+        with self._lock:
+            db = self._conn()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(db)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+
+    def take(self, buckets: Sequence[Bucket]) -> float:
+        self._takes += 1
+        prune = self._takes % _PRUNE_EVERY == 0
+
+        def txn(db):
+            now = time.time()
+            if prune:
+                db.execute("DELETE FROM state_buckets WHERE updated < ?", (now - _BUCKET_IDLE_S,))
+            levels = []
+            for name, _, rate, capacity in buckets:
+                row = db.execute("SELECT level, updated FROM state_buckets WHERE name = ?", (name,)).fetchone()
+                level, updated = row if row else (capacity, now)
+                levels.append(_refilled(level, updated, rate, capacity, now))
+            wait = _wait_for(buckets, levels)
+            if wait <= 0:
+                db.executemany(
+                    "INSERT OR REPLACE INTO state_buckets (name, level, updated) VALUES (?, ?, ?)",
+                    [(name, level - amount, now) for (name, amount, _, _), level in zip(buckets, levels)],
+                )
+            return wait
+
+        return self._write(txn)
+
+    def claim(self, name: str, owner: str, ttl_s: float) -> bool:
+        def txn(db):
+            now = time.time()
+            row = db.execute("SELECT owner, expires_at FROM state_leases WHERE name = ?", (name,)).fetchone()
+            if row and row[0] != owner and row[1] > now:
+                return False
+            db.execute(
+                "INSERT OR REPLACE INTO state_leases (name, owner, expires_at) VALUES (?, ?, ?)", (name, owner, now + ttl_s)
+            )
+            return True
+
+        return self._write(txn)
+
+    def release(self, name: str, owner: str) -> None:
+        with self._lock:
+            self._conn().execute("DELETE FROM state_leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def bump(self, key: str) -> int:
+        def txn(db):
+            db.execute(
+                "INSERT INTO state_versions (key, version) VALUES (?, 1)"
+                " ON CONFLICT(key) DO UPDATE SET version = version + 1",
+                (key,),
+            )
+            return db.execute("SELECT version FROM state_versions WHERE key = ?", (key,)).fetchone()[0]
+
+        return self._write(txn)
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            row = self._conn().execute("SELECT version FROM state_versions WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+
+def make_shared_state(path: Optional[str] = SHARED_STATE_DB) -> SharedState:
+    if path:
+        try:
+            return SqliteSharedState(path)
+        except Exception as e:
+            logger.warning("Shared state: SQLite unavailable (%s); falling back to per-process memory", e)
+    return MemorySharedState()
+
+
+# shared instance used by resilience, jobs and project_store
+shared_state = make_shared_state()
@@ -0,0 +1,82 @@
+# backend/single_flight.py
+"""
+In-flight request coalescing.
+
+Concurrent callers that ask for the same key (the rendered prompt hash)
+share one running task instead of each triggering its own model call.
+
+* The work runs in its own task, so the first caller disconnecting does
+  not cancel it for everyone else; it is only cancelled once every waiter
+  has gone away.
+* The key is released as soon as the task finishes, successfully or not,
+  so a failed call is never replayed to later callers.
+* on_join(task) runs in the context of every caller that joins a running
+  task; generation_flights uses it to let an interactive caller promote a
+  prefetch or batch call it joins (scheduler.FairScheduler.promote).
+"""
+import asyncio
+import copy
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from scheduler import llm_scheduler
+
+logger = logging.getLogger("paradocs-gen")
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self, on_join: Optional[Callable[["asyncio.Task[Any]"], None]] = None):
+        self.on_join = on_join
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"leaders": 0, "followers": 0, "cancelled": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _t, k=key, f=flight: self._release(k, f))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["followers"] += 1
+            logger.debug("single-flight: joining in-flight call %s", key[:12])
+            if self.on_join is not None:
+                self.on_join(flight.task)
+
+        flight.waiters += 1
+        try:
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # last interested caller left: stop paying for the call
+                flight.task.cancel()
+                self._stats["cancelled"] += 1
+            raise
+        finally:
+            flight.waiters -= 1
+
+        # followers get their own copy so nobody mutates a shared object
+        return result if leader else copy.deepcopy(result)
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": len(self._flights)}
+
+    def _release(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+# shared registry for /generate and /regenerate model calls
+generation_flights = SingleFlight(on_join=llm_scheduler.promote)
@@ -1,9 +1,13 @@
 import time
+
+from id_generator import id_generator
+
+
 # ---------------------- small helpers -------------------------
 def now_ms() -> int:
     return int(time.time() * 1000)
 
 
 def make_id() -> int:
-    # simple numeric id generator
-    return now_ms()
\ No newline at end of file
+    # unique, time-ordered and below 2**53 (see id_generator)
+    return id_generator.next_id()